@@ -1,22 +1,94 @@
+from typing import Optional
+
+from asgiref.sync import sync_to_async
 from clipped.utils.bools import to_bool
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from django.conf import settings
+from django.db import transaction
 from django.http import HttpRequest
 
 from haupt.apis.serializers.runs import RunDetailSerializer
 from haupt.common.apis.regex import OWNER_NAME_KEY, RUN_UUID_KEY, UUID_KEY
 from haupt.common.endpoints.base import BaseEndpoint, PostEndpoint, RetrieveEndpoint
 from haupt.db.defs import Models
+from haupt.db.managers.agent_versions import (
+    AGENT_STATE_VERSION_HEADER,
+    get_agent_state_version,
+    wait_agent_state_version,
+)
 from haupt.db.managers.agents import get_agent_state, trigger_cron
 from polyaxon.schemas import LiveState, V1Statuses
 
 
 class AgentStateViewV1(BaseEndpoint, RetrieveEndpoint):
     ALLOWED_METHODS = ["GET"]
+    # Agents waiting for a new state are parked on the event loop instead of a worker thread
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Async views can't run in the request transaction, the state uses its own
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Same as `APIView.dispatch`, the sync steps run in a thread.
+
+        Copied from djangorestframework 3.16 (pinned to <3.17 in the requirements),
+        which does not support async handlers, keep in sync when upgrading.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() == "get":
+                response = await self.get(request, *args, **kwargs)
+            else:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
 
-    def get(self, request, *args, **kwargs):
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def get_version(self) -> Optional[int]:
+        version = self.request.query_params.get("version")
+        if version is None:
+            return None
+        try:
+            return int(version)
+        except (TypeError, ValueError):
+            raise ValidationError("Received an invalid agent state version.")
+
+    def get_wait(self) -> float:
+        if not settings.SHARED_CACHE_ENABLED:
+            # The version is local to each API worker, agents can't wait for it
+            return 0
+        max_wait = settings.SCHEDULER_AGENT_STATE_MAX_WAIT
+        wait = self.request.query_params.get("wait")
+        if wait is None:
+            return max_wait
+        try:
+            return max(min(float(wait), max_wait), 0)
+        except (TypeError, ValueError):
+            raise ValidationError("Received an invalid agent state wait.")
+
+    @transaction.atomic
+    def get_state(self, version: Optional[int]) -> Response:
+        if version is None:
+            version = get_agent_state_version()
         state = get_agent_state()
+        # A full state signals remaining work, the agent requests the next state
+        # without waiting instead of waking all the agents with a new version.
         return Response(
             data={
                 "state": state,
@@ -24,8 +96,18 @@ class AgentStateViewV1(BaseEndpoint, RetrieveEndpoint):
                 "live_state": LiveState.LIVE,
             },
             status=status.HTTP_200_OK,
+            headers={AGENT_STATE_VERSION_HEADER: str(version)},
         )
 
+    async def get(self, request, *args, **kwargs):
+        # Agents passing the last version they received wait for a relevant change,
+        # the state is always computed once the wait expires to check the schedules.
+        version = self.get_version()
+        wait = self.get_wait()
+        if version is not None and wait:
+            version = await wait_agent_state_version(version=version, timeout=wait)
+        return await sync_to_async(self.get_state)(version)
+
 
 class AgentCronViewV1(BaseEndpoint, PostEndpoint):
     ALLOWED_METHODS = ["POST"]
@@ -1,207 +1,159 @@
+from typing import Dict, Optional
+
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
 
-from clipped.utils.tz import now
-
 from django.conf import settings
 from django.db.models import Q
 
-from haupt.apis.serializers.base.tags import TagsMixin
-from haupt.common import auditor
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
+from haupt.common import auditor, query, workers
 from haupt.common.authentication.base import is_normal_user
 from haupt.common.content_types import ContentTypes
 from haupt.common.permissions import PERMISSIONS_MAPPING
-from haupt.common.events.registry.archive import RUN_ARCHIVED_ACTOR, RUN_RESTORED_ACTOR
-from haupt.common.events.registry.run import (
-    RUN_APPROVED_ACTOR,
-    RUN_DELETED_ACTOR,
-    RUN_DONE,
-    RUN_SKIPPED_ACTOR,
-    RUN_STOPPED_ACTOR,
-    RUN_TRANSFERRED_ACTOR,
-)
+from haupt.common.events.registry.archive import RUN_RESTORED_ACTOR
+from haupt.common.events.registry.run import RUN_TRANSFERRED_ACTOR
 from haupt.db.defs import Models
 from haupt.db.managers.bookmarks import bookmark_obj
-from haupt.db.managers.live_state import run_queryset_stopping
-from haupt.db.managers.statuses import bulk_new_run_status
-from polyaxon.schemas import (
-    LifeCycle,
-    LiveState,
-    V1RunPending,
-    V1StatusCondition,
-    V1Statuses,
+from haupt.db.managers.bulk_actions import (
+    RUNS_BULK_ACTIONS,
+    RunsBulkActions,
+    create_runs_bulk_job,
+    filter_runs_bulk_action_queryset,
+    get_runs_bulk_action_queryset,
+    get_runs_bulk_job,
 )
+from haupt.db.managers.tags import bulk_add_tags
+from haupt.db.query_managers.run import RunQueryManager
+from polyaxon.exceptions import PQLException
+from polyaxon.schemas import LiveState
 
 
 def create_runs_tags(view, request, *args, **kwargs):
     uuids = request.data.get("uuids", [])
+    query_spec = request.data.get("query")
     tags = request.data.get("tags", [])
-    if not tags:
+    if not tags or not (uuids or query_spec):
         return Response(status=status.HTTP_200_OK, data={})
 
-    updated = []
     queryset = view.enrich_queryset(Models.Run.all)
-    queryset = queryset.filter(uuid__in=uuids)
-    for run in queryset.only("id", "tags"):
-        run.tags = TagsMixin.validated_tags({"tags": tags, "merge": True}, run.tags)[
-            "tags"
-        ]
-        updated.append(run)
-
-        Models.Run.objects.bulk_update(updated, ["tags"])
+    if uuids:
+        queryset = queryset.filter(uuid__in=uuids)
+    if query_spec:
+        try:
+            queryset = query.filter_queryset(
+                manager=RunQueryManager,
+                query_spec=query_spec,
+                queryset=queryset,
+                request=request,
+            )
+        except PQLException as e:
+            raise ValidationError(e)
+    bulk_add_tags(queryset=queryset, tags=tags)
     return Response(status=status.HTTP_200_OK, data={})
 
 
-def stop_runs(view, request, actor, *args, **kwargs):
-    # For Audit
+def get_audit_context(view, actor) -> Dict:
     view.set_owner()
+    return {
+        "actor_id": actor.id,
+        "actor_name": actor.username,
+        "owner_id": view._owner_id,
+        "owner_name": view.owner_name,
+        "project_name": view.project_name,
+    }
 
-    uuids = request.data.get("uuids", [])
-    # Immediate stop
-    queryset = view.enrich_queryset(Models.Run.all)
-    queryset = queryset.filter(uuid__in=uuids)
-    queryset = queryset.filter(status__in=LifeCycle.SAFE_STOP_VALUES)
-    runs = [r for r in queryset]
-    condition = V1StatusCondition.get_condition(
-        type=V1Statuses.STOPPED,
-        status="True",
-        reason="EventHandler",
-        message="User requested to stop the run.",
-    )
-    if settings.HAS_ORG_MANAGEMENT and is_normal_user(actor):
-        status_meta_info = {
-            "user": {"username": actor.username, "email": actor.email},
-        }
-        condition.meta_info = status_meta_info
-    bulk_new_run_status(queryset, condition)
-    # For Audit
-    for run in runs:
-        auditor.record(
-            event_type=RUN_STOPPED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
-        auditor.record(event_type=RUN_DONE, instance=run, previous_status=run.status)
 
-    queryset = view.enrich_queryset(Models.Run.all)
-    queryset = queryset.filter(uuid__in=uuids)
-    queryset = queryset.exclude(status__in=LifeCycle.DONE_OR_IN_PROGRESS_VALUES)
-    runs = [r for r in queryset]
-    condition = V1StatusCondition.get_condition(
-        type=V1Statuses.STOPPING,
-        status="True",
-        reason="EventHandler",
-        message="User requested to stop the run.",
-    )
+def get_status_meta_info(actor) -> Optional[Dict]:
     if settings.HAS_ORG_MANAGEMENT and is_normal_user(actor):
-        status_meta_info = {
+        return {
             "user": {"username": actor.username, "email": actor.email},
         }
-        condition.meta_info = status_meta_info
-    bulk_new_run_status(runs, condition)
-    # For Audit
-    for run in runs:
-        auditor.record(
-            event_type=RUN_STOPPED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
-        auditor.record(event_type=RUN_DONE, instance=run, previous_status=run.status)
+    return None
 
-    return Response(status=status.HTTP_200_OK, data={})
 
+def create_runs_bulk_action(view, request, actor, action: str):
+    """Processes the runs matching a PQL query in the background.
 
-def skip_runs(view, request, actor, *args, **kwargs):
-    # For Audit
-    view.set_owner()
+    Returns a job handle that can be polled for the progress.
+    """
+    query_spec = request.data.get("query")
+    # Same scope as `enrich_queryset`, the job filters the runs with the same params
+    project_id = view.project.id
+    try:
+        filter_runs_bulk_action_queryset(
+            action=action,
+            project_id=project_id,
+            query_spec=query_spec,
+            user_id=actor.id,
+        )
+    except PQLException as e:
+        raise ValidationError(e)
+
+    job = create_runs_bulk_job(project_id=project_id, action=action)
+    workers.send(
+        SchedulerCeleryTasks.RUNS_BULK_ACTION,
+        kwargs={
+            "job_uuid": job["uuid"],
+            "action": action,
+            "project_id": project_id,
+            "query": query_spec,
+            "user_id": actor.id,
+            "audit": get_audit_context(view, actor),
+            "meta_info": get_status_meta_info(actor),
+        },
+    )
+    job = get_runs_bulk_job(project_id=project_id, job_uuid=job["uuid"]) or job
+    return Response(status=status.HTTP_202_ACCEPTED, data=job)
+
+
+def process_runs_action(view, request, actor, action: str):
+    if request.data.get("query"):
+        return create_runs_bulk_action(
+            view=view, request=request, actor=actor, action=action
+        )
 
     uuids = request.data.get("uuids", [])
-    # Immediate stop
-    queryset = view.enrich_queryset(Models.Run.restorable)
+    queryset = view.enrich_queryset(get_runs_bulk_action_queryset(action))
     queryset = queryset.filter(uuid__in=uuids)
-    queryset = queryset.filter(status__in=LifeCycle.SAFE_STOP_VALUES)
-    runs = [r for r in queryset]
-    condition = V1StatusCondition.get_condition(
-        type=V1Statuses.SKIPPED,
-        status="True",
-        reason="EventHandler",
-        message="User requested to skip the run.",
+    RUNS_BULK_ACTIONS[action](
+        queryset=queryset,
+        audit=get_audit_context(view, actor),
+        meta_info=get_status_meta_info(actor),
     )
-    if settings.HAS_ORG_MANAGEMENT and is_normal_user(actor):
-        status_meta_info = {
-            "user": {"username": actor.username, "email": actor.email},
-        }
-        condition.meta_info = status_meta_info
-    bulk_new_run_status(queryset, condition)
-    # For Audit
-    for run in runs:
-        auditor.record(
-            event_type=RUN_SKIPPED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
-        auditor.record(event_type=RUN_DONE, instance=run, previous_status=run.status)
-
     return Response(status=status.HTTP_200_OK, data={})
 
 
-def approve_runs(view, request, actor, *args, **kwargs):
-    uuids = request.data.get("uuids", [])
-    queryset = view.enrich_queryset(Models.Run.objects)
-    queryset = queryset.filter(uuid__in=uuids)
-    queryset = queryset.filter(
-        pending__in={V1RunPending.APPROVAL, V1RunPending.CACHE},
+def stop_runs(view, request, actor, *args, **kwargs):
+    return process_runs_action(
+        view=view, request=request, actor=actor, action=RunsBulkActions.STOP
     )
-    runs = [r for r in queryset]
-    queryset.update(pending=None)
-    # For Audit
-    view.set_owner()
-    for run in runs:
-        auditor.record(
-            event_type=RUN_APPROVED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
 
-    return Response(status=status.HTTP_200_OK, data={})
+
+def skip_runs(view, request, actor, *args, **kwargs):
+    return process_runs_action(
+        view=view, request=request, actor=actor, action=RunsBulkActions.SKIP
+    )
+
+
+def approve_runs(view, request, actor, *args, **kwargs):
+    return process_runs_action(
+        view=view, request=request, actor=actor, action=RunsBulkActions.APPROVE
+    )
 
 
 def delete_runs(view, request, actor, *args, **kwargs):
-    uuids = request.data.get("uuids", [])
-    queryset = view.enrich_queryset(Models.Run.restorable)
-    runs = queryset.filter(uuid__in=uuids)
-    # For Audit
-    view.set_owner()
-    for run in runs:
-        auditor.record(
-            event_type=RUN_DELETED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
-    # Deletion in progress
-    runs.update(live_state=LiveState.DELETION_PROGRESSING)
-    return Response(status=status.HTTP_200_OK, data={})
+    return process_runs_action(
+        view=view, request=request, actor=actor, action=RunsBulkActions.DELETE
+    )
+
+
+def get_runs_bulk_action(view, request, *args, **kwargs):
+    job = get_runs_bulk_job(project_id=view.project.id, job_uuid=kwargs.get("uuid"))
+    if not job:
+        raise NotFound("The bulk action was not found or it has expired.")
+    return Response(status=status.HTTP_200_OK, data=job)
 
 
 def invalidate_runs(view, request, actor, *args, **kwargs):
@@ -212,36 +164,9 @@ def invalidate_runs(view, request, actor, *args, **kwargs):
 
 
 def archive_runs(view, request, actor, *args, **kwargs):
-    uuids = request.data.get("uuids", [])
-    queryset = view.enrich_queryset(Models.Run.objects)
-    queryset = queryset.filter(uuid__in=uuids)
-    # Set to stopping all runs that are not ended yet
-    queryset.exclude(status__in=LifeCycle.DONE_OR_IN_PROGRESS_VALUES).update(
-        status=V1Statuses.STOPPING,
-        updated_at=now(),
+    return process_runs_action(
+        view=view, request=request, actor=actor, action=RunsBulkActions.ARCHIVE
     )
-    # Pipeline/controller children runs
-    children = Models.Run.objects.filter(
-        Q(pipeline__uuid__in=uuids) | Q(controller__uuid__in=uuids)
-    ).exclude(live_state=LiveState.ARCHIVED)
-    run_queryset_stopping(queryset=children)
-    children.update(live_state=LiveState.ARCHIVED, archived_at=now())
-    runs = [r for r in queryset]
-    queryset.update(live_state=LiveState.ARCHIVED, archived_at=now())
-    # For Audit
-    view.set_owner()
-    for run in runs:
-        auditor.record(
-            event_type=RUN_ARCHIVED_ACTOR,
-            instance=run,
-            actor_id=actor.id,
-            actor_name=actor.username,
-            owner_id=view._owner_id,
-            owner_name=view.owner_name,
-            project_name=view.project_name,
-        )
-
-    return Response(status=status.HTTP_200_OK, data={})
 
 
 def restore_runs(view, request, actor, *args, **kwargs):
@@ -35,6 +35,10 @@ projects_urlpatterns = [
         projects.URLS_PROJECTS_RUNS_DELETE,
         runs_views.ProjectRunsDeleteView.as_view(),
     ),
+    re_path(
+        projects.URLS_PROJECTS_RUNS_BULK_ACTION,
+        runs_views.ProjectRunsBulkActionView.as_view(),
+    ),
     re_path(
         projects.URLS_PROJECTS_RUNS_SYNC,
         runs_views.ProjectRunsSyncView.as_view(),
@@ -21,6 +21,7 @@ from haupt.common.endpoints.base import (
     DestroyEndpoint,
     ListEndpoint,
     PostEndpoint,
+    RetrieveEndpoint,
 )
 from haupt.db.defs import Models
 from haupt.db.managers.flows import get_run_graph
@@ -127,6 +128,13 @@ class ProjectRunsDeleteView(ProjectResourceListEndpoint, DestroyEndpoint):
         )
 
 
+class ProjectRunsBulkActionView(ProjectResourceListEndpoint, RetrieveEndpoint):
+    ALLOWED_METHODS = ["GET"]
+
+    def get(self, request, *args, **kwargs):
+        return methods.get_runs_bulk_action(view=self, request=request, *args, **kwargs)
+
+
 class ProjectRunsListMixinView(BookmarkedListMixinView):
     bookmarked_model = "run"
 
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
+from haupt.common.stats import StatsLogger
+
+_logger = logging.getLogger("haupt.tasks")
+
+# Pipeline checks are debounced by the scheduler (SCHEDULER_CHECK_PIPELINE_DEBOUNCE)
+COALESCED_TASKS = {
+    SchedulerCeleryTasks.RUNS_PREPARE,
+    SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+}
+
+
+def get_window(task_name: str) -> int:
+    # Tasks are claimed by the sender and released by the worker,
+    # so both must see the same cache.
+    if task_name not in COALESCED_TASKS or not settings.SHARED_CACHE_ENABLED:
+        return 0
+    return settings.SCHEDULER_TASKS_COALESCING_WINDOW
+
+
+def get_coalescing_key(task_name: str, kwargs: Optional[Dict]) -> str:
+    value = json.dumps(kwargs or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return "tasks.coalescing.{}.{}".format(
+        task_name, hashlib.md5(value.encode()).hexdigest()
+    )
+
+
+def get_suppressed_key(task_name: str) -> str:
+    return "tasks.coalescing.suppressed.{}".format(task_name)
+
+
+def claim(task_name: str, kwargs: Optional[Dict]) -> bool:
+    """Returns False if an identical task is already queued within the window.
+
+    The claim is released when the task starts, so sends that happen during
+    the execution queue a new one and no change is missed.
+    """
+    window = get_window(task_name)
+    if not window:
+        return True
+    if cache.add(get_coalescing_key(task_name, kwargs), True, timeout=window):
+        return True
+    suppressed_key = get_suppressed_key(task_name)
+    if not cache.add(suppressed_key, 1, timeout=None):
+        try:
+            cache.incr(suppressed_key)
+        except ValueError:
+            pass
+    _logger.debug("Coalesced task %s with kwargs %s", task_name, kwargs)
+    stats_logger.log()
+    return False
+
+
+def release(task_name: str, kwargs: Optional[Dict]):
+    if get_window(task_name):
+        cache.delete(get_coalescing_key(task_name, kwargs))
+
+
+def get_stats() -> Dict[str, int]:
+    """Returns the number of suppressed duplicates by task."""
+    keys = {get_suppressed_key(t): t for t in COALESCED_TASKS}
+    values = cache.get_many(list(keys.keys()))
+    return {keys[k]: v for k, v in values.items()}
+
+
+stats_logger = StatsLogger(_logger, "Tasks coalescing", get_stats)
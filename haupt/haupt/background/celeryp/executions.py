@@ -56,6 +56,7 @@ class TasksExecutions:
             SchedulerCeleryTasks.RUNS_START: manager.runs_start,
             SchedulerCeleryTasks.RUNS_BUILT: manager.runs_built,
             SchedulerCeleryTasks.RUNS_STOP: manager.runs_stop,
+            SchedulerCeleryTasks.RUNS_BULK_ACTION: manager.runs_bulk_action,
             SchedulerCeleryTasks.RUNS_SET_ARTIFACTS: manager.runs_set_artifacts,
             SchedulerCeleryTasks.RUNS_NOTIFY_STATUS: manager.runs_notify_status,
             SchedulerCeleryTasks.RUNS_NOTIFY_DONE: manager.runs_notify_done,
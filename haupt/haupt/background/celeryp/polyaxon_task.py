@@ -2,6 +2,8 @@ import logging
 
 from celery import Task
 
+from haupt.background.celeryp import coalescing
+
 _logger = logging.getLogger("haupt.tasks")
 
 
@@ -10,6 +12,11 @@ class HauptTask(Task):
 
     abstract = True
 
+    def __call__(self, *args, **kwargs):
+        # Identical sends are accepted again as soon as this execution starts
+        coalescing.release(self.name, kwargs)
+        return super().__call__(*args, **kwargs)
+
     def on_success(self, retval, task_id, args, kwargs):
         _logger.info("Async task succeeded", extra={"task name": self.name})
 
@@ -10,6 +10,7 @@ SCHEDULER_CORE_ROUTES = {
     SchedulerCeleryTasks.RUNS_BUILT: {"queue": CeleryQueues.SCHEDULER_COMPILER},
     # Scheduler runs
     SchedulerCeleryTasks.RUNS_STOP: {"queue": CeleryQueues.SCHEDULER_RUNS},
+    SchedulerCeleryTasks.RUNS_BULK_ACTION: {"queue": CeleryQueues.SCHEDULER_RUNS},
     SchedulerCeleryTasks.RUNS_HOOKS: {"queue": CeleryQueues.SCHEDULER_RUNS},
     # Scheduler artifacts
     SchedulerCeleryTasks.RUNS_SET_ARTIFACTS: {
@@ -10,6 +10,7 @@ class SchedulerCeleryTasks:
     RUNS_START = "runs_start"
     RUNS_BUILT = "runs_built"
     RUNS_STOP = "runs_stop"
+    RUNS_BULK_ACTION = "runs_bulk_action"
     RUNS_DELETE = "runs_delete"
     RUNS_SET_ARTIFACTS = "runs_set_artifacts"
     RUNS_HOOKS = "runs_hooks"
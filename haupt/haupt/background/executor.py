@@ -0,0 +1,137 @@
+import atexit
+import json
+import logging
+import os
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from clipped.utils.imports import import_string
+
+from django.db import close_old_connections
+
+from haupt.common.stats import StatsLogger
+
+_logger = logging.getLogger("haupt.background.executor")
+
+
+class InProcessExecutor:
+    """Runs the background tasks on a bounded thread pool when Celery is not enabled.
+
+    Tasks of the same run are executed in the order they were sent, one at a time,
+    and a task is dropped if an identical one (same name and kwargs) is still pending.
+    Tasks are only given the serializable `kwargs` and reload their entities,
+    the same way they would on a Celery worker.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        # Per run queues, a run is scheduled on the pool while its queue is not empty
+        self._runs = {}
+        self._pending = set()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.stats_logger = StatsLogger(_logger, "Executor", self.get_stats)
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="haupt-tasks"
+            )
+        return self._pool
+
+    @staticmethod
+    def get_key(task_name: str, kwargs: Optional[Dict]) -> str:
+        return "{}:{}".format(
+            task_name, json.dumps(kwargs or {}, sort_keys=True, default=str)
+        )
+
+    @staticmethod
+    def execute(task_name: str, kwargs: Optional[Dict]):
+        module = os.environ.get("CONFIG_PREFIX", "haupt")
+        tasks_execution = import_string(
+            f"{module}.background.celeryp.executions.TasksExecutions"
+        )
+        tasks_execution.run(task=task_name, kwargs=kwargs)
+
+    def submit(self, task_name: str, kwargs: Optional[Dict] = None) -> bool:
+        key = self.get_key(task_name, kwargs)
+        run_id = (kwargs or {}).get("run_id")
+        with self._lock:
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+            self._pending.add(key)
+            self.submitted += 1
+            if run_id is None:
+                self.pool.submit(self._run_task, key, task_name, kwargs)
+                return True
+            queue = self._runs.get(run_id)
+            if queue is not None:
+                # The run is already scheduled, the task is picked after the current ones
+                queue.append((key, task_name, kwargs))
+                return True
+            self._runs[run_id] = deque([(key, task_name, kwargs)])
+        self.pool.submit(self._run_queue, run_id)
+        return True
+
+    def _run_task(self, key: str, task_name: str, kwargs: Optional[Dict]):
+        with self._lock:
+            self._pending.discard(key)
+        close_old_connections()
+        try:
+            self.execute(task_name, kwargs)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            _logger.exception("Task %s failed: %s", task_name, e)
+        finally:
+            close_old_connections()
+        self.stats_logger.log()
+
+    def _run_queue(self, run_id: int):
+        while True:
+            with self._lock:
+                queue = self._runs[run_id]
+                if not queue:
+                    self._runs.pop(run_id)
+                    return
+                key, task_name, kwargs = queue.popleft()
+            self._run_task(key, task_name, kwargs)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "pending": len(self._pending),
+                "runs": len(self._runs),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "failed": self.failed,
+            }
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+            self.stats_logger.log(force=True)
+
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor(max_workers: int) -> InProcessExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = InProcessExecutor(max_workers=max_workers)
+            # Drain the pending tasks and log the final stats when the process exits
+            atexit.register(_EXECUTOR.shutdown)
+        return _EXECUTOR
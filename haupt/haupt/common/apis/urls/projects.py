@@ -2,6 +2,7 @@ from haupt.common.apis.regex import (
     OWNER_NAME_PATTERN,
     PROJECT_NAME_PATTERN,
     TEAM_NAME_PATTERN,
+    UUID_PATTERN,
 )
 
 # Projects
@@ -29,6 +30,9 @@ URLS_PROJECTS_RUNS_APPROVE = r"^{}/{}/runs/approve/?$".format(
 URLS_PROJECTS_RUNS_DELETE = r"^{}/{}/runs/delete/?$".format(
     OWNER_NAME_PATTERN, PROJECT_NAME_PATTERN
 )
+URLS_PROJECTS_RUNS_BULK_ACTION = r"^{}/{}/runs/bulk/{}/?$".format(
+    OWNER_NAME_PATTERN, PROJECT_NAME_PATTERN, UUID_PATTERN
+)
 URLS_PROJECTS_RUNS_SYNC = r"^{}/{}/runs/sync/?$".format(
     OWNER_NAME_PATTERN, PROJECT_NAME_PATTERN
 )
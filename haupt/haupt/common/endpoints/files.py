@@ -1,15 +1,75 @@
 import os
+import re
+import uuid
 
 from email.utils import formatdate
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from clipped.utils.hashing import hash_value
 
-from django.http import FileResponse
+from django.http import FileResponse, HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags, parse_http_date_safe, quote_etag
+
+RANGE_UNIT = "bytes"
+# Requests with more ranges are served in full instead of as a multipart response
+MAX_RANGES = 16
+
+_RANGE_SPEC_MATCH = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def parse_range_header(
+    header: Optional[str], size: int
+) -> Optional[List[Tuple[int, int]]]:
+    """Parses a `Range` header into a sorted list of inclusive byte ranges.
+
+    Returns None if the header should be ignored, i.e. it is missing, malformed,
+    or it does not use the bytes unit, and an empty list if none of the ranges
+    can be satisfied. Overlapping and adjacent ranges are coalesced.
+    """
+    if not header or "=" not in header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != RANGE_UNIT:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        match = _RANGE_SPEC_MATCH.match(spec)
+        if not match:
+            return None
+        start, end = match.groups()
+        if not start:
+            if not end:
+                return None
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(start)
+        end = int(end) if end else size - 1
+        if end < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
 
 
 class FilePathResponse(FileResponse):
-    def __init__(self, *args, as_attachment=False, filepath="", **kwargs):
+    def __init__(self, *args, as_attachment=False, filepath="", request=None, **kwargs):
         filename = os.path.basename(filepath) if filepath else ""
         headers = self.get_stat_headers(filepath)
         super().__init__(
@@ -20,13 +80,116 @@ class FilePathResponse(FileResponse):
             headers=headers,
             **kwargs,
         )
+        if request is not None and headers:
+            self.headers["Accept-Ranges"] = RANGE_UNIT
+            self.set_ranges(request, size=os.path.getsize(filepath))
 
-    def get_stat_headers(self, filepath: str) -> Optional[Dict]:
+    @staticmethod
+    def get_stat_headers(filepath: str) -> Optional[Dict]:
         if not filepath:
             return
         stat_result = os.stat(filepath)
         last_modified = formatdate(stat_result.st_mtime, usegmt=True)
         etag_base = str(stat_result.st_mtime) + "-" + str(stat_result.st_size)
-        etag = hash_value(etag_base.encode(), hash_length=None)
+        etag = quote_etag(hash_value(etag_base.encode(), hash_length=None))
 
         return {"last-modified": last_modified, "etag": etag}
+
+    def check_if_range(self, request: HttpRequest) -> bool:
+        """A `Range` with an outdated `If-Range` validator must return the full file."""
+        if_range = request.headers.get("If-Range")
+        if not if_range:
+            return True
+        if parse_etags(if_range):
+            # Only strong comparison is allowed for `If-Range`
+            return if_range.strip() == self.headers["etag"]
+        return parse_http_date_safe(if_range) == parse_http_date_safe(
+            self.headers["last-modified"]
+        )
+
+    def set_ranges(self, request: HttpRequest, size: int):
+        if request.method != "GET" or not self.check_if_range(request):
+            return
+        ranges = parse_range_header(request.headers.get("Range"), size)
+        if ranges is None:
+            return
+        if not ranges:
+            self.status_code = 416
+            self.headers["Content-Range"] = "{} */{}".format(RANGE_UNIT, size)
+            self.headers["Content-Length"] = "0"
+            self.streaming_content = []
+            return
+
+        self.status_code = 206
+        filelike = self.file_to_stream
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["Content-Range"] = "{} {}-{}/{}".format(
+                RANGE_UNIT, start, end, size
+            )
+            self.headers["Content-Length"] = str(end - start + 1)
+            self.streaming_content = self._iter_range(filelike, start, end)
+            return
+
+        boundary = uuid.uuid4().hex
+        content_type = self.headers.get("Content-Type") or "application/octet-stream"
+        parts = [
+            (
+                (
+                    "--{}\r\nContent-Type: {}\r\nContent-Range: {} {}-{}/{}\r\n\r\n"
+                ).format(boundary, content_type, RANGE_UNIT, start, end, size),
+                start,
+                end,
+            )
+            for start, end in ranges
+        ]
+        closing = "--{}--\r\n".format(boundary)
+        content_length = len(closing) + sum(
+            len(part_header) + end - start + 1 + 2 for part_header, start, end in parts
+        )
+        self.headers["Content-Type"] = "multipart/byteranges; boundary={}".format(
+            boundary
+        )
+        self.headers["Content-Length"] = str(content_length)
+        self.streaming_content = self._iter_multipart(filelike, parts, closing)
+
+    def _iter_range(self, filelike, start: int, end: int) -> Iterator[bytes]:
+        filelike.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = filelike.read(min(self.block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def _iter_multipart(
+        self, filelike, parts: List[Tuple[str, int, int]], closing: str
+    ) -> Iterator[bytes]:
+        for part_header, start, end in parts:
+            yield part_header.encode()
+            yield from self._iter_range(filelike, start, end)
+            yield b"\r\n"
+        yield closing.encode()
+
+
+def get_file_response(
+    request: HttpRequest, filepath: str, as_attachment: bool = False
+) -> HttpResponse:
+    """Returns a `304` if the client's copy is still valid, otherwise the file.
+
+    The file response honours `Range` requests with single or multipart `206` responses.
+    """
+    headers = FilePathResponse.get_stat_headers(filepath)
+    response = get_conditional_response(
+        request,
+        etag=headers["etag"],
+        last_modified=int(os.stat(filepath).st_mtime),
+    )
+    if response is not None:
+        for key, value in headers.items():
+            response.headers[key] = value
+        return response
+    return FilePathResponse(
+        filepath=filepath, as_attachment=as_attachment, request=request
+    )
@@ -11,7 +11,35 @@ def set_core(context, config: PlatformConfig, use_db: bool = True):
     context["POLYAXON_ENVIRONMENT"] = config.env
     context["CHART_VERSION"] = config.chart_version
     context["SCHEDULER_ENABLED"] = config.scheduler_enabled
+    context["SCHEDULER_SPECS_CACHE_SIZE"] = config.scheduler_specs_cache_size or 0
+    context["SCHEDULER_CHECK_PIPELINE_DEBOUNCE"] = (
+        config.scheduler_check_pipeline_debounce or 0
+    )
+    context["SCHEDULER_BULK_ACTIONS_BATCH_SIZE"] = (
+        config.scheduler_bulk_actions_batch_size or 500
+    )
+    context["SCHEDULER_QUEUE_DISPATCHER"] = config.scheduler_queue_dispatcher or "fifo"
+    context["SCHEDULER_AGENT_STATE_MAX_WAIT"] = (
+        config.scheduler_agent_state_max_wait or 0
+    )
+    executor_workers = config.scheduler_executor_workers or 0
+    if config.is_sqlite_db_engine:
+        # SQLite has a single writer, concurrent tasks fail with "database is locked"
+        executor_workers = min(executor_workers, 1)
+    context["SCHEDULER_EXECUTOR_WORKERS"] = executor_workers
+    context["SCHEDULER_TASKS_COALESCING_WINDOW"] = (
+        config.scheduler_tasks_coalescing_window or 0
+    )
     context["K8S_NAMESPACE"] = config.namespace
+    # The scheduler only coordinates through the cache if all processes share it
+    context["SHARED_CACHE_ENABLED"] = bool(config.redis_cache_url)
+    if config.redis_cache_url:
+        context["CACHES"] = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": config.get_redis_url(config.redis_cache_url),
+            }
+        }
 
     context["FILE_UPLOAD_PERMISSIONS"] = RW_R_R_PERMISSIONS
     context[
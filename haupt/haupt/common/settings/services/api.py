@@ -6,6 +6,7 @@ from haupt.common.settings.celery import set_celery
 from haupt.common.settings.core import set_core
 from haupt.common.settings.cors import set_cors
 from haupt.common.settings.middlewares import set_middlewares
+from haupt.common.settings.streams import set_streams
 from haupt.common.settings.ui import set_ui
 from haupt.schemas.platform_config import PlatformConfig
 
@@ -38,6 +39,7 @@ def set_api_service(
     set_ui(context=context, config=config, processors=processors)
     set_middlewares(context=context, config=config, enable_crsf=enable_crsf)
     set_assets(context=context, config=config)
+    set_streams(context=context, config=config)
     if config.scheduler_enabled:
         set_celery(context=context, config=config, routes=routes)
 
@@ -3,6 +3,7 @@ from haupt.common.settings.assets import set_assets
 from haupt.common.settings.core import set_core
 from haupt.common.settings.cors import set_cors
 from haupt.common.settings.middlewares import set_base_middlewares
+from haupt.common.settings.streams import set_streams
 from haupt.common.settings.ui import set_ui
 from haupt.schemas.platform_config import PlatformConfig
 
@@ -30,3 +31,4 @@ def set_service(context, config: PlatformConfig):
     set_ui(context=context, config=config)
     set_base_middlewares(context=context, config=config)
     set_assets(context=context, config=config)
+    set_streams(context=context, config=config)
@@ -0,0 +1,11 @@
+from haupt.schemas.platform_config import PlatformConfig
+
+
+def set_streams(context, config: PlatformConfig):
+    context["STREAMS_MAX_CONCURRENCY"] = config.streams_max_concurrency or 1
+    context["STREAMS_REQUEST_CONCURRENCY"] = config.streams_request_concurrency or 1
+    context["STREAMS_EVENTS_CACHE_SIZE"] = config.streams_events_cache_size or 0
+    context["STREAMS_EVENTS_COMPACTION"] = config.streams_events_compaction
+    context["STREAMS_DISK_CACHE_SIZE"] = config.streams_disk_cache_size or 0
+    context["STREAMS_LOGS_PAGE_SIZE"] = config.streams_logs_page_size or 0
+    context["STREAMS_LOGS_COMPRESSION"] = config.streams_logs_compression
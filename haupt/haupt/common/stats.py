@@ -0,0 +1,34 @@
+import logging
+import threading
+import time
+
+from typing import Callable, Dict
+
+# Interval between the logs of the stats
+STATS_LOG_INTERVAL = 300
+
+
+class StatsLogger:
+    """Logs the stats returned by `get_stats` at most once per interval."""
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        title: str,
+        get_stats: Callable[[], Dict],
+        interval: int = STATS_LOG_INTERVAL,
+    ):
+        self.logger = logger
+        self.title = title
+        self.get_stats = get_stats
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._logged_at = time.monotonic()
+
+    def log(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._logged_at < self.interval:
+                return
+            self._logged_at = now
+        self.logger.info("%s stats: %s", self.title, self.get_stats())
@@ -7,6 +7,7 @@ from clipped.utils.imports import import_string
 from django.conf import settings
 from django.db import transaction
 
+from haupt.background.celeryp import coalescing
 from haupt.common import conf
 from haupt.common.options.registry.core import SCHEDULER_ENABLED
 
@@ -24,7 +25,14 @@ def send(
     eager_kwargs: Optional[Dict] = None,
     **options,
 ):
+    use_executor = delay is None and settings.SCHEDULER_EXECUTOR_WORKERS > 0
     delay = conf.get(SCHEDULER_ENABLED) if delay is None else delay
+    if not delay and use_executor:
+        # Run in the background of this process once the request's data is committed
+        from haupt.background.executor import get_executor
+
+        executor = get_executor(max_workers=settings.SCHEDULER_EXECUTOR_WORKERS)
+        return transaction.on_commit(lambda: executor.submit(task_name, kwargs=kwargs))
     if not delay:
         module = os.environ.get("CONFIG_PREFIX", "haupt")
         tasks_execution = import_string(
@@ -33,6 +41,14 @@ def send(
         tasks_execution.run(task=task_name, kwargs=kwargs, eager_kwargs=eager_kwargs)
         return
     options["ignore_result"] = options.get("ignore_result", True)
-    return transaction.on_commit(
-        lambda: app.send_task(task_name, kwargs=kwargs, **options)
-    )
+
+    def _send():
+        if not coalescing.claim(task_name, kwargs):
+            return
+        try:
+            app.send_task(task_name, kwargs=kwargs, **options)
+        except Exception:
+            coalescing.release(task_name, kwargs)
+            raise
+
+    return transaction.on_commit(_send)
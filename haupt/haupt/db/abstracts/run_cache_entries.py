@@ -0,0 +1,27 @@
+from django.db import models
+
+from polyaxon.schemas import V1RunKind, V1Statuses
+
+
+class BaseRunCacheEntry(models.Model):
+    """Latest run eligible as a cache for a given state, kind and runtime.
+
+    The primary key is derived from the state, kind and runtime,
+    so that the cache check is a single primary key lookup.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    state = models.UUIDField()
+    kind = models.CharField(max_length=12, choices=V1RunKind.to_choices())
+    runtime = models.CharField(max_length=12, null=True, blank=True)
+    run = models.ForeignKey("db.Run", on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(
+        max_length=16, blank=True, null=True, choices=V1Statuses.to_choices()
+    )
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "db"
+        db_table = "db_runcacheentry"
+        abstract = True
@@ -0,0 +1,22 @@
+from django.db import models
+
+from haupt.db.abstracts.uid import UuidModel
+
+
+class BaseRunsBulkJob(UuidModel):
+    """Progress of a bulk action applied to the runs of a project in the background."""
+
+    project = models.ForeignKey(
+        "db.Project", on_delete=models.CASCADE, related_name="+"
+    )
+    action = models.CharField(max_length=16)
+    status = models.CharField(max_length=16)
+    total = models.IntegerField(null=True, blank=True)
+    processed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "db"
+        db_table = "db_runsbulkjob"
+        abstract = True
@@ -55,6 +55,14 @@ class _Models:
     def RunEdge(self) -> Type[models.Model]:
         return self.get_db_model("RunEdge")
 
+    @cached_property
+    def RunCacheEntry(self) -> Type[models.Model]:
+        return self.get_db_model("RunCacheEntry")
+
+    @cached_property
+    def RunsBulkJob(self) -> Type[models.Model]:
+        return self.get_db_model("RunsBulkJob")
+
     @cached_property
     def ProjectVersion(self) -> Type[models.Model]:
         return self.get_db_model("ProjectVersion")
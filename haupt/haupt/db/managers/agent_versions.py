@@ -0,0 +1,64 @@
+import asyncio
+
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from polyaxon.schemas import LifeCycle, V1Statuses
+
+AGENT_STATE_VERSION_KEY = "agent_state_version"
+AGENT_STATE_VERSION_HEADER = "X-Polyaxon-Agent-State-Version"
+AGENT_STATE_WAIT_INTERVAL = 0.5
+# Transitions that produce new work for the agent or free some of its budget
+AGENT_STATE_STATUSES = {
+    V1Statuses.ON_SCHEDULE,
+    V1Statuses.COMPILED,
+    V1Statuses.QUEUED,
+    V1Statuses.STOPPING,
+    V1Statuses.RESUMING,
+    V1Statuses.RETRYING,
+} | LifeCycle.DONE_VALUES
+
+
+def get_agent_state_version() -> int:
+    return cache.get(AGENT_STATE_VERSION_KEY) or 0
+
+
+def bump_agent_state_version() -> int:
+    try:
+        return cache.incr(AGENT_STATE_VERSION_KEY)
+    except ValueError:
+        # The counter is missing or was evicted
+        if cache.add(AGENT_STATE_VERSION_KEY, 1, timeout=None):
+            return 1
+        return cache.incr(AGENT_STATE_VERSION_KEY)
+
+
+def notify_agent_state(statuses: Iterable[Optional[str]]):
+    """Bumps the agent state version if any of the statuses is relevant to the agent.
+
+    The version is bumped after the transaction is committed,
+    so a notified agent always reads the new statuses.
+    The version is only shared by the API workers if the cache is shared.
+    """
+    if settings.SHARED_CACHE_ENABLED and AGENT_STATE_STATUSES.intersection(statuses):
+        transaction.on_commit(bump_agent_state_version)
+
+
+async def wait_agent_state_version(version: int, timeout: float) -> int:
+    """Waits until the agent state version differs from `version` or the timeout expires.
+
+    The wait only reads the shared cache and does not hold a worker thread,
+    so idle agents do not generate any database queries.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    current = await cache.aget(AGENT_STATE_VERSION_KEY) or 0
+    while current == version and loop.time() < deadline:
+        await asyncio.sleep(
+            min(AGENT_STATE_WAIT_INTERVAL, max(deadline - loop.time(), 0))
+        )
+        current = await cache.aget(AGENT_STATE_VERSION_KEY) or 0
+    return current
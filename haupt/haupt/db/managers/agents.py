@@ -2,14 +2,19 @@ from datetime import timedelta
 from typing import Dict, List, Optional, Tuple
 
 from django.conf import settings as dj_settings
-from django.db.models import Count, Q
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When, Window
+from django.db.models.functions import RowNumber
 from django.utils.timezone import now
 
 from haupt.background.celeryp.tasks import CronsCeleryTasks, SchedulerCeleryTasks
 from haupt.common import workers
 from haupt.db.defs import Models
 from haupt.db.managers.live_state import confirm_delete_runs
-from haupt.db.managers.queues import get_num_to_start
+from haupt.db.managers.queues import (
+    QueueDispatchers,
+    get_fair_share_queued_runs,
+    get_num_to_start,
+)
 from haupt.db.managers.runs import collect_pipeline_controller_ids
 from haupt.db.managers.statuses import bulk_new_run_status
 from haupt.db.queries.runs import STATUS_UPDATE_COLUMNS_ONLY
@@ -256,82 +261,96 @@ def get_checks_runs(
     return values
 
 
-def get_runs_by_pipeline(
-    controller_id: int,
-    pipeline_id: int,
-    concurrency: int,
-    consumed: int,
-    max_budget: Optional[int],
+def get_ranked_compiled_runs(
+    parent_field: str,
+    limits: Dict[int, int],
     managed_by: Optional[ManagedBy] = ManagedBy.AGENT,
-) -> List[Models.Run]:
-    num_to_run = get_num_to_start(
-        concurrency=concurrency, consumed=consumed, max_budget=max_budget
-    )
-    if num_to_run < 1:
-        return []
-
-    return Models.Run.objects.filter(
-        controller_id=controller_id,
-        pipeline_id=pipeline_id,
-        status=V1Statuses.COMPILED,
-        pending__isnull=True,
-        managed_by=managed_by,
-    ).order_by("created_at")[:num_to_run]
-
+    **filters,
+) -> Dict[int, List[Models.Run]]:
+    """Returns the oldest compiled runs of each parent, up to the parent's limit.
+
+    The runs of all parents are ranked by creation date with a single window query.
+    """
+    limits = {k: v for k, v in limits.items() if v > 0}
+    if not limits:
+        return {}
 
-def check_pipelines(
-    controller_id: int, max_budget: int
-) -> Tuple[List[Models.Run], bool]:
-    # TODO: TESTS
-    # We queue runs managed by children pipelines
+    runs = (
+        Models.Run.objects.filter(
+            status=V1Statuses.COMPILED,
+            pending__isnull=True,
+            managed_by=managed_by,
+            **{"{}__in".format(parent_field): list(limits.keys())},
+            **filters,
+        )
+        .annotate(
+            parent_rank=Window(
+                RowNumber(),
+                partition_by=F(parent_field),
+                order_by=[F("created_at").asc(), F("id").asc()],
+            ),
+            parent_limit=Case(
+                *[When(**{parent_field: k}, then=Value(v)) for k, v in limits.items()],
+                output_field=IntegerField(),
+            ),
+        )
+        .filter(parent_rank__lte=F("parent_limit"))
+        .order_by(parent_field, "parent_rank")
+    )
+    results = {}
+    for run in runs:
+        results.setdefault(getattr(run, parent_field), []).append(run)
+    return results
+
+
+def check_pipelines(budgets: Dict[int, int]) -> Tuple[List[Models.Run], bool]:
+    """Queues the runs managed by the nested pipelines of the controllers.
+
+    The budgets map each controller to its remaining budget,
+    which is consumed by its pipelines in order.
+    """
+    if not budgets:
+        return [], False
+
+    budgets = dict(budgets)
+    pipelines = list(get_annotated_controllers_pipelines(list(budgets.keys())))
+    # The initial budget is an upper bound of what each pipeline can start
+    runs_by_pipeline = get_ranked_compiled_runs(
+        parent_field="pipeline_id",
+        limits={
+            p[0]: get_num_to_start(
+                concurrency=p[2], consumed=p[3], max_budget=budgets[p[1]]
+            )
+            for p in pipelines
+        },
+        controller_id__in=list(budgets.keys()),
+    )
     to_update = []
-    for pipeline in get_annotated_pipelines(controller_id=controller_id):
-        runs = get_runs_by_pipeline(
-            controller_id=controller_id,
-            pipeline_id=pipeline[0],
-            concurrency=pipeline[1],
-            consumed=pipeline[2],
-            max_budget=max_budget,
+    full = False
+    for pipeline_id, controller_id, concurrency, consumed in pipelines:
+        max_budget = budgets[controller_id]
+        if max_budget < 1:
+            continue
+        num_to_run = get_num_to_start(
+            concurrency=concurrency, consumed=consumed, max_budget=max_budget
         )
+        runs = runs_by_pipeline.get(pipeline_id, [])[: max(num_to_run, 0)]
         to_update += runs
-        if max_budget:
-            max_budget -= len(runs)
-        if max_budget < 1:
-            return to_update, True
-
-    return to_update, False
-
-
-def get_runs_by_controller(
-    controller_id: int,
-    concurrency: int,
-    consumed: int,
-    max_budget: Optional[int],
-    managed_by: Optional[ManagedBy] = ManagedBy.AGENT,
-) -> List[Models.Run]:
-    num_to_run = get_num_to_start(
-        concurrency=concurrency, consumed=consumed, max_budget=max_budget
-    )
-    if num_to_run < 1:
-        return []
+        budgets[controller_id] = max_budget - len(runs)
+        if budgets[controller_id] < 1:
+            full = True
 
-    return Models.Run.objects.filter(
-        controller_id=controller_id,
-        pipeline_id=controller_id,
-        status=V1Statuses.COMPILED,
-        pending__isnull=True,
-        managed_by=managed_by,
-    ).order_by("created_at")[:num_to_run]
+    return to_update, full
 
 
-def get_annotated_pipelines(
-    controller_id: int, managed_by: Optional[ManagedBy] = ManagedBy.AGENT
-) -> List[Tuple[int, int, int]]:
+def get_annotated_controllers_pipelines(
+    controller_ids: List[int], managed_by: Optional[ManagedBy] = ManagedBy.AGENT
+) -> List[Tuple[int, int, int, int]]:
     pipelines = (
         Models.Run.objects.filter(
             kind__in=[V1RunKind.DAG, V1RunKind.MATRIX],
             status=V1Statuses.RUNNING,
-            controller_id=controller_id,
+            controller_id__in=controller_ids,
             pipeline_runs__status=V1Statuses.COMPILED,
             pending__isnull=True,
             managed_by=managed_by,
@@ -349,7 +368,9 @@ def get_annotated_pipelines(
             distinct=True,
         ),
     )
-    return pipelines.values_list("id", "meta_info__concurrency", "consumed")
+    return pipelines.order_by("id").values_list(
+        "id", "controller_id", "meta_info__concurrency", "consumed"
+    )
 
 
 def get_annotated_controllers(
@@ -388,21 +409,28 @@ def check_controllers(max_budget: int, agent_filters: Optional[Dict] = None) ->
         return True
 
     full = False
-    # TODO: TESTS
-    to_update = []
-    for controller in get_annotated_controllers(agent_filters=agent_filters):
-        # We start by queueing directly managed runs by controller
+    # We start by queueing directly managed runs by controller
+    budgets = {}
+    limits = {}
+    for controller_id, concurrency, consumed in get_annotated_controllers(
+        agent_filters=agent_filters
+    ):
         controller_budget = (
-            controller[1]
-            if (controller[1] is not None and controller[1] > 0)
-            else max_budget
+            concurrency if (concurrency is not None and concurrency > 0) else max_budget
         )
-        runs = get_runs_by_controller(
-            controller_id=controller[0],
-            concurrency=controller_budget,
-            consumed=controller[2],
-            max_budget=max_budget,
+        budgets[controller_id] = controller_budget
+        limits[controller_id] = get_num_to_start(
+            concurrency=controller_budget, consumed=consumed, max_budget=max_budget
         )
+    runs_by_controller = get_ranked_compiled_runs(
+        parent_field="controller_id",
+        limits=limits,
+        pipeline_id=F("controller_id"),
+    )
+    to_update = []
+    pipeline_budgets = {}
+    for controller_id, controller_budget in budgets.items():
+        runs = runs_by_controller.get(controller_id, [])
         if controller_budget:
             controller_budget -= len(runs)
         to_update += runs
@@ -411,13 +439,12 @@ def check_controllers(max_budget: int, agent_filters: Optional[Dict] = None) ->
         if controller_budget < 1:
             full = True
             continue
+        pipeline_budgets[controller_id] = controller_budget
 
-        pipeline_runs, pipeline_full = check_pipelines(
-            controller_id=controller[0], max_budget=controller_budget
-        )
-        to_update += pipeline_runs
-        if pipeline_full:
-            full = True
+    pipeline_runs, pipeline_full = check_pipelines(budgets=pipeline_budgets)
+    to_update += pipeline_runs
+    if pipeline_full:
+        full = True
 
     # Split runs to pipeline and operations
     pipelines_to_update = [i for i in to_update if i.has_pipeline]
@@ -466,21 +493,25 @@ def get_queued_runs(
         full = True
         num_to_run = max_budget
 
-    queryset = (
-        Models.Run.objects.filter(
-            kind__in=[
-                V1RunKind.JOB,
-                V1RunKind.SERVICE,
-                V1RunKind.TUNER,
-                V1RunKind.NOTIFIER,
-            ],
-            status=V1Statuses.QUEUED,
-            pending__isnull=True,
-            managed_by=managed_by,
-        )
-        .order_by("created_at")
-        .prefetch_related("project")[:num_to_run]
+    queryset = Models.Run.objects.filter(
+        kind__in=[
+            V1RunKind.JOB,
+            V1RunKind.SERVICE,
+            V1RunKind.TUNER,
+            V1RunKind.NOTIFIER,
+        ],
+        status=V1Statuses.QUEUED,
+        pending__isnull=True,
+        managed_by=managed_by,
     )
+    if dj_settings.SCHEDULER_QUEUE_DISPATCHER == QueueDispatchers.FAIR:
+        runs = get_fair_share_queued_runs(
+            queryset=queryset, num_to_run=num_to_run, managed_by=managed_by
+        )
+    else:
+        runs = list(
+            queryset.order_by("created_at").prefetch_related("project")[:num_to_run]
+        )
 
     # Set scheduled
     condition = V1StatusCondition.get_condition(
@@ -489,7 +520,7 @@ def get_queued_runs(
         reason="AgentController",
         message="Operation is scheduled",
     )
-    bulk_new_run_status(runs=[i for i in queryset], condition=condition)
+    bulk_new_run_status(runs=runs, condition=condition)
 
     data = [
         (
@@ -499,7 +530,7 @@ def get_queued_runs(
             run.content,
             getattr(run, "namespace", None),
         )
-        for run in queryset
+        for run in runs
     ]
 
     return data, full
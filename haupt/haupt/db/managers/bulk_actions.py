@@ -0,0 +1,278 @@
+from collections import namedtuple
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from clipped.utils.tz import now
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from haupt.common import auditor, query
+from haupt.common.events.registry.archive import RUN_ARCHIVED_ACTOR
+from haupt.common.events.registry.run import (
+    RUN_APPROVED_ACTOR,
+    RUN_DELETED_ACTOR,
+    RUN_DONE,
+    RUN_SKIPPED_ACTOR,
+    RUN_STOPPED_ACTOR,
+)
+from haupt.db.abstracts.runs import BaseRun
+from haupt.db.abstracts.runs_bulk_jobs import BaseRunsBulkJob
+from haupt.db.defs import Models
+from haupt.db.managers.live_state import run_queryset_stopping
+from haupt.db.managers.statuses import bulk_new_run_status
+from haupt.db.query_managers.run import RunQueryManager
+from polyaxon.schemas import (
+    LifeCycle,
+    LiveState,
+    V1RunPending,
+    V1StatusCondition,
+    V1Statuses,
+)
+
+RUNS_BULK_JOB_TTL = 24 * 60 * 60
+
+
+class RunsBulkActions:
+    STOP = "stop"
+    SKIP = "skip"
+    APPROVE = "approve"
+    DELETE = "delete"
+    ARCHIVE = "archive"
+
+    VALUES = {STOP, SKIP, APPROVE, DELETE, ARCHIVE}
+
+
+class RunsBulkJobStatuses:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def audit_runs(runs: List[BaseRun], event_type: str, audit: Dict, done: bool = False):
+    for run in runs:
+        auditor.record(event_type=event_type, instance=run, **audit)
+        if done:
+            auditor.record(
+                event_type=RUN_DONE, instance=run, previous_status=run.status
+            )
+
+
+def get_user_condition(
+    condition_type: str, message: str, meta_info: Optional[Dict] = None
+) -> V1StatusCondition:
+    condition = V1StatusCondition.get_condition(
+        type=condition_type,
+        status="True",
+        reason="EventHandler",
+        message=message,
+    )
+    if meta_info:
+        condition.meta_info = meta_info
+    return condition
+
+
+def stop_runs_queryset(
+    queryset: QuerySet, audit: Dict, meta_info: Optional[Dict] = None
+):
+    # Immediate stop
+    stopped = queryset.filter(status__in=LifeCycle.SAFE_STOP_VALUES)
+    runs = [r for r in stopped]
+    condition = get_user_condition(
+        V1Statuses.STOPPED, "User requested to stop the run.", meta_info
+    )
+    bulk_new_run_status(stopped, condition)
+    audit_runs(runs, RUN_STOPPED_ACTOR, audit, done=True)
+
+    runs = [
+        r for r in queryset.exclude(status__in=LifeCycle.DONE_OR_IN_PROGRESS_VALUES)
+    ]
+    condition = get_user_condition(
+        V1Statuses.STOPPING, "User requested to stop the run.", meta_info
+    )
+    bulk_new_run_status(runs, condition)
+    audit_runs(runs, RUN_STOPPED_ACTOR, audit, done=True)
+
+
+def skip_runs_queryset(
+    queryset: QuerySet, audit: Dict, meta_info: Optional[Dict] = None
+):
+    queryset = queryset.filter(status__in=LifeCycle.SAFE_STOP_VALUES)
+    runs = [r for r in queryset]
+    condition = get_user_condition(
+        V1Statuses.SKIPPED, "User requested to skip the run.", meta_info
+    )
+    bulk_new_run_status(queryset, condition)
+    audit_runs(runs, RUN_SKIPPED_ACTOR, audit, done=True)
+
+
+def approve_runs_queryset(queryset: QuerySet, audit: Dict, **kwargs):
+    queryset = queryset.filter(
+        pending__in={V1RunPending.APPROVAL, V1RunPending.CACHE},
+    )
+    runs = [r for r in queryset]
+    queryset.update(pending=None)
+    audit_runs(runs, RUN_APPROVED_ACTOR, audit)
+
+
+def delete_runs_queryset(queryset: QuerySet, audit: Dict, **kwargs):
+    runs = [r for r in queryset]
+    audit_runs(runs, RUN_DELETED_ACTOR, audit)
+    # Deletion in progress
+    queryset.update(live_state=LiveState.DELETION_PROGRESSING)
+
+
+def archive_runs_queryset(queryset: QuerySet, audit: Dict, **kwargs):
+    # Set to stopping all runs that are not ended yet
+    run_queryset_stopping(queryset=queryset)
+    runs = [r for r in queryset]
+    run_ids = [r.id for r in runs]
+    # Pipeline/controller children runs
+    children = Models.Run.objects.filter(
+        Q(pipeline_id__in=run_ids) | Q(controller_id__in=run_ids)
+    ).exclude(live_state=LiveState.ARCHIVED)
+    run_queryset_stopping(queryset=children)
+    children.update(live_state=LiveState.ARCHIVED, archived_at=now())
+    queryset.update(live_state=LiveState.ARCHIVED, archived_at=now())
+    audit_runs(runs, RUN_ARCHIVED_ACTOR, audit)
+
+
+RUNS_BULK_ACTIONS = {
+    RunsBulkActions.STOP: stop_runs_queryset,
+    RunsBulkActions.SKIP: skip_runs_queryset,
+    RunsBulkActions.APPROVE: approve_runs_queryset,
+    RunsBulkActions.DELETE: delete_runs_queryset,
+    RunsBulkActions.ARCHIVE: archive_runs_queryset,
+}
+
+
+def get_runs_bulk_action_queryset(action: str) -> QuerySet:
+    if action == RunsBulkActions.STOP:
+        return Models.Run.all
+    if action in {RunsBulkActions.SKIP, RunsBulkActions.DELETE}:
+        return Models.Run.restorable
+    return Models.Run.objects
+
+
+class RunsBulkActionRequest(namedtuple("RunsBulkActionRequest", "user")):
+    pass
+
+
+def filter_runs_bulk_action_queryset(
+    action: str, project_id: int, query_spec: str, user_id: Optional[int]
+) -> QuerySet:
+    """Returns the project's runs matching the query of a bulk action.
+
+    The endpoint validates the query with the queryset processed by the background job,
+    the user resolves the conditions depending on the request, e.g. `mine`.
+    """
+    queryset = get_runs_bulk_action_queryset(action).filter(project_id=project_id)
+    return query.filter_queryset(
+        manager=RunQueryManager,
+        query_spec=query_spec,
+        queryset=queryset,
+        request=RunsBulkActionRequest(user=user_id),
+    )
+
+
+def get_runs_bulk_job_data(job: BaseRunsBulkJob) -> Dict:
+    return {
+        "uuid": job.uuid.hex,
+        "action": job.action,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+    }
+
+
+def get_runs_bulk_job(project_id: int, job_uuid: str) -> Optional[Dict]:
+    try:
+        job = Models.RunsBulkJob.objects.get(
+            project_id=project_id,
+            uuid=job_uuid,
+            created_at__gt=now() - timedelta(seconds=RUNS_BULK_JOB_TTL),
+        )
+    except (Models.RunsBulkJob.DoesNotExist, ValidationError):
+        return None
+    return get_runs_bulk_job_data(job)
+
+
+def set_runs_bulk_job(project_id: int, job: Dict, **kwargs) -> Dict:
+    job.update(kwargs)
+    Models.RunsBulkJob.objects.filter(project_id=project_id, uuid=job["uuid"]).update(
+        **kwargs
+    )
+    return job
+
+
+def create_runs_bulk_job(project_id: int, action: str) -> Dict:
+    # Jobs are only polled for a day, older jobs are cleaned on the next creation
+    Models.RunsBulkJob.objects.filter(
+        created_at__lte=now() - timedelta(seconds=RUNS_BULK_JOB_TTL)
+    ).delete()
+    job = Models.RunsBulkJob.objects.create(
+        project_id=project_id,
+        action=action,
+        status=RunsBulkJobStatuses.QUEUED,
+    )
+    return get_runs_bulk_job_data(job)
+
+
+def process_runs_bulk_action(
+    action: str,
+    queryset: QuerySet,
+    audit: Dict,
+    meta_info: Optional[Dict] = None,
+    batch_size: Optional[int] = None,
+    project_id: Optional[int] = None,
+    job: Optional[Dict] = None,
+) -> int:
+    """Applies the action to all runs matching the queryset in batches.
+
+    Batches are paginated by id, so runs that stop matching the filter
+    after they are processed do not shift the next pages.
+    Each batch is committed separately with its audit events.
+    """
+    batch_size = batch_size or settings.SCHEDULER_BULK_ACTIONS_BATCH_SIZE
+    manager = get_runs_bulk_action_queryset(action)
+    fct = RUNS_BULK_ACTIONS[action]
+    if job:
+        set_runs_bulk_job(
+            project_id,
+            job,
+            status=RunsBulkJobStatuses.RUNNING,
+            total=queryset.count(),
+        )
+
+    last_id = 0
+    processed = 0
+    try:
+        while True:
+            ids = list(
+                queryset.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                fct(
+                    queryset=manager.filter(id__in=ids),
+                    audit=audit,
+                    meta_info=meta_info,
+                )
+            last_id = ids[-1]
+            processed += len(ids)
+            if job:
+                set_runs_bulk_job(project_id, job, processed=processed)
+    except Exception:
+        if job:
+            set_runs_bulk_job(project_id, job, status=RunsBulkJobStatuses.FAILED)
+        raise
+
+    if job:
+        set_runs_bulk_job(project_id, job, status=RunsBulkJobStatuses.SUCCEEDED)
+    return processed
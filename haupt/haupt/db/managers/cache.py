@@ -1,12 +1,14 @@
 import uuid
 
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
+from clipped.utils.enums import get_enum_value
 from clipped.utils.lists import to_list
 
+from haupt.db.abstracts.runs import BaseRun
 from haupt.db.defs import Models
 from polyaxon._k8s.k8s_schemas import V1Container
-from polyaxon.schemas import V1IO, V1Cache, V1CloningKind, V1Init
+from polyaxon.schemas import V1IO, LifeCycle, V1Cache, V1CloningKind, V1Init, V1Statuses
 
 
 def get_run_io_state(
@@ -172,3 +174,66 @@ def get_cache_clones(run_id: int):
     return Models.Run.objects.filter(
         original_id=run_id, cloning_kind=V1CloningKind.CACHE
     ).values_list("id", flat=True)
+
+
+def get_cache_entry_id(
+    state: uuid.UUID, kind: str, runtime: Optional[str]
+) -> uuid.UUID:
+    if not isinstance(state, uuid.UUID):
+        state = uuid.UUID(str(state))
+    return uuid.uuid5(
+        state, "{}.{}".format(get_enum_value(kind), get_enum_value(runtime) or "")
+    )
+
+
+def get_cache_entry(run: BaseRun) -> Optional[BaseRun]:
+    if not run.state:
+        return None
+    return Models.RunCacheEntry.objects.filter(
+        id=get_cache_entry_id(run.state, run.kind, run.runtime)
+    ).first()
+
+
+def set_cache_entry(run: BaseRun):
+    """Points the cache entry of the run's state to the run or to its original."""
+    if not run.state:
+        return
+    cached = run
+    if run.original_id:
+        cached = (
+            Models.Run.all.filter(id=run.original_id)
+            .only("id", "status", "finished_at")
+            .first()
+        ) or run
+    Models.RunCacheEntry.objects.update_or_create(
+        id=get_cache_entry_id(run.state, run.kind, run.runtime),
+        defaults={
+            "state": run.state,
+            "kind": run.kind,
+            "runtime": run.runtime,
+            "run_id": cached.id,
+            "status": cached.status,
+            "finished_at": cached.finished_at,
+        },
+    )
+
+
+def update_cache_entries_status(runs: Iterable[BaseRun]):
+    """Keeps the entries pointing to the runs in sync with their new status.
+
+    A succeeded run becomes the cache of its state,
+    a run that cannot be used as a cache anymore only updates its own entries.
+    Runs without a state do not have any entry.
+    """
+    groups = {}
+    for run in runs:
+        if not run.state:
+            continue
+        if run.status == V1Statuses.SUCCEEDED:
+            set_cache_entry(run)
+        elif run.status == V1Statuses.STOPPING or LifeCycle.is_done(run.status):
+            groups.setdefault((run.status, run.finished_at), []).append(run.id)
+    for (status, finished_at), run_ids in groups.items():
+        Models.RunCacheEntry.objects.filter(run_id__in=run_ids).update(
+            status=status, finished_at=finished_at
+        )
@@ -1,47 +1,61 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Tuple
 
-from django.db.models import QuerySet
+from django.db.models import Count, F, Q
 
 from haupt.db.abstracts.runs import BaseRun
 from haupt.db.defs import Models
-from polyaxon.schemas import dags
-
-
-def get_run_upstream(
-    run: BaseRun, id_field: str = "id", pipeline_id: Optional[int] = None
-) -> QuerySet:
-    upstream_runs = run.upstream_runs
-    if pipeline_id:
-        upstream_runs = upstream_runs.filter(pipeline_id=pipeline_id)
-    return upstream_runs.values_list(id_field, flat=True)
-
-
-def get_run_downstream(
-    run: BaseRun, id_field: str = "id", pipeline_id: Optional[int] = None
-) -> QuerySet:
-    downstream_runs = run.downstream_runs
-    if pipeline_id:
-        downstream_runs = downstream_runs.filter(pipeline_id=pipeline_id)
-    return downstream_runs.values_list(id_field, flat=True)
+from polyaxon.schemas import LifeCycle, LiveState, V1Statuses, dags
 
 
 def get_run_dag(run: BaseRun) -> Tuple[Dict, Dict]:
-    runs = run.pipeline_runs.only("id", "pipeline_id", "uuid").prefetch_related(
-        "upstream_runs"
+    """Builds the pipeline's dag with a single scan of its runs and upstream edges.
+
+    Each run is returned once per upstream edge, only live upstream runs are kept.
+    """
+    runs = run.pipeline_runs.only("id", "pipeline_id", "uuid").annotate(
+        upstream_run_id=F("upstream_edges__upstream_id"),
+        upstream_live_state=F("upstream_edges__upstream__live_state"),
     )
-    ops = ((run, get_run_upstream(run)) for run in runs)
-    return dags.process_dag(ops)
+    ops = {}
+    for op in runs:
+        _, upstream = ops.setdefault(op.id, (op, []))
+        if op.upstream_run_id and op.upstream_live_state == LiveState.LIVE:
+            upstream.append(op.upstream_run_id)
+    return dags.process_dag(ops.values())
 
 
 def get_run_graph(filters) -> Dict[str, List[str]]:
-    runs = (
-        Models.Run.objects.filter(**filters)
-        .only("id", "pipeline_id", "uuid")
-        .prefetch_related("downstream_runs")
+    """Returns the downstream uuids of the runs with a single scan of their edges."""
+    rows = Models.Run.objects.filter(**filters).values_list(
+        "uuid",
+        "downstream_edges__downstream__uuid",
+        "downstream_edges__downstream__live_state",
+    )
+    graph = {}
+    for run_uuid, downstream_uuid, downstream_live_state in rows:
+        downstream = graph.setdefault(run_uuid.hex, {"downstream": []})["downstream"]
+        if downstream_uuid and downstream_live_state == LiveState.LIVE:
+            downstream.append(downstream_uuid.hex)
+    return graph
+
+
+def get_upstream_status_counts(run_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """Returns the number of upstream runs per status class for each downstream run.
+
+    A single aggregate query over the run edges, runs without upstream are omitted.
+    """
+    counts = (
+        Models.RunEdge.objects.filter(downstream_id__in=list(run_ids))
+        .values("downstream_id")
+        .annotate(
+            all=Count("upstream_id"),
+            done=Count(
+                "upstream_id", filter=Q(upstream__status__in=LifeCycle.DONE_VALUES)
+            ),
+            succeeded=Count(
+                "upstream_id", filter=Q(upstream__status=V1Statuses.SUCCEEDED)
+            ),
+            failed=Count("upstream_id", filter=Q(upstream__status=V1Statuses.FAILED)),
+        )
     )
-    return {
-        run.uuid.hex: {
-            "downstream": [uid.hex for uid in get_run_downstream(run, "uuid")]
-        }
-        for run in runs
-    }
+    return {c.pop("downstream_id"): c for c in counts}
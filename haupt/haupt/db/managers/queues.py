@@ -1,4 +1,10 @@
-from typing import Optional
+from typing import List, Optional
+
+from django.db.models import Count, F, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+from haupt.db.defs import Models
+from polyaxon.schemas import LifeCycle, ManagedBy
 
 
 def get_num_to_start(concurrency: int, consumed: int, max_budget: Optional[int]) -> int:
@@ -33,3 +39,60 @@ def get_num_to_start(concurrency: int, consumed: int, max_budget: Optional[int])
     target = concurrency - consumed
 
     return target if target < max_to_start else max_to_start
+
+
+class QueueDispatchers:
+    FIFO = "fifo"
+    FAIR = "fair"
+
+
+# Runs are grouped by project and user when sharing the agent's budget
+FAIR_SHARE_FIELDS = ("project_id", "user_id")
+
+
+def get_fair_share_queued_runs(
+    queryset: QuerySet,
+    num_to_run: int,
+    managed_by: Optional[ManagedBy] = ManagedBy.AGENT,
+) -> List[Models.Run]:
+    """Selects the queued runs by fair share across projects and users.
+
+    The queued runs of each group are ranked by creation date, and scored by
+    the group's running runs plus their rank, so the groups with the fewest
+    running runs are served first and a large sweep does not starve the others.
+
+    Queue priority and per-queue concurrency are out of scope: runs do not have
+    a queue relation in this tree, so all groups have the same weight.
+    """
+    if num_to_run < 1:
+        return []
+
+    running = (
+        Models.Run.objects.filter(
+            status__in=LifeCycle.ON_K8S_VALUES,
+            pending__isnull=True,
+            managed_by=managed_by,
+        )
+        .values(*FAIR_SHARE_FIELDS)
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    consumed = {tuple(r[f] for f in FAIR_SHARE_FIELDS): r["count"] for r in running}
+
+    candidates = (
+        queryset.annotate(
+            share_rank=Window(
+                RowNumber(),
+                partition_by=[F(f) for f in FAIR_SHARE_FIELDS],
+                order_by=[F("created_at").asc(), F("id").asc()],
+            )
+        )
+        .filter(share_rank__lte=num_to_run)
+        .prefetch_related("project")
+    )
+
+    def get_score(run: Models.Run):
+        key = tuple(getattr(run, f) for f in FAIR_SHARE_FIELDS)
+        return consumed.get(key, 0) + run.share_rank, run.created_at, run.id
+
+    return sorted(candidates, key=get_score)[:num_to_run]
@@ -125,10 +125,6 @@ def get_runs_for(
     return query
 
 
-def is_pipeline_done(run: BaseRun) -> bool:
-    return not run.pipeline_runs.exclude(status__in=LifeCycle.DONE_VALUES).exists()
-
-
 def get_scheduled_runs(run_id: int, controller: bool = False):
     return get_runs_for(
         run_id=run_id, status=V1Statuses.SCHEDULED, statuses=None, controller=controller
@@ -189,29 +185,23 @@ def get_on_k8s_runs(run_id: int, controller: bool = False):
     )
 
 
-def get_failed_stopped_and_all_runs(run_id: int, controller: bool = False):
-    query = get_runs_for(
-        run_id=run_id,
-        status=None,
-        statuses=None,
-        controller=controller,
-        distinct=False,
-    )
-    return query.aggregate(
-        all=Count(
-            "id",
-            distinct=True,
-        ),
-        failed=Count(
-            "id",
-            filter=Q(status=V1Statuses.FAILED),
-            distinct=True,
-        ),
-        stopped=Count(
-            "id",
-            filter=Q(status=V1Statuses.STOPPED),
-            distinct=True,
+def get_pipeline_stats(run_id: int, **aggregates) -> Dict[str, int]:
+    """Counts the runs of a pipeline by status class in a single query.
+
+    Additional aggregates, e.g. on the runs managed by the same controller,
+    are computed in the same query.
+    """
+    pipeline_filter = Q(pipeline_id=run_id)
+    return Models.Run.objects.filter(
+        Q(pipeline_id=run_id) | Q(controller_id=run_id)
+    ).aggregate(
+        all=Count("id", filter=pipeline_filter),
+        pending=Count(
+            "id", filter=pipeline_filter & ~Q(status__in=LifeCycle.DONE_VALUES)
         ),
+        failed=Count("id", filter=pipeline_filter & Q(status=V1Statuses.FAILED)),
+        stopped=Count("id", filter=pipeline_filter & Q(status=V1Statuses.STOPPED)),
+        **aggregates,
     )
 
 
@@ -15,6 +15,8 @@ from haupt.common.events.registry.run import (
 )
 from haupt.db.abstracts.runs import BaseRun
 from haupt.db.defs import Models
+from haupt.db.managers.agent_versions import notify_agent_state
+from haupt.db.managers.cache import update_cache_entries_status
 from polyaxon.schemas import LifeCycle, V1StatusCondition, V1Statuses
 
 
@@ -118,6 +120,9 @@ def bulk_new_run_status(
         condition=condition,
         additional_fields=additional_fields,
     )
+    update_cache_entries_status(runs)
+    if runs:
+        notify_agent_state({condition.type})
 
 
 def new_run_status(
@@ -132,6 +137,9 @@ def new_run_status(
         additional_fields=additional_fields,
         force=force,
     )
+    if previous_status != run.status:
+        update_cache_entries_status([run])
+        notify_agent_state({run.status})
     # Do not audit the new status since it's the same as the previous one
     if (
         condition.type in {V1Statuses.CREATED, V1Statuses.STOPPING}
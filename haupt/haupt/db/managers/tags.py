@@ -1,7 +1,14 @@
+import json
+
 from collections.abc import Mapping
 from typing import List, Optional
 
+from clipped.utils.lists import to_list
+
 from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
 
 
 def normalize_tags(tags) -> Optional[List[str]]:
@@ -42,3 +49,48 @@ def denormalize_tags(tags: Optional[List[str]]):
     if settings.DB_ENGINE_NAME == "sqlite":
         return {t: "" for t in tags}
     return tags
+
+
+def get_merge_tags_expression(column: str, tags: List[str]) -> RawSQL:
+    """
+    Returns an expression merging tags into the column, keeping the existing order.
+
+    SQLite merges the tags as JSON object keys with `json_patch`,
+    rows with tags stored in a list are converted to the dict format.
+    PostgreSQL concatenates the tags missing from the array.
+    """
+    if settings.DB_ENGINE_NAME == "sqlite":
+        return RawSQL(
+            "json_patch("
+            "CASE json_type({column}) "
+            "WHEN 'object' THEN {column} "
+            "WHEN 'array' THEN ("
+            "SELECT COALESCE(json_group_object(value, ''), '{{}}') "
+            "FROM json_each({column})"
+            ") "
+            "ELSE '{{}}' END, %s)".format(column=column),
+            (json.dumps(denormalize_tags(tags)),),
+        )
+    return RawSQL(
+        "COALESCE({column}, '{{}}') || ARRAY("
+        "SELECT t FROM unnest(%s::varchar(64)[]) WITH ORDINALITY AS n(t, i) "
+        "WHERE NOT t = ANY(COALESCE({column}, '{{}}')) ORDER BY i"
+        ")".format(column=column),
+        (tags,),
+    )
+
+
+def bulk_add_tags(queryset: QuerySet, tags: List[str]) -> int:
+    """
+    Adds the tags to all rows of the queryset with a single `UPDATE`.
+
+    Returns the number of updated rows.
+    """
+    tags = to_list(normalize_tags(tags), check_none=True, to_unique=True)
+    if not tags:
+        return 0
+    column = "{}.{}".format(
+        connection.ops.quote_name(queryset.model._meta.db_table),
+        connection.ops.quote_name("tags"),
+    )
+    return queryset.update(tags=get_merge_tags_expression(column=column, tags=tags))
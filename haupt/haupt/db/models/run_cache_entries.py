@@ -0,0 +1,5 @@
+from haupt.db.abstracts.run_cache_entries import BaseRunCacheEntry
+
+
+class RunCacheEntry(BaseRunCacheEntry):
+    pass
@@ -0,0 +1,5 @@
+from haupt.db.abstracts.runs_bulk_jobs import BaseRunsBulkJob
+
+
+class RunsBulkJob(BaseRunsBulkJob):
+    pass
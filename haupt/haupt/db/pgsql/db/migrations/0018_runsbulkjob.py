@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:15
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("db", "0017_runcacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RunsBulkJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "uuid",
+                    models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                ("action", models.CharField(max_length=16)),
+                ("status", models.CharField(max_length=16)),
+                ("total", models.IntegerField(blank=True, null=True)),
+                ("processed", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="db.project",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "db_runsbulkjob",
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,166 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Runs preferred as cache, the other statuses are only used if none of these exist
+CACHE_STATUSES = {"processing", "scheduled", "starting", "running", "succeeded"}
+NOT_CACHE_STATUSES = ["failed", "skipped", "upstream_failed", "stopped"]
+
+
+def get_cache_entry_id(state, kind, runtime):
+    # Same key as `haupt.db.managers.cache.get_cache_entry_id` at the time of the migration
+    if not isinstance(state, uuid.UUID):
+        state = uuid.UUID(str(state))
+    return uuid.uuid5(state, "{}.{}".format(kind, runtime or ""))
+
+
+def migrate_run_cache_entries(apps, schema_editor):
+    Run = apps.get_model("db", "Run")
+    RunCacheEntry = apps.get_model("db", "RunCacheEntry")
+
+    entries = {}
+    runs = (
+        Run.objects.filter(state__isnull=False)
+        .exclude(status__in=NOT_CACHE_STATUSES)
+        .order_by("created_at")
+        .values_list(
+            "id",
+            "state",
+            "kind",
+            "runtime",
+            "status",
+            "finished_at",
+            "original_id",
+            "original__status",
+            "original__finished_at",
+        )
+    )
+    for (
+        run_id,
+        state,
+        kind,
+        runtime,
+        status,
+        finished_at,
+        original_id,
+        original_status,
+        original_finished_at,
+    ) in runs.iterator(chunk_size=2000):
+        entry_id = get_cache_entry_id(state, kind, runtime)
+        is_preferred = status in CACHE_STATUSES
+        current = entries.get(entry_id)
+        if current and current[0] and not is_preferred:
+            continue
+        if original_id:
+            run_id, status, finished_at = (
+                original_id,
+                original_status,
+                original_finished_at,
+            )
+        entries[entry_id] = (
+            is_preferred,
+            RunCacheEntry(
+                id=entry_id,
+                state=state,
+                kind=kind,
+                runtime=runtime,
+                run_id=run_id,
+                status=status,
+                finished_at=finished_at,
+            ),
+        )
+
+    RunCacheEntry.objects.bulk_create(
+        [entry for _, entry in entries.values()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("db", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RunCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("state", models.UUIDField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("job", "job"),
+                            ("service", "service"),
+                            ("dag", "dag"),
+                            ("daskcluster", "daskcluster"),
+                            ("raycluster", "raycluster"),
+                            ("mpijob", "mpijob"),
+                            ("tfjob", "tfjob"),
+                            ("pytorchjob", "pytorchjob"),
+                            ("matrix", "matrix"),
+                            ("schedule", "schedule"),
+                            ("tuner", "tuner"),
+                            ("watchdog", "watchdog"),
+                            ("notifier", "notifier"),
+                            ("cleaner", "cleaner"),
+                            ("builder", "builder"),
+                        ],
+                        max_length=12,
+                    ),
+                ),
+                ("runtime", models.CharField(blank=True, max_length=12, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("created", "created"),
+                            ("resuming", "resuming"),
+                            ("on_schedule", "on_schedule"),
+                            ("compiled", "compiled"),
+                            ("queued", "queued"),
+                            ("scheduled", "scheduled"),
+                            ("starting", "starting"),
+                            ("running", "running"),
+                            ("processing", "processing"),
+                            ("stopping", "stopping"),
+                            ("failed", "failed"),
+                            ("stopped", "stopped"),
+                            ("succeeded", "succeeded"),
+                            ("skipped", "skipped"),
+                            ("warning", "warning"),
+                            ("unschedulable", "unschedulable"),
+                            ("upstream_failed", "upstream_failed"),
+                            ("retrying", "retrying"),
+                            ("unknown", "unknown"),
+                            ("done", "done"),
+                        ],
+                        max_length=16,
+                        null=True,
+                    ),
+                ),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="db.run",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "db_runcacheentry",
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(migrate_run_cache_entries, migrations.RunPython.noop),
+    ]
@@ -75,7 +75,8 @@ class APIHandler:
 
         workers_backend.send(
             SchedulerCeleryTasks.RUNS_PREPARE,
-            delay=conf.get(SCHEDULER_ENABLED) and not eager,
+            # Eager runs are prepared in the request, others follow the default backend
+            delay=False if eager else (conf.get(SCHEDULER_ENABLED) or None),
             kwargs={"run_id": event.instance_id},
             eager_kwargs={"run": event.instance},
         )
@@ -176,14 +177,12 @@ class APIHandler:
             bulk_new_run_status(awaiting_build, condition)
 
         if run.pipeline_id:
-            workers_backend.send(
-                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
-                kwargs={"run_id": run.pipeline_id},
+            cls.MANAGER.send_check_pipeline(
+                run_id=run.pipeline_id, workers_backend=workers_backend
             )
         if run.controller_id and run.controller_id != run.pipeline_id:
-            workers_backend.send(
-                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
-                kwargs={"run_id": run.controller_id},
+            cls.MANAGER.send_check_pipeline(
+                run_id=run.controller_id, workers_backend=workers_backend
             )
         if not run.has_pipeline:
             return
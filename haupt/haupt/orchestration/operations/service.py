@@ -8,6 +8,7 @@ from haupt.common.service_interface import Service
 from haupt.db.abstracts.runs import BaseRun
 from haupt.db.defs import Models
 from haupt.db.managers.statuses import new_run_status
+from haupt.orchestration.scheduler.specs import read_operation
 from polyaxon._constants.metadata import (
     META_COPY_ARTIFACTS,
     META_DESTINATION_IMAGE,
@@ -374,10 +375,10 @@ class OperationsService(Service):
         status_meta_info = kwargs.pop("status_meta_info", None)
         recompile = meta_info.pop(META_RECOMPILE, False)
         if recompile:
-            op_spec = V1Operation.read(content)
+            op_spec = read_operation(content)
             content = None
         else:
-            op_spec = V1Operation.read(run.raw_content)  # TODO: Use constructor
+            op_spec = read_operation(run.raw_content)  # TODO: Use constructor
         instance = self.init_run(
             project_id=run.project_id,
             user_id=user_id or run.user_id,
@@ -434,10 +435,10 @@ class OperationsService(Service):
         meta_info = kwargs.pop("meta_info", {}) or {}
         recompile = meta_info.pop(META_RECOMPILE, False)
         if recompile:
-            op_spec = V1Operation.read(content)
+            op_spec = read_operation(content)
             content = None
         else:
-            op_spec = V1Operation.read(run.raw_content)  # TODO: Use constructor
+            op_spec = read_operation(run.raw_content)  # TODO: Use constructor
         original_meta_info = run.meta_info or {}
         original_uuid = run.uuid.hex
         upload_artifacts = original_meta_info.get(META_UPLOAD_ARTIFACTS)
@@ -3,21 +3,30 @@ import logging
 from datetime import datetime
 from functools import reduce
 from operator import __or__ as OR
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from clipped.compact.pydantic import ValidationError as PydanticValidationError
 from clipped.utils.lists import to_list
 from rest_framework.exceptions import ValidationError
 
-from django.db.models import Q, QuerySet
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, QuerySet
 from django.utils.timezone import now
 
 from haupt.background.celeryp.tasks import SchedulerCeleryTasks
-from haupt.common import workers
+from haupt.common import conf, workers
 from haupt.common.exceptions import AccessNotAuthorized, AccessNotFound
+from haupt.common.options.registry.core import SCHEDULER_ENABLED
 from haupt.db.defs import Models
 from haupt.db.managers import flows
 from haupt.db.managers.artifacts import atomic_set_artifacts
+from haupt.db.managers.bulk_actions import (
+    filter_runs_bulk_action_queryset,
+    get_runs_bulk_job,
+    process_runs_bulk_action,
+)
 from haupt.db.managers.cleaning import compact_owner_stats
 from haupt.db.managers.live_state import (
     delete_in_progress_project,
@@ -25,9 +34,8 @@ from haupt.db.managers.live_state import (
 )
 from haupt.db.managers.runs import (
     base_approve_run,
-    get_failed_stopped_and_all_runs,
+    get_pipeline_stats,
     get_stopping_pipelines_with_no_runs,
-    is_pipeline_done,
 )
 from haupt.db.managers.stats import (
     collect_entity_run_stats,
@@ -46,6 +54,7 @@ from haupt.db.queries.runs import (
     STATUS_UPDATE_COLUMNS_ONLY,
 )
 from haupt.orchestration import operations
+from haupt.orchestration.scheduler import specs
 from haupt.orchestration.scheduler.resolver import SchedulingResolver
 from polyaxon._compiler import resolver
 from polyaxon._constants.metadata import (
@@ -97,9 +106,7 @@ class SchedulingManager:
         compiled_at: Optional[datetime] = None,
     ):
         try:
-            compiled_operation = V1CompiledOperation.read(
-                run.content
-            )  # TODO: Use construct
+            compiled_operation = specs.read_compiled_operation(run.content)
             project = run.project
             return resolver.resolve(
                 run=run,
@@ -135,9 +142,7 @@ class SchedulingManager:
     @classmethod
     def _resolve_hooks(cls, run: Models.Run) -> List[V1Operation]:
         try:
-            compiled_operation = V1CompiledOperation.read(
-                run.content
-            )  # TODO: Use construct
+            compiled_operation = specs.read_compiled_operation(run.content)
             project = run.project
             return resolver.resolve_hooks(
                 run=run,
@@ -181,9 +186,7 @@ class SchedulingManager:
     def _set_iteration_meta_info(
         run: Models.Run, suggestions: List[Dict], iteration: int, bracket_iteration: int
     ) -> V1CompiledOperation:
-        compiled_operation = V1CompiledOperation.read(
-            run.content
-        )  # TODO: Use construct
+        compiled_operation = specs.read_compiled_operation(run.content)
 
         condition = not suggestions or iteration is None
         if condition or (
@@ -355,28 +358,43 @@ class SchedulingManager:
             )
 
     @staticmethod
-    def _check_failure_early_stopping(
+    def _get_failure_early_stopping_aggregates(
         run: Models.Run, early_stopping: List[V1FailureEarlyStopping]
+    ) -> Dict:
+        if not early_stopping:
+            return {}
+        return {
+            "controller_all": Count("id", filter=Q(controller_id=run.id)),
+            "controller_failed": Count(
+                "id",
+                filter=Q(
+                    controller_id=run.id,
+                    status__in={V1Statuses.FAILED, V1Statuses.UPSTREAM_FAILED},
+                ),
+            ),
+        }
+
+    @staticmethod
+    def _check_failure_early_stopping(
+        stats: Dict, early_stopping: List[V1FailureEarlyStopping]
     ) -> bool:
         # We only need one with the lowest percent
         early_stopping = to_list(early_stopping, check_none=True)
         if not early_stopping:
             return False
         percent = min([es.percent for es in early_stopping if es.percent])
-        failed_count = run.controller_runs.filter(
-            status__in={V1Statuses.FAILED, V1Statuses.UPSTREAM_FAILED}
-        ).count()
+        failed_count = stats["controller_failed"]
         if failed_count == 0:
             return False
-        return failed_count / run.controller_runs.count() >= (percent / 100)
+        return failed_count / stats["controller_all"] >= (percent / 100)
 
     @staticmethod
-    def _check_absolute_metric_early_stopping(
+    def _get_absolute_metric_early_stopping_aggregates(
         run: Models.Run, early_stopping: List[V1MetricEarlyStopping]
-    ) -> bool:
+    ) -> Dict:
         early_stopping = to_list(early_stopping, check_none=True)
         if not early_stopping:
-            return False
+            return {}
         filters = []
         for early_stopping_metric in early_stopping:
             comparison = (
@@ -388,171 +406,159 @@ class SchedulingManager:
                 early_stopping_metric.metric, comparison
             )
             filters.append({metric_filter: early_stopping_metric.value})
-        if filters:
-            return run.controller_runs.filter(
-                reduce(OR, [Q(**f) for f in filters])
-            ).exists()
-        return False
+        return {
+            "controller_metric": Count(
+                "id",
+                filter=Q(controller_id=run.id) & reduce(OR, [Q(**f) for f in filters]),
+            )
+        }
+
+    @staticmethod
+    def _check_absolute_metric_early_stopping(
+        stats: Dict, early_stopping: List[V1MetricEarlyStopping]
+    ) -> bool:
+        early_stopping = to_list(early_stopping, check_none=True)
+        if not early_stopping:
+            return False
+        return stats["controller_metric"] > 0
 
     @staticmethod
     def _check_metric_early_stopping(
-        run: Models.Run, early_stopping: List[V1MetricEarlyStopping]
+        stats: Dict, early_stopping: List[V1MetricEarlyStopping]
     ) -> bool:
         early_stopping = to_list(early_stopping, check_none=True)
         if not early_stopping:
             return False
         return False
 
-    @classmethod
-    def _should_early_stop(cls, run: Models.Run) -> bool:
+    @staticmethod
+    def _get_early_stopping(
+        run: Models.Run,
+    ) -> Dict[str, List[Union[V1FailureEarlyStopping, V1MetricEarlyStopping]]]:
+        early_stopping = {"failure": [], "absolute_metric": [], "metric": []}
         if not run.meta_info.get(META_HAS_EARLY_STOPPING):
-            return False
+            return early_stopping
 
         if hasattr(run, "_compiled_operation"):
             compiled_operation = run._compiled_operation
         else:
-            compiled_operation = V1CompiledOperation.read(
-                run.content
-            )  # TODO: Use construct
+            compiled_operation = specs.read_compiled_operation(run.content)
             # Cache the compiled_operation to avoid recalculation
             run._compiled_operation = compiled_operation
 
+        policies = None
         if compiled_operation.matrix:
-            early_stopping = compiled_operation.matrix.early_stopping
+            policies = compiled_operation.matrix.early_stopping
         elif compiled_operation.is_dag_run:
-            early_stopping = compiled_operation.run.early_stopping
+            policies = compiled_operation.run.early_stopping
 
-        early_stopping = to_list(early_stopping, check_none=True)
-        metric_early_stopping = []
-        absolute_metric_early_stopping = []
-        failure_early_stopping = []
-        for es in early_stopping:
+        for es in to_list(policies, check_none=True):
             if es.kind == V1FailureEarlyStopping._IDENTIFIER:
-                failure_early_stopping.append(es)
+                early_stopping["failure"].append(es)
             elif es.kind == V1MetricEarlyStopping._IDENTIFIER:
                 if es.policy:
-                    metric_early_stopping.append(es)
+                    early_stopping["metric"].append(es)
                 else:
-                    absolute_metric_early_stopping.append(es)
+                    early_stopping["absolute_metric"].append(es)
+        return early_stopping
 
+    @classmethod
+    def _get_pipeline_stats(cls, run: Models.Run) -> Dict:
+        """Collects the pipeline status counts and the early stopping aggregates."""
+        early_stopping = cls._get_early_stopping(run)
+        stats = get_pipeline_stats(
+            run.id,
+            **cls._get_failure_early_stopping_aggregates(
+                run, early_stopping=early_stopping["failure"]
+            ),
+            **cls._get_absolute_metric_early_stopping_aggregates(
+                run, early_stopping=early_stopping["absolute_metric"]
+            ),
+        )
+        stats["early_stopping"] = early_stopping
+        return stats
+
+    @classmethod
+    def _should_early_stop(cls, run: Models.Run, stats: Optional[Dict] = None) -> bool:
+        if not run.meta_info.get(META_HAS_EARLY_STOPPING):
+            return False
+
+        if stats is None:
+            stats = cls._get_pipeline_stats(run)
+        early_stopping = stats["early_stopping"]
         if cls._check_failure_early_stopping(
-            run, early_stopping=failure_early_stopping
+            stats, early_stopping=early_stopping["failure"]
         ):
             return True
         if cls._check_absolute_metric_early_stopping(
-            run, early_stopping=absolute_metric_early_stopping
+            stats, early_stopping=early_stopping["absolute_metric"]
         ):
             return True
-        if cls._check_metric_early_stopping(run, early_stopping=metric_early_stopping):
+        if cls._check_metric_early_stopping(
+            stats, early_stopping=early_stopping["metric"]
+        ):
             return True
 
         return False
 
     @staticmethod
-    def _get_upstream_runs(
-        run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> QuerySet:
-        upstream = run.upstream_runs
-        if pipeline_run_id:
-            upstream = upstream.filter(pipeline_id=pipeline_run_id)
-        return upstream
-
-    @classmethod
-    def _is_upstream_all_done(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            not cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .exclude(status__in=LifeCycle.DONE_VALUES)
-            .exists()
-        )
-
-    @classmethod
-    def _is_upstream_one_done(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .filter(status__in=LifeCycle.DONE_VALUES)
-            .exists()
-        )
-
-    @classmethod
-    def _is_upstream_all_failed(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            not cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .exclude(status=V1Statuses.FAILED)
-            .exists()
-        )
-
-    @classmethod
-    def _is_upstream_one_failed(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .filter(status=V1Statuses.FAILED)
-            .exists()
-        )
-
-    @classmethod
-    def _is_upstream_all_succeeded(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            not cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .exclude(status=V1Statuses.SUCCEEDED)
-            .exists()
-        )
-
-    @classmethod
-    def _is_upstream_one_succeeded(
-        cls, run: Models.Run, pipeline_run_id: Optional[int] = None
-    ) -> bool:
-        return (
-            cls._get_upstream_runs(run=run, pipeline_run_id=pipeline_run_id)
-            .filter(status=V1Statuses.SUCCEEDED)
-            .exists()
-        )
-
-    @classmethod
-    def _check_upstream_trigger(
-        cls, run: Models.Run, op_spec: V1Operation
+    def _evaluate_upstream_trigger(
+        upstream_counts: Optional[Dict[str, int]], trigger: Optional[str]
     ) -> [bool, bool]:
         """
-        Checks the upstream and the trigger rule.
+        Evaluates the trigger rule based on the upstream status counts.
 
         Returns a tuple containing information about if the run:
          * should start
          * can start
         """
-        one_done = cls._is_upstream_one_done(run=run)
+        if not upstream_counts:
+            return False, False
+        one_done = upstream_counts["done"] > 0
         # Early opt-out if not upstream is done
         if not one_done:
             return False, False
-        if op_spec.trigger == V1TriggerPolicy.ONE_DONE:
+        if trigger == V1TriggerPolicy.ONE_DONE:
             return one_done, one_done
-        if op_spec.trigger == V1TriggerPolicy.ONE_SUCCEEDED:
-            return one_done, cls._is_upstream_one_succeeded(run=run)
-        if op_spec.trigger == V1TriggerPolicy.ONE_FAILED:
-            return one_done, cls._is_upstream_one_failed(run=run)
+        if trigger == V1TriggerPolicy.ONE_SUCCEEDED:
+            return one_done, upstream_counts["succeeded"] > 0
+        if trigger == V1TriggerPolicy.ONE_FAILED:
+            return one_done, upstream_counts["failed"] > 0
 
-        all_done = cls._is_upstream_all_done(run=run)
+        all_done = upstream_counts["done"] == upstream_counts["all"]
         # Early opt-out if not upstream is done
         if not all_done:
             return False, False
-        if op_spec.trigger == V1TriggerPolicy.ALL_DONE:
+        if trigger == V1TriggerPolicy.ALL_DONE:
             return all_done, all_done
         # If not trigger policy is set we assume ALL_SUCCEEDED
-        if op_spec.trigger is None or op_spec.trigger == V1TriggerPolicy.ALL_SUCCEEDED:
-            return all_done, cls._is_upstream_all_succeeded(run=run)
-        if op_spec.trigger == V1TriggerPolicy.ALL_FAILED:
-            return all_done, cls._is_upstream_all_failed(run=run)
+        if trigger is None or trigger == V1TriggerPolicy.ALL_SUCCEEDED:
+            return all_done, upstream_counts["succeeded"] == upstream_counts["all"]
+        if trigger == V1TriggerPolicy.ALL_FAILED:
+            return all_done, upstream_counts["failed"] == upstream_counts["all"]
 
         return False, False
 
+    @classmethod
+    def _check_upstream_trigger(
+        cls,
+        run: Models.Run,
+        op_spec: V1Operation,
+        upstream_counts: Optional[Dict[str, int]] = None,
+    ) -> [bool, bool]:
+        """
+        Checks the upstream and the trigger rule.
+
+        Returns a tuple containing information about if the run:
+         * should start
+         * can start
+        """
+        if upstream_counts is None:
+            upstream_counts = flows.get_upstream_status_counts([run.id]).get(run.id)
+        return cls._evaluate_upstream_trigger(
+            upstream_counts=upstream_counts, trigger=op_spec.trigger
+        )
+
     @staticmethod
     def _trigger_event_downstream(queryset: QuerySet):
         for down_run in queryset:
@@ -564,8 +570,15 @@ class SchedulingManager:
 
     @classmethod
     def _trigger_downstream(cls, queryset: QuerySet, is_skipped: bool = False):
-        for down_run in queryset:
-            op_spec = V1Operation.read(down_run.raw_content)  # TODO: Use construct
+        down_runs = list(queryset)
+        if not down_runs:
+            return
+        upstream_counts = flows.get_upstream_status_counts(
+            [down_run.id for down_run in down_runs]
+        )
+        for down_run in down_runs:
+            # Fan-out runs usually share the same content
+            op_spec = specs.read_operation(down_run.raw_content)
             if is_skipped and op_spec.skip_on_upstream_skip:
                 condition = V1StatusCondition.get_condition(
                     type=V1Statuses.SKIPPED,
@@ -577,7 +590,9 @@ class SchedulingManager:
                 continue
 
             should_start, can_start = cls._check_upstream_trigger(
-                run=down_run, op_spec=op_spec
+                run=down_run,
+                op_spec=op_spec,
+                upstream_counts=upstream_counts.get(down_run.id, {}),
             )
             if should_start:
                 if can_start:
@@ -611,9 +626,7 @@ class SchedulingManager:
         if hasattr(run, "_compiled_operation"):
             compiled_operation = run._compiled_operation
         else:
-            compiled_operation = V1CompiledOperation.read(
-                run.content
-            )  # TODO: Use construct
+            compiled_operation = specs.read_compiled_operation(run.content)
             # Cache the compiled_operation to avoid recalculation
             run._compiled_operation = compiled_operation
         if compiled_operation.has_hyperband_matrix:
@@ -673,9 +686,7 @@ class SchedulingManager:
     def _start_run_for_schedule(cls, pipeline: Models.Run, depends_on_past: bool):
         if LifeCycle.is_done(pipeline.status):
             return
-        compiled_operation = V1CompiledOperation.read(
-            pipeline.content
-        )  # TODO: Use construct
+        compiled_operation = specs.read_compiled_operation(pipeline.content)
         if compiled_operation.schedule.depends_on_past:
             dependence_cond = depends_on_past is True
         else:
@@ -694,9 +705,7 @@ class SchedulingManager:
     @classmethod
     def _create_tuner_operation(cls, run):
         run_uuid = run.uuid.hex
-        compiled_operation = V1CompiledOperation.read(
-            run.content
-        )  # TODO: Use construct
+        compiled_operation = specs.read_compiled_operation(run.content)
         iteration = run.meta_info.get(META_ITERATION)
         params = dict(
             matrix=compiled_operation.matrix,
@@ -970,6 +979,28 @@ class SchedulingManager:
         artifacts = [V1RunArtifact.from_dict(a) for a in artifacts]
         atomic_set_artifacts(run=run, artifacts=artifacts)
 
+    @staticmethod
+    def runs_bulk_action(
+        job_uuid: str,
+        action: str,
+        project_id: int,
+        query: str,
+        audit: Dict,
+        meta_info: Optional[Dict] = None,
+        user_id: Optional[int] = None,
+    ):
+        queryset = filter_runs_bulk_action_queryset(
+            action=action, project_id=project_id, query_spec=query, user_id=user_id
+        )
+        process_runs_bulk_action(
+            action=action,
+            queryset=queryset,
+            audit=audit,
+            meta_info=meta_info,
+            project_id=project_id,
+            job=get_runs_bulk_job(project_id=project_id, job_uuid=job_uuid),
+        )
+
     @classmethod
     def runs_stop(
         cls,
@@ -1339,16 +1370,13 @@ class SchedulingManager:
             upstream_runs=run_id,
             status=V1Statuses.CREATED,
             pending=None,
-        ).prefetch_related("upstream_runs")
+        )
         cls._trigger_downstream(
             downstream_query, is_skipped=LifeCycle.skipped(run.status)
         )
 
         if run.downstream_runs.filter(status=V1Statuses.CREATED).count() == 0:
-            workers.send(
-                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
-                kwargs={"run_id": run.pipeline_id},
-            )
+            cls.send_check_pipeline(run_id=run.pipeline_id)
         else:
             workers.send(
                 SchedulerCeleryTasks.RUNS_CHECK_EARLY_STOPPING,
@@ -1384,8 +1412,45 @@ class SchedulingManager:
             pipeline_runs = run.pipeline_runs.exclude(status__in=LifeCycle.DONE_VALUES)
             bulk_new_run_status(pipeline_runs, condition)
 
+    @staticmethod
+    def _get_check_pipeline_key(run_id: int) -> str:
+        return "scheduler.check_pipeline.{}".format(run_id)
+
     @classmethod
-    def runs_check_pipeline(cls, run_id: int, run: Optional[Models.Run] = None):
+    def send_check_pipeline(cls, run_id: int, workers_backend=workers):
+        debounce = settings.SCHEDULER_CHECK_PIPELINE_DEBOUNCE
+        if (
+            not debounce
+            or not settings.SHARED_CACHE_ENABLED
+            or not conf.get(SCHEDULER_ENABLED)
+        ):
+            workers_backend.send(
+                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
+                kwargs={"run_id": run_id},
+            )
+            return
+
+        def _send():
+            # Only one delayed check per pipeline is queued within the window,
+            # the key is released when the check starts so later changes are not missed
+            if not cache.add(
+                cls._get_check_pipeline_key(run_id), True, timeout=debounce * 2
+            ):
+                return
+            workers_backend.send(
+                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
+                kwargs={"run_id": run_id, "debounced": True},
+                countdown=debounce,
+            )
+
+        transaction.on_commit(_send)
+
+    @classmethod
+    def runs_check_pipeline(
+        cls, run_id: int, run: Optional[Models.Run] = None, debounced: bool = False
+    ):
+        if debounced:
+            cache.delete(cls._get_check_pipeline_key(run_id))
         run = cls.get_run(run_id=run_id, run=run, defer=STATUS_UPDATE_COLUMNS_DEFER)
         if not run:
             return
@@ -1404,11 +1469,12 @@ class SchedulingManager:
             )
 
         reason = "SchedulerCheckPipeline"
-        if is_pipeline_done(run):
+        stats = cls._get_pipeline_stats(run)
+        if stats["pending"] == 0:
             if LifeCycle.stopped(run.status):
                 return
             elif cls._should_iterate(run):
-                if cls._should_early_stop(run):
+                if cls._should_early_stop(run, stats=stats):
                     _early_stop()
                 else:
                     workers.send(
@@ -1425,17 +1491,16 @@ class SchedulingManager:
                     message="Pipeline has stopped.",
                 )
             else:
-                runs_count = get_failed_stopped_and_all_runs(run.id)
-                failed_count = runs_count.get("failed", 0)
-                stopped_count = runs_count.get("stopped", 0)
-                all_count = runs_count.get("all", 0)
+                failed_count = stats["failed"]
+                stopped_count = stats["stopped"]
+                all_count = stats["all"]
                 if failed_count > 0:
                     condition = V1StatusCondition.get_condition(
                         type=V1Statuses.FAILED,
                         status="True",
                         reason=reason,
                         message="Pipeline has failed, some operations did not finish successfully.\n"
-                        "Number of failed operations: {}".format(runs_count["failed"]),
+                        "Number of failed operations: {}".format(failed_count),
                     )
                 elif stopped_count > 0 and stopped_count == all_count:
                     condition = V1StatusCondition.get_condition(
@@ -1452,7 +1517,7 @@ class SchedulingManager:
                         message="Pipeline has succeeded.",
                     )
             new_run_status(run=run, condition=condition)
-        elif cls._should_early_stop(run):
+        elif cls._should_early_stop(run, stats=stats):
             _early_stop()
 
     @classmethod
@@ -20,7 +20,7 @@ from haupt.db.abstracts.project_versions import BaseProjectVersion
 from haupt.db.abstracts.runs import BaseRun
 from haupt.db.defs import Models
 from haupt.db.managers.artifacts import set_artifacts
-from haupt.db.managers.cache import get_run_state
+from haupt.db.managers.cache import get_cache_entry, get_run_state, set_cache_entry
 from haupt.db.managers.statuses import new_run_status
 from haupt.db.managers.versions import get_component_version_state
 from haupt.db.query_managers.run import RunsOfflineFilter
@@ -1402,18 +1402,14 @@ class SchedulingResolver(resolver.BaseResolver):
         return self.compiled_operation
 
     @staticmethod
-    def _get_cache_query(
-        run, filters: Optional[Dict] = None, excludes: Optional[Dict] = None
-    ):
-        queryset = Models.Run.objects.filter(
-            state=run.state, kind=run.kind, runtime=run.runtime
-        ).exclude(id=run.id)
-        if filters:
-            queryset = queryset.filter(**filters)
-        if excludes:
-            queryset = queryset.exclude(**excludes)
-
-        return queryset.order_by("created_at").only("id", "original").last()
+    def _is_cache_usable(status: Optional[str]) -> bool:
+        # Check if cache has a stopping triggered
+        if LifeCycle.is_stopping(status):
+            return False
+        # Cache finished but not successfully
+        if LifeCycle.is_done(status) and not LifeCycle.succeeded(status):
+            return False
+        return True
 
     @classmethod
     def _is_cache_hit(
@@ -1445,55 +1441,36 @@ class SchedulingResolver(resolver.BaseResolver):
         if not run.state:
             return False
 
-        cached = cls._get_cache_query(
-            run,
-            filters={
-                "status__in": {
-                    V1Statuses.PROCESSING,
-                    V1Statuses.SCHEDULED,
-                    V1Statuses.STARTING,
-                    V1Statuses.RUNNING,
-                    V1Statuses.SUCCEEDED,
-                }
-            },
-        )
-
-        # Not cached check all runs from the same queue
-        if not cached:
-            cached = cls._get_cache_query(
-                run,
-                excludes={
-                    "status__in": {
-                        V1Statuses.FAILED,
-                        V1Statuses.SKIPPED,
-                        V1Statuses.UPSTREAM_FAILED,
-                        V1Statuses.STOPPED,
-                    }
-                },
-            )
-
-        # No cache found
-        if not cached:
+        entry = get_cache_entry(run)
+        if not entry or entry.run_id == run.id:
+            # No cache found, this run becomes the cache of its state
+            set_cache_entry(run)
             return False
 
         # Check if cache has expired
-        cached = cached.original if cached.original else cached
         if (
             compiled_operation.cache
             and compiled_operation.cache.ttl is not None
-            and cached.finished_at
+            and entry.finished_at
         ):
             if (
-                now() - cached.finished_at
+                now() - entry.finished_at
             ).total_seconds() >= compiled_operation.cache.ttl:
+                set_cache_entry(run)
                 return False
 
-        # Check if cache has a stopping triggered
-        if LifeCycle.is_stopping(cached.status):
+        if not cls._is_cache_usable(entry.status):
+            set_cache_entry(run)
             return False
 
-        # Cache finished but not successfully
-        if LifeCycle.is_done(cached.status) and not LifeCycle.succeeded(cached.status):
+        cached = (
+            Models.Run.objects.filter(id=entry.run_id)
+            .only("id", "status", "outputs")
+            .first()
+        )
+        # Cache was archived/deleted or its status changed since the entry was updated
+        if not cached or not cls._is_cache_usable(cached.status):
+            set_cache_entry(run)
             return False
 
         # Use cache
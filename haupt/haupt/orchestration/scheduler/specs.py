@@ -0,0 +1,93 @@
+import copy
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from django.conf import settings
+
+from haupt.common.stats import StatsLogger
+from polyaxon.schemas import V1CompiledOperation, V1Operation
+
+T = TypeVar("T")
+
+_logger = logging.getLogger("polyaxon.scheduler")
+
+
+class SpecsCache:
+    """Process-wide LRU cache of parsed operation specs, bounded by the number of entries.
+
+    Entries are keyed by the spec class and a hash of the raw content,
+    callers always receive a deep copy since the resolvers mutate the specs.
+    The stats of the cache are logged periodically.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stats_logger = StatsLogger(_logger, "Specs cache", self.get_stats)
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return settings.SCHEDULER_SPECS_CACHE_SIZE
+
+    @staticmethod
+    def get_key(spec_cls: Type, content: str) -> Any:
+        return spec_cls.__name__, hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def read(self, spec_cls: Type[T], content: Any) -> T:
+        max_entries = self.max_entries
+        if not max_entries or not isinstance(content, str):
+            return spec_cls.read(content)
+
+        key = self.get_key(spec_cls, content)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is None:
+            value = spec_cls.read(content)
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        self.stats_logger.log()
+        return copy.deepcopy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+SPECS_CACHE = SpecsCache()
+
+
+def read_operation(content: str) -> V1Operation:
+    return SPECS_CACHE.read(V1Operation, content)
+
+
+def read_compiled_operation(content: str) -> V1CompiledOperation:
+    return SPECS_CACHE.read(V1CompiledOperation, content)
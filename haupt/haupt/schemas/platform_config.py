@@ -1,3 +1,5 @@
+import importlib.util
+
 from pathlib import Path
 from typing import TYPE_CHECKING, Dict, List, Optional
 from typing_extensions import Literal
@@ -65,6 +67,27 @@ class PlatformConfig(BaseSchemaModel):
     scheduler_enabled: Optional[bool] = Field(
         alias="POLYAXON_SCHEDULER_ENABLED", default=False
     )
+    scheduler_specs_cache_size: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_SPECS_CACHE_SIZE", default=512
+    )
+    scheduler_check_pipeline_debounce: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_CHECK_PIPELINE_DEBOUNCE", default=0
+    )
+    scheduler_bulk_actions_batch_size: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_BULK_ACTIONS_BATCH_SIZE", default=500
+    )
+    scheduler_queue_dispatcher: Optional[Literal["fifo", "fair"]] = Field(
+        alias="POLYAXON_SCHEDULER_QUEUE_DISPATCHER", default="fifo"
+    )
+    scheduler_agent_state_max_wait: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_AGENT_STATE_MAX_WAIT", default=30
+    )
+    scheduler_executor_workers: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_EXECUTOR_WORKERS", default=0
+    )
+    scheduler_tasks_coalescing_window: Optional[int] = Field(
+        alias="POLYAXON_SCHEDULER_TASKS_COALESCING_WINDOW", default=0
+    )
     chart_version: Optional[str] = Field(
         alias="POLYAXON_CHART_VERSION", default=pkg.VERSION
     )
@@ -80,6 +103,9 @@ class PlatformConfig(BaseSchemaModel):
     redis_heartbeat_url: Optional[str] = Field(
         alias="POLYAXON_REDIS_HEARTBEAT_URL", default=None
     )
+    redis_cache_url: Optional[str] = Field(
+        alias="POLYAXON_REDIS_CACHE_URL", default=None
+    )
     admin_name: Optional[str] = Field(alias="POLYAXON_ADMIN_NAME", default=None)
     admin_mail: Optional[str] = Field(alias="POLYAXON_ADMIN_MAIL", default=None)
     extra_apps: Optional[List[str]] = Field(alias="POLYAXON_EXTRA_APPS", default=None)
@@ -159,6 +185,27 @@ class PlatformConfig(BaseSchemaModel):
     cron_intervals_automation_executions: Optional[int] = Field(
         alias="POLYAXON_CRON_INTERVALS_AUTOMATION_EXECUTIONS", default=30
     )
+    streams_max_concurrency: Optional[int] = Field(
+        alias="POLYAXON_STREAMS_MAX_CONCURRENCY", default=64
+    )
+    streams_request_concurrency: Optional[int] = Field(
+        alias="POLYAXON_STREAMS_REQUEST_CONCURRENCY", default=16
+    )
+    streams_events_cache_size: Optional[int] = Field(
+        alias="POLYAXON_STREAMS_EVENTS_CACHE_SIZE", default=256 * 1024 * 1024
+    )
+    streams_events_compaction: Optional[bool] = Field(
+        alias="POLYAXON_STREAMS_EVENTS_COMPACTION", default=True
+    )
+    streams_disk_cache_size: Optional[int] = Field(
+        alias="POLYAXON_STREAMS_DISK_CACHE_SIZE", default=10 * 1024 * 1024 * 1024
+    )
+    streams_logs_page_size: Optional[int] = Field(
+        alias="POLYAXON_STREAMS_LOGS_PAGE_SIZE", default=5000
+    )
+    streams_logs_compression: Optional[Literal["gzip", "zstd"]] = Field(
+        alias="POLYAXON_STREAMS_LOGS_COMPRESSION", default=None
+    )
     cleaning_intervals_activity_logs: Optional[int] = Field(
         alias="POLYAXON_CLEANING_INTERVALS_ACTIVITY_LOGS", default=3 * 30
     )
@@ -397,6 +444,15 @@ class PlatformConfig(BaseSchemaModel):
         except PolyaxonSchemaError as e:
             raise ValueError("Received an invalid {} `{}`".format(key, v)) from e
 
+    @field_validator("streams_logs_compression")
+    def validate_streams_logs_compression(cls, v):
+        if v == "zstd" and importlib.util.find_spec("zstandard") is None:
+            raise ValueError(
+                "Received a `zstd` logs compression, "
+                "but the `zstandard` package is not installed"
+            )
+        return v
+
     @field_validator("log_level", **validation_always, **validation_before)
     def validate_log_level(cls, v):
         if v:
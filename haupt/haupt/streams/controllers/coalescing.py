@@ -0,0 +1,59 @@
+import asyncio
+import functools
+
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Registry of in-flight calls, concurrent calls with the same key share one result.
+
+    The first caller starts the call, callers arriving before it finishes await
+    the same task instead of repeating the work. The call runs in its own task,
+    so a cancelled caller does not cancel it for the others.
+
+    Keys for storage reads are `(store_path, subpath)`, the store path identifies
+    the connection, prefixed with the kind of read when the same subpath
+    can be read in different ways.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _discard(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved if all the callers were cancelled
+            task.exception()
+
+    async def do(
+        self, key: Hashable, fct: Callable[..., Awaitable], /, *args, **kwargs
+    ) -> Any:
+        task = self._tasks.get(key)
+        # Tasks are bound to their loop, e.g. when called from `async_to_sync`
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fct(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._discard, key))
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict:
+        return {
+            "inflight": len(self._tasks),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+SINGLE_FLIGHT = SingleFlight()
@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import os
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from clipped.utils.enums import get_enum_value
+from clipped.utils.json import orjson_dumps, orjson_loads
+from clipped.utils.paths import check_or_create_path
+
+from asgiref.sync import sync_to_async
+from haupt.streams.controllers.concurrency import gather_bounded
+from haupt.streams.controllers.disk_cache import DISK_CACHE, download_file
+from haupt.streams.controllers.downsampling import DownsampleSpec
+from polyaxon import settings
+from polyaxon._fs.async_manager import list_files, upload_file
+from polyaxon._fs.types import FSSystem
+from polyaxon._fs.utils import get_store_path
+from polyaxon.schemas import V1ProjectFeature
+from traceml.artifacts import V1ArtifactKind
+from traceml.events import V1Events, get_event_path
+
+logger = logging.getLogger("haupt.streams.compaction")
+
+COMPACTED_EVENTS_EXTENSION = "arrow"
+COMPACTED_EVENTS_INDEX_KEY = b"polyaxon.index"
+COMPACTED_EVENTS_KINDS = {V1ArtifactKind.METRIC}
+# Runs without a compacted file are not checked again for this duration
+COMPACTED_EVENTS_MISSING_TTL = 60
+COMPACTED_EVENTS_MISSING_SIZE = 10000
+# The sizes of the source files are not listed again for this duration,
+# events of a resumed run are read from the raw files once they expire
+COMPACTED_EVENTS_SIZES_TTL = 60
+
+
+class ExpiringKeys:
+    """LRU set of keys that expire after a TTL, bounded by the number of keys.
+
+    Keys can hold a value, returned by `get` until the key expires.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, key: Any) -> Any:
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        added_at, value = entry
+        if time.monotonic() - added_at >= self.ttl:
+            self._keys.pop(key, None)
+            return None
+        return value
+
+    def add(self, key: Any, value: Any = True):
+        self._keys.pop(key, None)
+        self._keys[key] = (time.monotonic(), value)
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: Any):
+        self._keys.pop(key, None)
+
+
+_missing_compacted_events = ExpiringKeys(
+    ttl=COMPACTED_EVENTS_MISSING_TTL, max_size=COMPACTED_EVENTS_MISSING_SIZE
+)
+_events_files_sizes = ExpiringKeys(
+    ttl=COMPACTED_EVENTS_SIZES_TTL, max_size=COMPACTED_EVENTS_MISSING_SIZE
+)
+# Runs being compacted in the background, with a reference to their tasks
+_compaction_tasks = {}
+
+
+def get_compacted_events_subpath(run_uuid: str, event_kind: str) -> str:
+    return "{}.{}".format(
+        get_event_path(run_path=run_uuid, kind=event_kind), COMPACTED_EVENTS_EXTENSION
+    )
+
+
+def write_compacted_events(
+    path: str,
+    event_kind: str,
+    events: List[V1Events],
+    sizes: Optional[Dict[str, int]] = None,
+) -> Dict[str, Dict]:
+    """Writes the events to an Arrow IPC file, one record batch per event name.
+
+    The index, stored in the schema metadata, maps each event name
+    to its record batch, step range and the size of the source file it was read from.
+    """
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [
+            ("step", pa.int64()),
+            ("timestamp", pa.string()),
+            (event_kind, pa.float64()),
+        ]
+    )
+    sizes = sizes or {}
+    index = {}
+    batches = []
+    for event in events:
+        df = event.df
+        steps = pd.to_numeric(df["step"], errors="coerce")
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array(steps, type=pa.int64(), from_pandas=True),
+                # Same representation as the timestamps read from the raw files
+                pa.array(df["timestamp"].astype(str), type=pa.string()),
+                pa.array(
+                    pd.to_numeric(df[event_kind], errors="coerce"),
+                    type=pa.float64(),
+                    from_pandas=True,
+                ),
+            ],
+            schema=schema,
+        )
+        has_steps = bool(steps.notna().all()) and df.shape[0] > 0
+        index[event.name] = {
+            "batch": len(batches),
+            "rows": df.shape[0],
+            "min_step": int(np.min(steps)) if has_steps else None,
+            "max_step": int(np.max(steps)) if has_steps else None,
+            "sorted": has_steps and bool(steps.is_monotonic_increasing),
+            "size": sizes.get(event.name),
+        }
+        batches.append(batch)
+
+    schema = schema.with_metadata({COMPACTED_EVENTS_INDEX_KEY: orjson_dumps(index)})
+    check_or_create_path(path, is_dir=False)
+    tmp_path = "{}.tmp".format(path)
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    os.replace(tmp_path, path)
+    return index
+
+
+def read_compacted_events(
+    path: str,
+    event_kind: str,
+    event_names: List[str],
+    downsample: Optional[DownsampleSpec] = None,
+    sizes: Optional[Dict[str, int]] = None,
+) -> Dict[str, V1Events]:
+    """Reads the requested events from a memory-mapped compacted file.
+
+    Only the record batches of the requested names are materialized,
+    and for sorted steps the step window is applied before the conversion to pandas.
+    If the sizes of the source files are provided, events whose source file
+    changed since the compaction are skipped, so they are read from the raw files.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    events = {}
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        index = orjson_loads(metadata.get(COMPACTED_EVENTS_INDEX_KEY, b"{}"))
+        for event_name in event_names:
+            entry = index.get(event_name)
+            if entry is None:
+                continue
+            if sizes is not None and entry.get("size") != sizes.get(event_name):
+                continue
+            batch = reader.get_batch(entry["batch"])
+            if (
+                downsample
+                and entry["sorted"]
+                and (downsample.min_step is not None or downsample.max_step is not None)
+            ):
+                steps = batch.column(0).to_numpy()
+                start = 0
+                end = len(steps)
+                if downsample.min_step is not None:
+                    start = int(np.searchsorted(steps, downsample.min_step, "left"))
+                if downsample.max_step is not None:
+                    end = int(np.searchsorted(steps, downsample.max_step, "right"))
+                batch = batch.slice(start, max(end - start, 0))
+            events[event_name] = V1Events(
+                kind=event_kind, name=event_name, df=batch.to_pandas()
+            )
+    return events
+
+
+async def download_compacted_events(
+    fs: FSSystem, store_path: str, run_uuid: str, event_kind: str
+) -> Optional[str]:
+    if event_kind not in COMPACTED_EVENTS_KINDS:
+        return None
+    subpath = get_compacted_events_subpath(run_uuid=run_uuid, event_kind=event_kind)
+    if (store_path, subpath) in _missing_compacted_events:
+        return None
+    path = await download_file(fs=fs, store_path=store_path, subpath=subpath)
+    if not path or not os.path.exists(path):
+        _missing_compacted_events.add((store_path, subpath))
+        return None
+    return path
+
+
+async def get_events_files_sizes(
+    fs: FSSystem, store_path: str, run_uuid: str, event_kind: str
+) -> Dict[str, int]:
+    """Returns the size of the run's events files in the store, keyed by event name.
+
+    The sizes are cached with the compacted file lookup.
+    """
+    subpath = get_event_path(run_path=run_uuid, kind=event_kind)
+    key = (store_path, subpath)
+    sizes = _events_files_sizes.get(key)
+    if sizes is not None:
+        return sizes
+    files = await list_files(fs=fs, store_path=store_path, subpath=subpath)
+    sizes = {
+        f.split(".plx")[0]: size
+        for f, size in files["files"].items()
+        if f.endswith(".plx")
+    }
+    _events_files_sizes.add(key, sizes)
+    return sizes
+
+
+async def compact_run_events(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    event_kind: str = V1ArtifactKind.METRIC,
+) -> Optional[Dict[str, Dict]]:
+    """Compacts the events of a done run into a single columnar file per kind.
+
+    Returns the index of the compacted file or None if there was nothing to compact.
+    """
+    event_kind = get_enum_value(event_kind)
+    subpath = get_event_path(run_path=run_uuid, kind=event_kind)
+    files = await list_files(fs=fs, store_path=store_path, subpath=subpath)
+    event_names = [
+        f.split(".plx")[0] for f in sorted(files["files"].keys()) if f.endswith(".plx")
+    ]
+    if not event_names:
+        return None
+
+    event_subpaths = [
+        get_event_path(run_path=run_uuid, kind=event_kind, name=event_name)
+        for event_name in event_names
+    ]
+    results = await gather_bounded(
+        download_file(
+            fs=fs, store_path=store_path, subpath=event_subpath, check_cache=False
+        )
+        for event_subpath in event_subpaths
+    )
+    events = []
+    sizes = {}
+    for event_name, event_path in zip(event_names, results):
+        if isinstance(event_path, BaseException) or not event_path:
+            logger.warning(
+                "Could not compact the events of run %s, event %s was not downloaded.",
+                run_uuid,
+                event_name,
+            )
+            return None
+        sizes[event_name] = os.path.getsize(event_path)
+        events.append(
+            await sync_to_async(V1Events.read, thread_sensitive=False)(
+                kind=event_kind,
+                name=event_name,
+                data=event_path,
+                parse_dates=False,
+                engine="pyarrow",
+            )
+        )
+
+    compacted_subpath = get_compacted_events_subpath(
+        run_uuid=run_uuid, event_kind=event_kind
+    )
+    local_path = settings.AGENT_CONFIG.get_local_path(
+        subpath=compacted_subpath, entity=V1ProjectFeature.RUNTIME
+    )
+    index = await sync_to_async(write_compacted_events, thread_sensitive=False)(
+        local_path, event_kind, events, sizes
+    )
+    store_full_path = get_store_path(
+        store_path=store_path,
+        subpath=compacted_subpath,
+        entity=V1ProjectFeature.RUNTIME,
+    )
+    if store_full_path != local_path:
+        await upload_file(fs=fs, store_path=store_path, subpath=compacted_subpath)
+    # Invalidate the previously downloaded version
+    cached_path = DISK_CACHE.get_local_path(compacted_subpath)
+    if cached_path != local_path:
+        DISK_CACHE.remove(cached_path)
+    _missing_compacted_events.discard((store_path, compacted_subpath))
+    _events_files_sizes.add((store_path, subpath), sizes)
+    return index
+
+
+async def _compact_run_events_in_background(
+    fs: FSSystem, store_path: str, run_uuid: str
+):
+    try:
+        await compact_run_events(fs=fs, store_path=store_path, run_uuid=run_uuid)
+    except Exception as e:
+        logger.warning(
+            "Run's events were not compacted, an error was raised. Error %s." % e
+        )
+
+
+def schedule_compact_run_events(
+    fs: FSSystem, store_path: str, run_uuid: str
+) -> Optional[asyncio.Future]:
+    """Compacts the run's events in the background of the current event loop.
+
+    A run already being compacted by this process is not scheduled again.
+    """
+    key = (store_path, run_uuid)
+    if key in _compaction_tasks:
+        return None
+    task = asyncio.ensure_future(
+        _compact_run_events_in_background(
+            fs=fs, store_path=store_path, run_uuid=run_uuid
+        )
+    )
+    _compaction_tasks[key] = task
+    task.add_done_callback(lambda _: _compaction_tasks.pop(key, None))
+    return task
@@ -0,0 +1,65 @@
+import asyncio
+import weakref
+
+from typing import Any, Awaitable, Iterable, List, Optional
+
+from django.conf import settings
+
+_global_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_global_semaphore() -> asyncio.Semaphore:
+    """Returns the process-wide in-flight limiter for the running event loop.
+
+    Semaphores are bound to the loop they are used in,
+    so we keep one per loop instead of a single module level instance.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _global_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.STREAMS_MAX_CONCURRENCY)
+        _global_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def _run_bounded(
+    aw: Awaitable,
+    request_semaphore: asyncio.Semaphore,
+    global_semaphore: asyncio.Semaphore,
+) -> Any:
+    started = False
+    try:
+        async with request_semaphore:
+            async with global_semaphore:
+                started = True
+                return await aw
+    finally:
+        if not started and asyncio.iscoroutine(aw):
+            aw.close()
+
+
+async def gather_bounded(
+    aws: Iterable[Awaitable], limit: Optional[int] = None
+) -> List[Any]:
+    """Runs the awaitables concurrently under a per-request and a global limit.
+
+    Results are returned in the same order as the awaitables,
+    exceptions are returned in place of the result of the failing awaitable,
+    so that callers can report partial failures without losing the successful results.
+
+    Only leaf operations (download/parse) should be passed to this function,
+    nesting `gather_bounded` calls can exhaust the global limit and deadlock.
+    """
+    request_semaphore = asyncio.Semaphore(limit or settings.STREAMS_REQUEST_CONCURRENCY)
+    global_semaphore = get_global_semaphore()
+    return await asyncio.gather(
+        *[
+            _run_bounded(
+                aw,
+                request_semaphore=request_semaphore,
+                global_semaphore=global_semaphore,
+            )
+            for aw in aws
+        ],
+        return_exceptions=True,
+    )
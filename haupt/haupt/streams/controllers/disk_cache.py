@@ -0,0 +1,242 @@
+import logging
+import os
+import time
+import uuid
+
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from clipped.utils.paths import check_or_create_path
+
+from django.conf import settings as dj_settings
+
+from haupt.streams.controllers.coalescing import SingleFlight
+from polyaxon import settings
+from polyaxon._fs.async_manager import ensure_async_execution
+from polyaxon._fs.types import FSSystem
+from polyaxon._fs.utils import get_store_path
+from polyaxon.schemas import V1ProjectFeature
+
+logger = logging.getLogger("haupt.streams.disk_cache")
+
+# Seconds a returned path is kept from eviction, so the caller can open it
+DISK_CACHE_LEASE = 60
+
+
+class DiskCache:
+    """LRU index of the files downloaded under the archives root, bounded by size.
+
+    Files are downloaded to a temporary path and renamed once complete,
+    so readers never see partial files, and concurrent downloads of the same
+    `(store_path, subpath)` share a single fetch from the store.
+    Files already on disk that the cache did not download are adopted on their first hit.
+
+    The index and the size budget are per process: files downloaded by other workers
+    or by a previous process are only accounted for once this process hits them.
+
+    Entries are not evicted while they are pinned by a reader using `open_file`,
+    or for `DISK_CACHE_LEASE` seconds after `download_file` returned their path.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pins = {}
+        self._leases = {}
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        if self._max_size is not None:
+            return self._max_size
+        return dj_settings.STREAMS_DISK_CACHE_SIZE
+
+    @staticmethod
+    def get_local_path(subpath: str) -> str:
+        return os.path.join(settings.CLIENT_CONFIG.archives_root or "", subpath)
+
+    def get(self, path: str) -> bool:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self.pop(path)
+            return False
+        if path in self._entries:
+            self._entries.move_to_end(path)
+        else:
+            self.set(path, size)
+        return True
+
+    def set(self, path: str, size: int):
+        self.pop(path)
+        self._entries[path] = size
+        self._size += size
+        max_size = self.max_size
+        if not max_size:
+            return
+        now = time.monotonic()
+        for key in list(self._entries.keys()):
+            if self._size <= max_size:
+                break
+            if key == path or self.is_pinned(key, now):
+                continue
+            self.remove(key)
+            self.evictions += 1
+
+    def is_pinned(self, path: str, now: Optional[float] = None) -> bool:
+        if self._pins.get(path):
+            return True
+        lease = self._leases.get(path)
+        if lease is None:
+            return False
+        if lease > (now or time.monotonic()):
+            return True
+        self._leases.pop(path, None)
+        return False
+
+    def lease(self, path: str):
+        self._leases[path] = time.monotonic() + DISK_CACHE_LEASE
+
+    def pin(self, path: str):
+        self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path: str):
+        count = self._pins.get(path, 0) - 1
+        if count > 0:
+            self._pins[path] = count
+        else:
+            self._pins.pop(path, None)
+
+    def pop(self, path: str):
+        self._leases.pop(path, None)
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+    def remove(self, path: str):
+        self.pop(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not remove the cached file %s. Error %s", path, e)
+
+    def clear(self):
+        self._entries = OrderedDict()
+        self._size = 0
+        self._leases = {}
+
+    async def _fetch(
+        self,
+        fs: FSSystem,
+        store_path: str,
+        subpath: str,
+        path_to: str,
+        check_cache: bool,
+    ) -> Optional[str]:
+        path_from = get_store_path(
+            store_path=store_path, subpath=subpath, entity=V1ProjectFeature.RUNTIME
+        )
+        tmp_path = "{}.{}.tmp".format(path_to, uuid.uuid4().hex)
+        try:
+            check_or_create_path(path_to, is_dir=False)
+            await ensure_async_execution(
+                fs=fs,
+                fct="get",
+                is_async=fs.async_impl,
+                rpath=path_from,
+                lpath=tmp_path,
+                recursive=False,
+            )
+            os.replace(tmp_path, path_to)
+        except Exception as e:
+            logger.warning("Could not download %s. Error %s" % (path_from, e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if not check_cache:
+                # A forced download must not fall back to the stale version
+                self.remove(path_to)
+            return None
+        self.set(path_to, os.path.getsize(path_to))
+        return path_to
+
+    async def download_file(
+        self, fs: FSSystem, store_path: str, subpath: str, check_cache: bool = True
+    ) -> Optional[str]:
+        if not settings.AGENT_CONFIG:
+            return None
+        path_to = self.get_local_path(subpath)
+        key = (store_path, subpath)
+        if key not in self._inflight:
+            if check_cache and self.get(path_to):
+                self.hits += 1
+                self.lease(path_to)
+                return path_to
+            self.misses += 1
+        path = await self._inflight.do(
+            key,
+            self._fetch,
+            fs=fs,
+            store_path=store_path,
+            subpath=subpath,
+            path_to=path_to,
+            check_cache=check_cache,
+        )
+        if path:
+            self.lease(path)
+        return path
+
+    @asynccontextmanager
+    async def open_file(
+        self, fs: FSSystem, store_path: str, subpath: str, check_cache: bool = True
+    ) -> AsyncIterator[Optional[str]]:
+        """Downloads the file and pins it until the block exits."""
+        path = await self.download_file(
+            fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+        )
+        if not path:
+            yield None
+            return
+        self.pin(path)
+        try:
+            yield path
+        finally:
+            self.unpin(path)
+
+    def get_stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pinned": len(self._pins),
+            "coalesced": self._inflight.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+DISK_CACHE = DiskCache()
+
+
+async def download_file(
+    fs: FSSystem, store_path: str, subpath: str, check_cache: bool = True
+) -> Optional[str]:
+    return await DISK_CACHE.download_file(
+        fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    )
+
+
+def open_file(
+    fs: FSSystem, store_path: str, subpath: str, check_cache: bool = True
+) -> AsyncIterator[Optional[str]]:
+    return DISK_CACHE.open_file(
+        fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    )
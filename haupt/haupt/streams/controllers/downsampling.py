@@ -0,0 +1,149 @@
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_LTTB = "lttb"
+DOWNSAMPLE_MINMAX = "minmax"
+DOWNSAMPLE_MODES = {DOWNSAMPLE_LTTB, DOWNSAMPLE_MINMAX}
+
+
+class DownsampleSpec(NamedTuple):
+    mode: Optional[str] = None
+    min_step: Optional[int] = None
+    max_step: Optional[int] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    @classmethod
+    def from_query(cls, query: Dict) -> Optional["DownsampleSpec"]:
+        mode = query.get("downsample")
+        if mode and mode not in DOWNSAMPLE_MODES:
+            raise ValueError(
+                "received an unrecognisable downsample mode {}.".format(mode)
+            )
+        spec = cls(
+            mode=mode or None,
+            min_step=int(query["min_step"]) if query.get("min_step") else None,
+            max_step=int(query["max_step"]) if query.get("max_step") else None,
+            start=query.get("start") or None,
+            end=query.get("end") or None,
+        )
+        if spec == cls():
+            return None
+        # Validate the time window early to return a proper error
+        for value in (spec.start, spec.end):
+            if value:
+                pd.Timestamp(value)
+        return spec
+
+    @property
+    def has_window(self) -> bool:
+        return any(
+            v is not None for v in (self.min_step, self.max_step, self.start, self.end)
+        )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-triangle-three-buckets, returns the indices of the selected points.
+
+    The first and last points are always kept, each bucket in between selects
+    the point forming the largest triangle with the previously selected point
+    and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Average of each bucket, used as the third vertex of the previous bucket
+    sums_x = np.add.reduceat(x[1 : n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[a] - avg_x[i + 1]) * (bucket_y - y[a])
+            - (x[a] - bucket_x) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Per bucket min, max and last points, returns the sorted unique indices.
+
+    Keeping the extremes of every bucket preserves the spikes
+    that a random or strided sample would drop.
+    """
+    n = len(x)
+    num_buckets = max(threshold // 3, 1)
+    if threshold >= n or num_buckets >= n:
+        return np.arange(n)
+
+    buckets = (np.arange(n) * num_buckets) // n
+    order = np.lexsort((y, buckets))
+    bucket_starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    bucket_ends = np.append(bucket_starts[1:], n) - 1
+    return np.unique(
+        np.concatenate([order[bucket_starts], order[bucket_ends], bucket_ends])
+    )
+
+
+def filter_window(df: pd.DataFrame, downsample: DownsampleSpec) -> pd.DataFrame:
+    mask = np.ones(df.shape[0], dtype=bool)
+    if (
+        downsample.min_step is not None or downsample.max_step is not None
+    ) and "step" in df.columns:
+        steps = pd.to_numeric(df["step"], errors="coerce").to_numpy()
+        if downsample.min_step is not None:
+            mask &= steps >= downsample.min_step
+        if downsample.max_step is not None:
+            mask &= steps <= downsample.max_step
+    if (downsample.start or downsample.end) and "timestamp" in df.columns:
+        timestamps = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+        if downsample.start:
+            mask &= (timestamps >= pd.Timestamp(downsample.start, tz="UTC")).to_numpy()
+        if downsample.end:
+            mask &= (timestamps <= pd.Timestamp(downsample.end, tz="UTC")).to_numpy()
+    if mask.all():
+        return df
+    return df[mask]
+
+
+def downsample_df(
+    df: pd.DataFrame, column: str, threshold: int, mode: str
+) -> pd.DataFrame:
+    if df.shape[0] <= threshold:
+        return df
+    if column not in df.columns or not pd.api.types.is_numeric_dtype(df[column]):
+        # Non numeric events cannot be ranked, use evenly spaced rows instead
+        indices = np.unique(np.linspace(0, df.shape[0] - 1, threshold).astype(int))
+        return df.iloc[indices]
+
+    y = df[column].to_numpy(dtype=np.float64)
+    valid = np.isfinite(y)
+    if not valid.all():
+        df = df[valid]
+        y = y[valid]
+    if "step" in df.columns and pd.api.types.is_numeric_dtype(df["step"]):
+        x = df["step"].to_numpy(dtype=np.float64)
+        if not np.isfinite(x).all():
+            x = np.arange(df.shape[0], dtype=np.float64)
+    else:
+        x = np.arange(df.shape[0], dtype=np.float64)
+    if mode == DOWNSAMPLE_LTTB:
+        indices = lttb_indices(x, y, threshold)
+    else:
+        indices = minmax_indices(x, y, threshold)
+    return df.iloc[indices]
@@ -1,25 +1,55 @@
+import asyncio
+import base64
 import logging
 import os
 
-from typing import Dict, List, Optional, Set
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from clipped.utils.json import orjson_dumps, orjson_loads
 
-from clipped.utils.json import orjson_loads
+from django.conf import settings
 
 import aiofiles
 
 from asgiref.sync import sync_to_async
-from polyaxon._fs.async_manager import (
-    download_file,
-    download_files,
-    list_files,
-    tar_files,
+from haupt.streams.controllers.coalescing import SINGLE_FLIGHT
+from haupt.streams.controllers.compaction import (
+    download_compacted_events,
+    get_events_files_sizes,
+    read_compacted_events,
 )
+from haupt.streams.controllers.concurrency import gather_bounded
+from haupt.streams.controllers.disk_cache import download_file, open_file
+from haupt.streams.controllers.downsampling import (
+    DownsampleSpec,
+    downsample_df,
+    filter_window,
+)
+from polyaxon import settings as polyaxon_settings
+from polyaxon._fs.async_manager import ensure_async_execution, list_files, tar_files
 from polyaxon._fs.types import FSSystem
+from polyaxon._fs.utils import get_store_path
+from polyaxon.schemas import V1ProjectFeature
 from traceml.artifacts import V1ArtifactKind
-from traceml.events import V1Events, get_event_path, get_resource_path
+from traceml.events import V1Event, V1Events, get_event_path, get_resource_path
 
 logger = logging.getLogger("haupt.streams.events")
 
+# Number of runs loaded at the same time when streaming multi-run events
+STREAMS_RUNS_WINDOW = 4
+# Size of the first read when looking for the header of a csv events file
+EVENTS_HEADER_CHUNK_SIZE = 1024
+
 
 async def get_events_files(
     fs: FSSystem, store_path: str, run_uuid: str, event_kind: str
@@ -41,44 +71,193 @@ async def get_resources_files(
     return sorted([f for f in files["files"].keys()])
 
 
+class EventsCache:
+    """In-process LRU cache of parsed events, bounded by memory.
+
+    Entries are keyed by the event path and validated against the file's
+    inode, size and mtime, so a file that changed on disk is parsed again.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        if self._max_size is not None:
+            return self._max_size
+        return settings.STREAMS_EVENTS_CACHE_SIZE
+
+    @staticmethod
+    def get_signature(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+
+    @staticmethod
+    def get_value_size(value: V1Events) -> int:
+        try:
+            return int(value.df.memory_usage(index=True, deep=True).sum())
+        except Exception:  # noqa
+            return 0
+
+    def get(self, key: Any, signature: Tuple[int, int, int]) -> Optional[V1Events]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != signature:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Any, signature: Tuple[int, int, int], value: V1Events):
+        self.pop(key)
+        value_size = self.get_value_size(value)
+        max_size = self.max_size
+        if not max_size or value_size > max_size:
+            return
+        self._entries[key] = (signature, value, value_size)
+        self._size += value_size
+        while self._size > max_size and self._entries:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: Any):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def clear(self):
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get_stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+EVENTS_CACHE = EventsCache()
+
+
+async def read_operation_event(
+    event_path: str, event_kind: str, event_name: str
+) -> Optional[V1Events]:
+    """Returns the parsed events, from the cache if the file did not change.
+
+    The returned frame is shared with the cache and must not be modified in place.
+    """
+    signature = EVENTS_CACHE.get_signature(event_path)
+    if signature is None:
+        return None
+    key = (event_path, event_kind)
+    event_df = EVENTS_CACHE.get(key, signature)
+    if event_df is not None:
+        return V1Events(kind=event_kind, name=event_name, df=event_df.df)
+
+    # Concurrent misses on the same file parse it once
+    return await SINGLE_FLIGHT.do(
+        ("parse", key, signature),
+        _parse_operation_event,
+        event_path=event_path,
+        event_kind=event_kind,
+        event_name=event_name,
+        key=key,
+        signature=signature,
+    )
+
+
+async def _parse_operation_event(
+    event_path: str,
+    event_kind: str,
+    event_name: str,
+    key: Tuple[str, str],
+    signature: Tuple[int, int, int],
+) -> Optional[V1Events]:
+    async with aiofiles.open(event_path, mode="r") as f:
+        contents = await f.read()
+    if not contents:
+        return None
+    event_df = await sync_to_async(V1Events.read, thread_sensitive=False)(
+        kind=event_kind,
+        name=event_name,
+        data=contents,
+        parse_dates=False,
+        engine="pyarrow",
+    )
+    EVENTS_CACHE.set(key, signature, event_df)
+    return event_df
+
+
+def sample_operation_event(
+    event_df: V1Events,
+    sample: Optional[int],
+    downsample: Optional[DownsampleSpec] = None,
+) -> V1Events:
+    df = event_df.df
+    try:
+        if downsample and downsample.has_window:
+            df = filter_window(df=df, downsample=downsample)
+        sample = int(sample) if sample else None
+        if sample and df.shape[0] > sample:
+            if downsample and downsample.mode:
+                df = downsample_df(
+                    df=df, column=event_df.kind, threshold=sample, mode=downsample.mode
+                )
+            else:
+                df = df.sample(n=sample, random_state=0).sort_index()
+    except Exception as e:
+        logger.warning("Could not sample event dataframe, error %s", e)
+        return event_df
+    if df is event_df.df:
+        return event_df
+    return V1Events(kind=event_df.kind, name=event_df.name, df=df)
+
+
 async def process_operation_event(
     event_path: str,
     event_kind: str,
     event_name: str,
     orient: str = V1Events.ORIENT_CSV,
     sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
     to_dict: bool = True,
 ) -> Optional[Dict]:
     if not event_path or not os.path.exists(event_path):
         return None
 
+    if orient == V1Events.ORIENT_DICT:
+        event_df = await read_operation_event(
+            event_path=event_path, event_kind=event_kind, event_name=event_name
+        )
+        if event_df is None:
+            return None
+        event_df = sample_operation_event(
+            event_df=event_df, sample=sample, downsample=downsample
+        )
+        return {
+            "name": event_name,
+            "kind": event_kind,
+            "data": event_df.to_dict() if to_dict else event_df,
+        }
+
     async with aiofiles.open(event_path, mode="r") as f:
         contents = await f.read()
         if contents:
             if orient == V1Events.ORIENT_CSV:
                 return {"name": event_name, "kind": event_kind, "data": contents}
-            if orient == V1Events.ORIENT_DICT:
-                event_df = await sync_to_async(V1Events.read)(
-                    kind=event_kind,
-                    name=event_name,
-                    data=contents,
-                    parse_dates=False,
-                    engine="pyarrow",
-                )
-                if sample:
-                    try:
-                        sample = int(sample)
-                        if event_df.df.shape[0] > sample:
-                            event_df.df = event_df.df.sample(
-                                n=sample, random_state=0
-                            ).sort_index()
-                    except Exception as e:
-                        logger.warning("Could not sample event dataframe, error %s", e)
-                return {
-                    "name": event_name,
-                    "kind": event_kind,
-                    "data": event_df.to_dict() if to_dict else event_df,
-                }
             else:
                 logger.warning(
                     "received an unrecognisable orient value {}.".format(orient)
@@ -86,6 +265,149 @@ async def process_operation_event(
     return None
 
 
+def encode_events_cursor(offsets: Dict[str, int]) -> str:
+    return base64.urlsafe_b64encode(orjson_dumps(offsets).encode()).decode()
+
+
+def decode_events_cursor(cursor: Optional[str]) -> Dict[str, int]:
+    if not cursor:
+        return {}
+    try:
+        offsets = orjson_loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {k: int(v) for k, v in offsets.items() if int(v) >= 0}
+    except Exception as e:
+        logger.warning("Received an invalid events cursor %s, error %s", cursor, e)
+        return {}
+
+
+async def read_store_range(fs: FSSystem, path: str, start: int, end: int) -> bytes:
+    return await ensure_async_execution(
+        fs=fs, fct="cat_file", is_async=fs.async_impl, path=path, start=start, end=end
+    )
+
+
+async def get_store_file_size(fs: FSSystem, path: str) -> Optional[int]:
+    try:
+        info = await ensure_async_execution(
+            fs=fs, fct="info", is_async=fs.async_impl, path=path
+        )
+    except FileNotFoundError:
+        return None
+    return info.get("size")
+
+
+async def read_store_header(fs: FSSystem, path: str, size: int) -> Optional[bytes]:
+    """Returns the first line of the file, or None if it is not complete yet."""
+    end = min(EVENTS_HEADER_CHUNK_SIZE, size)
+    while True:
+        contents = await read_store_range(fs=fs, path=path, start=0, end=end)
+        index = contents.find(b"\n")
+        if index >= 0:
+            return contents[:index]
+        if end >= size:
+            return None
+        end = min(end * 2, size)
+
+
+def is_complete_row(row: bytes, header: bytes) -> bool:
+    """Returns True if the last row of a file can be parsed.
+
+    Rows are appended with a leading line break and in a single write,
+    so the last row is never followed by a line break.
+    """
+    try:
+        value = row.decode()
+    except UnicodeDecodeError:
+        return False
+    if not header:
+        try:
+            orjson_loads(value)
+        except ValueError:
+            return False
+        return True
+    fields = value.split(V1Event._SEPARATOR)
+    return bool(fields[-1]) and len(fields) == len(
+        header.decode().split(V1Event._SEPARATOR)
+    )
+
+
+async def read_operation_event_tail(
+    fs: FSSystem, event_path: str, event_kind: str, offset: int = 0
+) -> Tuple[Optional[str], int]:
+    """Returns the complete rows appended after the byte offset and the next offset.
+
+    Only the appended bytes are read from the store.
+    A row is complete once it is followed by a line break,
+    the last row of the file is complete once it can be parsed,
+    otherwise it is returned by a later read.
+    For csv events the header is prepended to keep the content parsable.
+    If the file is smaller than the offset, e.g. it was rewritten,
+    the file is read from the beginning.
+    """
+    size = await get_store_file_size(fs=fs, path=event_path)
+    if size is None:
+        return None, offset
+    header = b""
+    if not V1ArtifactKind.is_jsonl_file_event(event_kind):
+        header = await read_store_header(fs=fs, path=event_path, size=size)
+        if header is None:
+            return None, offset
+    if offset < len(header) or offset > size:
+        offset = len(header)
+    if offset >= size:
+        return None, offset
+    contents = await read_store_range(fs=fs, path=event_path, start=offset, end=size)
+    complete = contents.rfind(b"\n")
+    if is_complete_row(contents[complete + 1 :], header):
+        complete = len(contents)
+    if complete <= 0:
+        return None, offset
+    contents = contents[:complete]
+    next_offset = offset + complete
+    if not contents.strip():
+        return None, next_offset
+    if header and not contents.startswith(b"\n"):
+        contents = b"\n" + contents
+    return (header + contents).decode(), next_offset
+
+
+async def process_operation_event_tail(
+    fs: FSSystem,
+    event_path: str,
+    event_kind: str,
+    event_name: str,
+    offset: int = 0,
+    orient: str = V1Events.ORIENT_CSV,
+    sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+) -> Tuple[Optional[Dict], int]:
+    contents, next_offset = await read_operation_event_tail(
+        fs=fs, event_path=event_path, event_kind=event_kind, offset=offset
+    )
+    if not contents:
+        return None, next_offset
+    if orient == V1Events.ORIENT_CSV:
+        return {"name": event_name, "kind": event_kind, "data": contents}, next_offset
+    if orient == V1Events.ORIENT_DICT:
+        event_df = await sync_to_async(V1Events.read, thread_sensitive=False)(
+            kind=event_kind,
+            name=event_name,
+            data=contents,
+            parse_dates=False,
+            engine="pyarrow",
+        )
+        event_df = sample_operation_event(
+            event_df=event_df, sample=sample, downsample=downsample
+        )
+        return {
+            "name": event_name,
+            "kind": event_kind,
+            "data": event_df.to_dict(),
+        }, next_offset
+    logger.warning("received an unrecognisable orient value {}.".format(orient))
+    return None, offset
+
+
 async def get_archived_operation_resource(
     fs: FSSystem,
     store_path: str,
@@ -95,19 +417,20 @@ async def get_archived_operation_resource(
     orient: str = V1Events.ORIENT_CSV,
     check_cache: bool = True,
     sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
 ) -> Optional[Dict]:
     subpath = get_resource_path(run_path=run_uuid, kind=event_kind, name=event_name)
-    event_path = await download_file(
+    async with open_file(
         fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
-    )
-
-    return await process_operation_event(
-        event_path=event_path,
-        event_kind=event_kind,
-        event_name=event_name,
-        orient=orient,
-        sample=sample,
-    )
+    ) as event_path:
+        return await process_operation_event(
+            event_path=event_path,
+            event_kind=event_kind,
+            event_name=event_name,
+            orient=orient,
+            sample=sample,
+            downsample=downsample,
+        )
 
 
 async def get_archived_operation_event(
@@ -119,36 +442,143 @@ async def get_archived_operation_event(
     orient: str = V1Events.ORIENT_CSV,
     check_cache: bool = True,
     sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
 ) -> Optional[Dict]:
     subpath = get_event_path(run_path=run_uuid, kind=event_kind, name=event_name)
-    event_path = await download_file(
+    async with open_file(
         fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    ) as event_path:
+        return await process_operation_event(
+            event_path=event_path,
+            event_kind=event_kind,
+            event_name=event_name,
+            orient=orient,
+            sample=sample,
+            downsample=downsample,
+        )
+
+
+async def get_archived_operation_event_tail(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    event_kind: str,
+    event_name: str,
+    offset: int = 0,
+    orient: str = V1Events.ORIENT_CSV,
+    sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+) -> Tuple[Optional[Dict], int]:
+    if not polyaxon_settings.AGENT_CONFIG:
+        # The tail is read directly from the agent's artifacts store
+        logger.warning(
+            "Received an events tail request, but the agent config is not set."
+        )
+        return None, offset
+    subpath = get_event_path(run_path=run_uuid, kind=event_kind, name=event_name)
+    event_path = get_store_path(
+        store_path=store_path, subpath=subpath, entity=V1ProjectFeature.RUNTIME
     )
 
-    return await process_operation_event(
+    return await process_operation_event_tail(
+        fs=fs,
         event_path=event_path,
         event_kind=event_kind,
         event_name=event_name,
+        offset=offset,
         orient=orient,
         sample=sample,
+        downsample=downsample,
     )
 
 
-async def get_archived_operation_event_and_assets(
+async def get_compacted_operation_events(
     fs: FSSystem,
     store_path: str,
     run_uuid: str,
     event_kind: str,
-    event_name: str,
-    check_cache: bool = True,
-) -> List[str]:
-    pkg_files = []
-    subpath = get_event_path(run_path=run_uuid, kind=event_kind, name=event_name)
-    event_path = await download_file(
-        fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    event_names: List[str],
+    sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+) -> Dict[str, Dict]:
+    """Returns the events available in the run's compacted file, keyed by name.
+
+    Events whose source files changed since the compaction, e.g. of a resumed run,
+    are not returned and must be read from the raw files.
+    """
+    compacted_path = await download_compacted_events(
+        fs=fs, store_path=store_path, run_uuid=run_uuid, event_kind=event_kind
+    )
+    if not compacted_path:
+        return {}
+    sizes = await get_events_files_sizes(
+        fs=fs, store_path=store_path, run_uuid=run_uuid, event_kind=event_kind
     )
-    pkg_files.append(event_path)
+    try:
+        events = await sync_to_async(read_compacted_events, thread_sensitive=False)(
+            compacted_path, event_kind, event_names, downsample, sizes
+        )
+    except Exception as e:
+        logger.warning(
+            "Could not read the compacted events of run %s, error %s", run_uuid, e
+        )
+        return {}
+    return {
+        event_name: {
+            "name": event_name,
+            "kind": event_kind,
+            "data": sample_operation_event(
+                event_df=event_df, sample=sample, downsample=downsample
+            ).to_dict(),
+        }
+        for event_name, event_df in events.items()
+    }
+
 
+def _merge_compacted_results(
+    event_names: List[str],
+    compacted_events: Dict[str, Dict],
+    missing_names: List[str],
+    results: List,
+) -> List:
+    missing_results = dict(zip(missing_names, results))
+    return [
+        compacted_events[e] if e in compacted_events else missing_results[e]
+        for e in event_names
+    ]
+
+
+def _collect_results(
+    run_uuid: str,
+    event_names: List[str],
+    results: List,
+    errors: Optional[Dict[str, List[Dict]]] = None,
+) -> List:
+    values = []
+    for event_name, result in zip(event_names, results):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Could not load event %s for run %s, error %s",
+                event_name,
+                run_uuid,
+                result,
+            )
+            if errors is not None:
+                errors.setdefault(run_uuid, []).append(
+                    {"name": event_name, "error": str(result)}
+                )
+            continue
+        if result:
+            values.append(result)
+    return values
+
+
+async def _get_event_assets_subpaths(
+    run_uuid: str,
+    event_kind: str,
+    event_name: str,
+    event_path: Optional[str],
+) -> List[str]:
     event = await process_operation_event(
         event_path=event_path,
         event_kind=event_kind,
@@ -158,7 +588,9 @@ async def get_archived_operation_event_and_assets(
         to_dict=False,
     )
     if not event:
-        logger.warning("During the packaging of %s, the event download failed.")
+        logger.warning(
+            "During the packaging of %s, the event download failed.", event_path
+        )
         return []
     df = event["data"].df
     try:
@@ -168,17 +600,58 @@ async def get_archived_operation_event_and_assets(
             "During the packaging of %s, the event format found was not correct. "
             "Error %s" % (event_path, e)
         )
-        return pkg_files
-    subpaths = []
-    for file_from_path in files:
-        subpaths.append("{}/{}".format(run_uuid, file_from_path))
+        return []
+    return ["{}/{}".format(run_uuid, file_from_path) for file_from_path in files]
+
+
+async def _download_files(
+    fs: FSSystem,
+    store_path: str,
+    subpaths: List[str],
+    check_cache: bool = True,
+) -> List[str]:
+    results = await gather_bounded(
+        download_file(
+            fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+        )
+        for subpath in subpaths
+    )
+    pkg_files = []
+    for subpath, result in zip(subpaths, results):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "The file download for path %s failed. Error %s" % (subpath, result)
+            )
+            continue
+        pkg_files.append(result)
+    return pkg_files
 
-    return await download_files(
+
+async def get_archived_operation_event_and_assets(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    event_kind: str,
+    event_name: str,
+    check_cache: bool = True,
+) -> List[str]:
+    subpath = get_event_path(run_path=run_uuid, kind=event_kind, name=event_name)
+    event_path = await download_file(
+        fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    )
+    subpaths = await _get_event_assets_subpaths(
+        run_uuid=run_uuid,
+        event_kind=event_kind,
+        event_name=event_name,
+        event_path=event_path,
+    )
+    if not subpaths:
+        return [event_path] if event_path else []
+    return [event_path] + await _download_files(
         fs=fs,
         store_path=store_path,
         subpaths=subpaths,
         check_cache=check_cache,
-        pkg_files=pkg_files,
     )
 
 
@@ -190,17 +663,47 @@ async def get_archived_operation_events_and_assets(
     event_names: Set[str],
     check_cache: bool = True,
 ) -> Optional[str]:
-    pkg_files = []
-    for event_name in event_names:
-        event_pkg_files = await get_archived_operation_event_and_assets(
+    event_names = list(event_names)
+    # Each step is a flat fan-out to keep the concurrency limits effective:
+    # download the event files, extract their assets, then download the assets.
+    results = await gather_bounded(
+        download_file(
             fs=fs,
             store_path=store_path,
+            subpath=get_event_path(run_path=run_uuid, kind=event_kind, name=event_name),
+            check_cache=check_cache,
+        )
+        for event_name in event_names
+    )
+    pkg_files = []
+    events_paths = []
+    for event_name, event_path in zip(event_names, results):
+        if isinstance(event_path, BaseException) or not event_path:
+            logger.warning(
+                "During the packaging of %s, the event download failed.", event_name
+            )
+            continue
+        pkg_files.append(event_path)
+        events_paths.append((event_name, event_path))
+    results = await gather_bounded(
+        _get_event_assets_subpaths(
             run_uuid=run_uuid,
             event_kind=event_kind,
             event_name=event_name,
-            check_cache=check_cache,
+            event_path=event_path,
         )
-        pkg_files += event_pkg_files
+        for event_name, event_path in events_paths
+    )
+    subpaths = []
+    for event_subpaths in results:
+        if not isinstance(event_subpaths, BaseException):
+            subpaths += event_subpaths
+    pkg_files += await _download_files(
+        fs=fs,
+        store_path=store_path,
+        subpaths=subpaths,
+        check_cache=check_cache,
+    )
     return await tar_files(
         filename="{}.{}.{}".format(run_uuid, event_kind, "-and-".join(event_names)),
         pkg_files=pkg_files,
@@ -217,15 +720,16 @@ async def get_archived_operation_resources(
     orient: str = V1Events.ORIENT_CSV,
     check_cache: bool = True,
     sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
 ) -> List[Dict]:
-    events = []
     if not event_names:
         files = await get_resources_files(
             fs=fs, store_path=store_path, run_uuid=run_uuid
         )
         event_names = [f.split(".plx")[0] for f in files]
-    for event_name in event_names:
-        event = await get_archived_operation_resource(
+    event_names = list(event_names)
+    results = await gather_bounded(
+        get_archived_operation_resource(
             fs=fs,
             store_path=store_path,
             run_uuid=run_uuid,
@@ -234,10 +738,11 @@ async def get_archived_operation_resources(
             orient=orient,
             check_cache=check_cache,
             sample=sample,
+            downsample=downsample,
         )
-        if event:
-            events.append(event)
-    return events
+        for event_name in event_names
+    )
+    return _collect_results(run_uuid=run_uuid, event_names=event_names, results=results)
 
 
 async def get_archived_operation_events(
@@ -249,10 +754,24 @@ async def get_archived_operation_events(
     orient: str = V1Events.ORIENT_CSV,
     check_cache: bool = True,
     sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+    errors: Optional[Dict[str, List[Dict]]] = None,
 ) -> List[Dict]:
-    events = []
-    for event_name in event_names:
-        event = await get_archived_operation_event(
+    event_names = list(event_names)
+    compacted_events = {}
+    if orient == V1Events.ORIENT_DICT and check_cache:
+        compacted_events = await get_compacted_operation_events(
+            fs=fs,
+            store_path=store_path,
+            run_uuid=run_uuid,
+            event_kind=event_kind,
+            event_names=event_names,
+            sample=sample,
+            downsample=downsample,
+        )
+    missing_names = [e for e in event_names if e not in compacted_events]
+    results = await gather_bounded(
+        get_archived_operation_event(
             fs=fs,
             store_path=store_path,
             run_uuid=run_uuid,
@@ -261,33 +780,199 @@ async def get_archived_operation_events(
             orient=orient,
             check_cache=check_cache,
             sample=sample,
+            downsample=downsample,
         )
+        for event_name in missing_names
+    )
+    results = _merge_compacted_results(
+        event_names=event_names,
+        compacted_events=compacted_events,
+        missing_names=missing_names,
+        results=results,
+    )
+    return _collect_results(
+        run_uuid=run_uuid, event_names=event_names, results=results, errors=errors
+    )
+
+
+async def get_archived_operation_events_tail(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    event_kind: str,
+    event_names: Set[str],
+    cursor: Optional[str] = None,
+    orient: str = V1Events.ORIENT_CSV,
+    sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+) -> Tuple[List[Dict], str]:
+    """Returns only the events appended since the cursor and the next cursor.
+
+    The cursor is an opaque value returned by a previous call,
+    an empty cursor reads the events from the beginning.
+    The files are read from the store by range, so each call sees the latest rows.
+    """
+    offsets = decode_events_cursor(cursor)
+    event_names = list(event_names)
+    results = await gather_bounded(
+        get_archived_operation_event_tail(
+            fs=fs,
+            store_path=store_path,
+            run_uuid=run_uuid,
+            event_kind=event_kind,
+            event_name=event_name,
+            offset=offsets.get(event_name, 0),
+            orient=orient,
+            sample=sample,
+            downsample=downsample,
+        )
+        for event_name in event_names
+    )
+    events = []
+    for event_name, result in zip(event_names, results):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Could not load event %s for run %s, error %s",
+                event_name,
+                run_uuid,
+                result,
+            )
+            continue
+        event, offsets[event_name] = result
         if event:
             events.append(event)
-    return events
+    return events, encode_events_cursor(offsets)
 
 
 async def get_archived_operations_events(
     fs: FSSystem,
     store_path: str,
     event_kind: str,
-    run_uuids: Set[str],
+    run_uuids: Iterable[str],
     event_names: Set[str],
     orient: str = V1Events.ORIENT_CSV,
     check_cache: bool = True,
     sample: Optional[int] = None,
-) -> Dict[str, List]:
-    events = {}
-    for run_uuid in run_uuids:
-        run_events = await get_archived_operation_events(
+    downsample: Optional[DownsampleSpec] = None,
+) -> Tuple[Dict[str, List], Dict[str, List[Dict]]]:
+    """Fetches the events of several runs with a single bounded fan-out.
+
+    Returns the events per run, in the order of `run_uuids` and `event_names`,
+    and the per run errors of the events that could not be loaded.
+    """
+    run_uuids = list(run_uuids)
+    event_names = list(event_names)
+    compacted_events = [{} for _ in run_uuids]
+    if orient == V1Events.ORIENT_DICT and check_cache:
+        compacted_events = await gather_bounded(
+            get_compacted_operation_events(
+                fs=fs,
+                store_path=store_path,
+                run_uuid=run_uuid,
+                event_kind=event_kind,
+                event_names=event_names,
+                sample=sample,
+                downsample=downsample,
+            )
+            for run_uuid in run_uuids
+        )
+        compacted_events = [
+            {} if isinstance(c, BaseException) else c for c in compacted_events
+        ]
+    missing_names = [
+        [e for e in event_names if e not in run_compacted_events]
+        for run_compacted_events in compacted_events
+    ]
+    results = await gather_bounded(
+        get_archived_operation_event(
             fs=fs,
             store_path=store_path,
             run_uuid=run_uuid,
             event_kind=event_kind,
-            event_names=event_names,
+            event_name=event_name,
             orient=orient,
             check_cache=check_cache,
             sample=sample,
+            downsample=downsample,
+        )
+        for run_uuid, run_missing_names in zip(run_uuids, missing_names)
+        for event_name in run_missing_names
+    )
+    events = {}
+    errors = {}
+    offset = 0
+    for i, run_uuid in enumerate(run_uuids):
+        num_missing = len(missing_names[i])
+        run_results = _merge_compacted_results(
+            event_names=event_names,
+            compacted_events=compacted_events[i],
+            missing_names=missing_names[i],
+            results=results[offset : offset + num_missing],
+        )
+        offset += num_missing
+        events[run_uuid] = _collect_results(
+            run_uuid=run_uuid,
+            event_names=event_names,
+            results=run_results,
+            errors=errors,
         )
-        events[run_uuid] = run_events
-    return events
+    return events, errors
+
+
+async def iter_archived_operations_events(
+    fs: FSSystem,
+    store_path: str,
+    event_kind: str,
+    run_uuids: Iterable[str],
+    event_names: Set[str],
+    orient: str = V1Events.ORIENT_CSV,
+    check_cache: bool = True,
+    sample: Optional[int] = None,
+    downsample: Optional[DownsampleSpec] = None,
+    window: int = STREAMS_RUNS_WINDOW,
+) -> AsyncIterator[Tuple[str, List[Dict], List[Dict]]]:
+    """Yields the events and the errors of each run as soon as they are loaded.
+
+    At most `window` runs are loaded at the same time and a new run is only started
+    after a loaded one was consumed, so that the memory stays proportional to the window
+    regardless of the number of runs. Runs are yielded in completion order.
+    """
+
+    async def get_run_events(run_uuid: str) -> Tuple[str, List[Dict], List[Dict]]:
+        errors = {}
+        try:
+            events = await get_archived_operation_events(
+                fs=fs,
+                store_path=store_path,
+                run_uuid=run_uuid,
+                event_kind=event_kind,
+                event_names=event_names,
+                orient=orient,
+                check_cache=check_cache,
+                sample=sample,
+                downsample=downsample,
+                errors=errors,
+            )
+        except Exception as e:
+            logger.warning("Could not load the events of run %s, error %s", run_uuid, e)
+            return run_uuid, [], [{"error": str(e)}]
+        return run_uuid, events, errors.get(run_uuid, [])
+
+    run_uuids = iter(run_uuids)
+    pending = set()
+    try:
+        while True:
+            for run_uuid in run_uuids:
+                pending.add(asyncio.ensure_future(get_run_events(run_uuid)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,16 +1,35 @@
+import asyncio
+import bisect
 import datetime
+import heapq
+import itertools
+import logging
 import os
+import time
 
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-import aiofiles
+from clipped.utils.bools import to_bool
 
+from django.conf import settings as dj_settings
+
+import regex
+
+from asgiref.sync import sync_to_async
+from haupt.streams.controllers.concurrency import gather_bounded
+from haupt.streams.controllers.disk_cache import download_file, open_file
 from haupt.streams.tasks.logs import (
     content_to_logs,
     download_agent_logs_file,
     download_logs,
     download_run_logs_file,
+    parse_logs_content,
 )
+from haupt.streams.tasks.logs_compression import (
+    read_logs_file_content,
+    strip_logs_compression_extension,
+)
+from haupt.streams.tasks.logs_index import get_logs_index
 from polyaxon._fs.async_manager import list_files
 from polyaxon._fs.types import FSSystem
 from polyaxon._k8s.logging.async_monitor import query_k8s_operation_logs
@@ -18,6 +37,12 @@ from polyaxon._k8s.manager.async_manager import AsyncK8sManager
 from traceml.events import get_logs_path
 from traceml.logging import V1Log
 
+_logger = logging.getLogger("haupt.streams.logs")
+
+LOGS_SEARCH_MAX_QUERY_LENGTH = 1024
+# Seconds a search can spend matching, so that a pathological regex cannot hold a worker
+LOGS_SEARCH_TIMEOUT = 10
+
 
 async def get_agent_logs_files(
     fs: FSSystem, store_path: str, agent_uuid: str, service: str
@@ -67,9 +92,10 @@ async def read_logs_file(logs_path) -> List[V1Log]:
     if not logs_path or not os.path.exists(logs_path):
         return []
 
-    async with aiofiles.open(logs_path, mode="r") as f:
-        content = await f.read()
-        return await content_to_logs(content, logs_path, to_structured=True)
+    content = await sync_to_async(read_logs_file_content, thread_sensitive=False)(
+        logs_path
+    )
+    return await content_to_logs(content, logs_path, to_structured=True)
 
 
 async def get_archived_agent_logs(
@@ -124,6 +150,75 @@ async def get_legacy_archived_operation_logs(
     return logs, last_file, files
 
 
+def get_logs_file_last_time(log_file: str) -> Optional[float]:
+    """Chunks are named after the timestamp of their last log line."""
+    try:
+        return float(strip_logs_compression_extension(log_file))
+    except ValueError:
+        return None
+
+
+def read_logs_file_since(
+    logs_path: str,
+    last_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+) -> List[V1Log]:
+    """Parses a chunk and returns its time-ordered logs after `last_time`."""
+    content = read_logs_file_content(logs_path)
+    logs = parse_logs_content(content, logs_path, to_structured=True)
+    if not logs:
+        return []
+    if any(logs[i].timestamp > logs[i + 1].timestamp for i in range(len(logs) - 1)):
+        logs = sorted(logs, key=lambda x: x.timestamp)
+    if last_time or end_time:
+        timestamps = [log.timestamp for log in logs]
+        start = bisect.bisect_right(timestamps, last_time) if last_time else 0
+        end = bisect.bisect_right(timestamps, end_time) if end_time else len(logs)
+        logs = logs[start:end]
+    return logs
+
+
+async def merge_logs_files(
+    logs_paths: List[str],
+    last_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict], Optional[datetime.datetime]]:
+    """Returns the time-ordered logs of the files, after `last_time` and up to `end_time`.
+
+    Each file is parsed and filtered in a worker thread, then the sorted files
+    are merged lazily so that only the returned page is converted.
+    """
+    results = await gather_bounded(
+        sync_to_async(read_logs_file_since, thread_sensitive=False)(
+            logs_path, last_time, end_time
+        )
+        for logs_path in logs_paths
+    )
+    files_logs = []
+    for logs_path, result in zip(logs_paths, results):
+        if isinstance(result, BaseException):
+            _logger.warning("Could not read the logs file %s: %s", logs_path, result)
+            continue
+        if result:
+            files_logs.append(result)
+    merged = heapq.merge(*files_logs, key=lambda x: x.timestamp)
+    if limit:
+        logs = list(itertools.islice(merged, limit))
+        # Keep the logs sharing the last timestamp, the next page starts strictly after it
+        if len(logs) == limit:
+            for log in merged:
+                if log.timestamp != logs[-1].timestamp:
+                    break
+                logs.append(log)
+    else:
+        logs = list(merged)
+
+    if logs:
+        last_time = logs[-1].timestamp
+    return [log.to_dict() for log in logs], last_time
+
+
 async def get_archived_pods_operation_logs(
     fs: FSSystem,
     store_path: str,
@@ -131,7 +226,8 @@ async def get_archived_pods_operation_logs(
     subpath: str,
     last_time: Optional[datetime.datetime] = None,
     check_cache: bool = True,
-) -> Tuple[List[V1Log], Optional[datetime.datetime]]:
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict], Optional[datetime.datetime]]:
     logs = []
 
     logs_path = await download_logs(
@@ -149,16 +245,243 @@ async def get_archived_pods_operation_logs(
     if not log_files:
         return logs, None
 
-    for log_file in log_files:
-        _logs_path = os.path.join(logs_path, log_file)
-        logs += await read_logs_file(_logs_path)
-
     if last_time:
-        logs = [l for l in logs if l.timestamp > last_time]
-    if logs:
-        logs = sorted(logs, key=lambda x: x.timestamp)
-        last_time = logs[-1].timestamp
-    return [l.to_dict() for l in logs], last_time
+        # Skip the chunks that ended before `last_time` without reading them
+        last_timestamp = last_time.timestamp()
+        log_files = [
+            f
+            for f in log_files
+            if get_logs_file_last_time(f) is None
+            or get_logs_file_last_time(f) > last_timestamp
+        ]
+
+    return await merge_logs_files(
+        [os.path.join(logs_path, log_file) for log_file in log_files],
+        last_time=last_time,
+        limit=limit,
+    )
+
+
+def select_logs_chunks(
+    chunks: List[str],
+    index: Dict[str, Dict],
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    limit: Optional[int] = None,
+) -> List[str]:
+    """Returns the chunks that can hold logs of the page after `start_time`.
+
+    A chunk's time range comes from the index, chunks missing from the index
+    only have their end time from their name, or nothing for pod files,
+    and are always selected if they can overlap the window.
+    """
+    start_timestamp = start_time.timestamp() if start_time else None
+    end_timestamp = end_time.timestamp() if end_time else None
+    candidates = []
+    for chunk in chunks:
+        entry = index.get(chunk) or {}
+        chunk_start = entry.get("start")
+        chunk_end = entry.get("end", get_logs_file_last_time(chunk))
+        if start_timestamp is not None and chunk_end is not None:
+            if chunk_end <= start_timestamp:
+                continue
+        if end_timestamp is not None and chunk_start is not None:
+            if chunk_start > end_timestamp:
+                continue
+        candidates.append((chunk, chunk_start, chunk_end, entry.get("lines")))
+    if not limit:
+        return [c[0] for c in candidates]
+
+    # The first `limit` logs are before the end of the earliest chunks holding
+    # `limit` lines, later chunks cannot contribute to the page.
+    bound = None
+    lines = 0
+    indexed = sorted((c for c in candidates if c[1] is not None), key=lambda c: c[1])
+    for _, chunk_start, chunk_end, chunk_lines in indexed:
+        bound = chunk_end if bound is None else max(bound, chunk_end)
+        # Only chunks fully inside the window count all their lines
+        if (start_timestamp is None or chunk_start > start_timestamp) and (
+            end_timestamp is None or chunk_end <= end_timestamp
+        ):
+            lines += chunk_lines or 0
+        if lines >= limit:
+            break
+    if lines < limit:
+        return [c[0] for c in candidates]
+    return [c[0] for c in candidates if c[1] is None or c[1] <= bound]
+
+
+async def get_archived_operation_logs_window(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    check_cache: bool = True,
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict], Optional[datetime.datetime]]:
+    """Returns a page of the archived logs after `start_time` and up to `end_time`.
+
+    Only the chunks that the logs index places in the window are downloaded.
+    """
+    chunks, index = await asyncio.gather(
+        get_run_logs_files(fs=fs, store_path=store_path, run_uuid=run_uuid),
+        get_logs_index(fs=fs, store_path=store_path, run_uuid=run_uuid),
+    )
+    chunks = select_logs_chunks(
+        chunks=chunks,
+        index=index,
+        start_time=start_time,
+        end_time=end_time,
+        limit=limit,
+    )
+    logs_subpath = get_logs_path(run_path=run_uuid, full_path=False)
+    results = await gather_bounded(
+        download_file(
+            fs=fs,
+            store_path=store_path,
+            subpath="{}/{}".format(logs_subpath, chunk),
+            check_cache=check_cache,
+        )
+        for chunk in chunks
+    )
+    logs_paths = [r for r in results if r and not isinstance(r, BaseException)]
+    return await merge_logs_files(
+        logs_paths, last_time=start_time, end_time=end_time, limit=limit
+    )
+
+
+class LogsMatcher(NamedTuple):
+    """Matches the log lines' values and their node, pod and container.
+
+    Patterns are matched with the `regex` engine, whose matches can be interrupted,
+    and the search fails with a `TimeoutError` once its deadline is reached.
+    """
+
+    pattern: Optional[regex.Pattern] = None
+    node: Optional[str] = None
+    pod: Optional[str] = None
+    container: Optional[str] = None
+    deadline: Optional[float] = None
+
+    @classmethod
+    def from_query(cls, query: Dict) -> "LogsMatcher":
+        value = query.get("query") or ""
+        if len(value) > LOGS_SEARCH_MAX_QUERY_LENGTH:
+            raise ValueError(
+                "received a query longer than {} characters.".format(
+                    LOGS_SEARCH_MAX_QUERY_LENGTH
+                )
+            )
+        flags = (
+            regex.IGNORECASE
+            if to_bool(query.get("ignore_case"), handle_none=True)
+            else 0
+        )
+        if not to_bool(query.get("regex"), handle_none=True):
+            value = regex.escape(value)
+        try:
+            pattern = regex.compile(value, flags) if value else None
+        except regex.error as e:
+            raise ValueError("received an invalid regex: {}.".format(e))
+        return cls(
+            pattern=pattern,
+            node=query.get("node") or None,
+            pod=query.get("pod") or None,
+            container=query.get("container") or None,
+            deadline=time.monotonic() + LOGS_SEARCH_TIMEOUT,
+        )
+
+    def match(self, log: V1Log) -> bool:
+        if self.node and log.node != self.node:
+            return False
+        if self.pod and log.pod != self.pod:
+            return False
+        if self.container and log.container != self.container:
+            return False
+        if not self.pattern:
+            return True
+        timeout = None
+        if self.deadline is not None:
+            timeout = self.deadline - time.monotonic()
+            if timeout <= 0:
+                raise TimeoutError("the logs search timed out.")
+        return bool(self.pattern.search(log.value or "", timeout=timeout))
+
+
+def search_logs_file(
+    logs_path: str,
+    matcher: LogsMatcher,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+) -> List[Dict]:
+    logs = read_logs_file_since(logs_path, last_time=start_time, end_time=end_time)
+    return [log.to_dict() for log in logs if matcher.match(log)]
+
+
+async def search_archived_operation_logs(
+    fs: FSSystem,
+    store_path: str,
+    run_uuid: str,
+    matcher: LogsMatcher,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    limit: Optional[int] = None,
+    check_cache: bool = True,
+) -> AsyncIterator[Dict]:
+    """Yields the matching archived logs, chunk by chunk in time order, up to `limit`.
+
+    Only the chunks that the logs index places in the window are downloaded,
+    they are scanned in worker threads, a window of chunks at a time,
+    so that the scan stops early once the limit is reached or the search times out.
+    """
+    chunks, index = await asyncio.gather(
+        get_run_logs_files(fs=fs, store_path=store_path, run_uuid=run_uuid),
+        get_logs_index(fs=fs, store_path=store_path, run_uuid=run_uuid),
+    )
+    chunks = select_logs_chunks(
+        chunks=chunks, index=index, start_time=start_time, end_time=end_time
+    )
+
+    def get_chunk_order(chunk: str) -> Tuple[bool, float]:
+        chunk_end = (index.get(chunk) or {}).get("end", get_logs_file_last_time(chunk))
+        # Pod files have no time in their name and are scanned last
+        return chunk_end is None, chunk_end or 0
+
+    chunks = sorted(chunks, key=get_chunk_order)
+    logs_subpath = get_logs_path(run_path=run_uuid, full_path=False)
+
+    async def search_chunk(chunk: str) -> List[Dict]:
+        async with open_file(
+            fs=fs,
+            store_path=store_path,
+            subpath="{}/{}".format(logs_subpath, chunk),
+            check_cache=check_cache,
+        ) as chunk_path:
+            if not chunk_path:
+                return []
+            return await sync_to_async(search_logs_file, thread_sensitive=False)(
+                chunk_path, matcher, start_time, end_time
+            )
+
+    window = dj_settings.STREAMS_REQUEST_CONCURRENCY
+    count = 0
+    for i in range(0, len(chunks), window):
+        results = await gather_bounded(
+            search_chunk(chunk) for chunk in chunks[i : i + window]
+        )
+        for chunk, result in zip(chunks[i : i + window], results):
+            if isinstance(result, TimeoutError):
+                _logger.warning("The logs search of run %s timed out", run_uuid)
+                return
+            if isinstance(result, BaseException):
+                _logger.warning("Could not search the logs chunk %s: %s", chunk, result)
+                continue
+            for log in result:
+                yield log
+                count += 1
+                if limit and count >= limit:
+                    return
 
 
 async def get_tmp_operation_logs(
@@ -171,6 +494,7 @@ async def get_tmp_operation_logs(
         subpath="plxlogs",
         last_time=last_time,
         check_cache=False,
+        limit=dj_settings.STREAMS_LOGS_PAGE_SIZE,
     )
     if logs:
         return logs, last_time
@@ -180,6 +504,7 @@ async def get_tmp_operation_logs(
         run_uuid=run_uuid,
         subpath=".tmpplxlogs",
         last_time=last_time,
+        limit=dj_settings.STREAMS_LOGS_PAGE_SIZE,
     )
 
 
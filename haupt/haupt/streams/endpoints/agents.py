@@ -18,10 +18,10 @@ from haupt.polyconf.config_manager import PLATFORM_CONFIG
 from haupt.streams.connections.fs import AppFS
 from haupt.streams.controllers.logs import get_archived_agent_logs
 from haupt.streams.endpoints.base import UJSONResponse
+from haupt.streams.tasks.logs import upload_logs_data
 from haupt.streams.tasks.op_spec import download_agent_spec, upload_agent_spec
 from kubernetes_asyncio.client import V1Pod
 from polyaxon import settings
-from polyaxon._fs.async_manager import upload_data
 from polyaxon._k8s.logging.async_monitor import (
     collect_agent_service_logs,
     get_agent_spec,
@@ -79,7 +79,7 @@ async def collect_agent_data(
             for c_logs in V1Logs.chunk_logs(logs):
                 last_file += 1
                 subpath = ".agents/{}/logs/{}/{}".format(agent_uuid, service, last_file)
-                await upload_data(
+                await upload_logs_data(
                     fs=fs, store_path=store_path, subpath=subpath, data=c_logs.to_json()
                 )
 
@@ -11,9 +11,11 @@ from django.db import transaction
 from django.http import FileResponse, HttpResponse
 from django.urls import path
 
-from haupt.common.endpoints.files import FilePathResponse
+from haupt.common.endpoints.files import get_file_response
 from haupt.common.endpoints.validation import validate_methods
 from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers.coalescing import SINGLE_FLIGHT
+from haupt.streams.controllers.disk_cache import download_file
 from haupt.streams.controllers.notebooks import render_notebook
 from haupt.streams.controllers.uploads import handle_posted_data
 from haupt.streams.endpoints.base import UJSONResponse
@@ -22,7 +24,6 @@ from polyaxon._fs.async_manager import (
     check_is_file,
     delete_file_or_dir,
     download_dir,
-    download_file,
     list_files,
 )
 
@@ -172,8 +173,8 @@ async def download_artifact(
             archived_path = await render_notebook(
                 archived_path=archived_path, check_cache=not force
             )
-        return FilePathResponse(filepath=archived_path)
-    return await redirect_file(archived_path)
+        return get_file_response(request, filepath=archived_path)
+    return await redirect_file(archived_path, request=request)
 
 
 async def upload_artifact(request: ASGIRequest, run_uuid: str) -> HttpResponse:
@@ -247,15 +248,20 @@ async def download_artifacts(request: ASGIRequest, run_uuid: str) -> HttpRespons
         is_file = await check_is_file(fs=fs, store_path=store_path, subpath=subpath)
         if is_file:
             return await download_artifact(request, run_uuid=run_uuid)
-    archived_path = await download_dir(
-        fs=fs, store_path=store_path, subpath=subpath, to_tar=True
+    archived_path = await SINGLE_FLIGHT.do(
+        ("tar", store_path, subpath),
+        download_dir,
+        fs=fs,
+        store_path=store_path,
+        subpath=subpath,
+        to_tar=True,
     )
     if not archived_path:
         return HttpResponse(
             content="Artifact not found: filepath={}".format(archived_path),
             status=status.HTTP_404_NOT_FOUND,
         )
-    return await redirect_file(archived_path)
+    return await redirect_file(archived_path, request=request)
 
 
 async def upload_artifacts(request: ASGIRequest, run_uuid: str) -> HttpResponse:
@@ -5,6 +5,8 @@ from django.core.handlers.asgi import ASGIRequest
 from django.http import HttpResponse
 from django.urls import re_path
 
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
 
 async def health(request: ASGIRequest) -> HttpResponse:
     return HttpResponse(status=status.HTTP_200_OK)
@@ -0,0 +1,54 @@
+import logging
+
+from typing import Dict, Optional
+
+from rest_framework import status
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.urls import path
+
+from haupt.common.endpoints.validation import validate_internal_auth, validate_methods
+from haupt.streams.controllers.coalescing import SINGLE_FLIGHT
+from haupt.streams.controllers.disk_cache import DISK_CACHE
+from haupt.streams.controllers.events import EVENTS_CACHE
+from haupt.streams.endpoints.base import UJSONResponse
+
+_logger = logging.getLogger("haupt.streams.cache")
+
+
+@transaction.non_atomic_requests
+async def get_cache_stats(
+    request: ASGIRequest,
+    methods: Optional[Dict] = None,
+) -> UJSONResponse:
+    validate_methods(request, methods)
+    try:
+        validate_internal_auth(request)
+    except Exception as e:
+        errors = "Request requires an authenticated internal service %s" % e
+        _logger.warning(errors)
+        return UJSONResponse(
+            data={"errors": errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return UJSONResponse(
+        {
+            "disk": DISK_CACHE.get_stats(),
+            "events": EVENTS_CACHE.get_stats(),
+            "inflight": SINGLE_FLIGHT.get_stats(),
+        }
+    )
+
+
+URLS_CACHE_STATS = "streams/cache/stats"
+
+# fmt: off
+internal_cache_routes = [
+    path(
+        URLS_CACHE_STATS,
+        get_cache_stats,
+        name="get_cache_stats",
+        kwargs=dict(methods=["GET"]),
+    ),
+]
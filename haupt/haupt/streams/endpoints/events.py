@@ -1,36 +1,50 @@
-from typing import Dict, Optional, Set, Union
+from typing import AsyncIterator, Dict, Optional, Set, Union
 
 from clipped.utils.bools import to_bool
-from clipped.utils.json import orjson_loads
+from clipped.utils.json import orjson_dumps, orjson_loads
 from rest_framework import status
 
 from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.urls import path
 
 from haupt.common.endpoints.validation import validate_methods
 from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers.downsampling import DownsampleSpec
 from haupt.streams.controllers.events import (
     get_archived_operation_events,
     get_archived_operation_events_and_assets,
+    get_archived_operation_events_tail,
     get_archived_operation_resources,
     get_archived_operations_events,
+    iter_archived_operations_events,
 )
-from haupt.streams.endpoints.base import UJSONResponse
+from haupt.streams.endpoints.base import NDJSON_CONTENT_TYPE, UJSONResponse
 from haupt.streams.endpoints.utils import redirect_file
 from traceml.artifacts import V1ArtifactKind
 from traceml.events import V1Events
 from traceml.processors.importance_processors import calculate_importance_correlation
 
 
+async def _stream_multi_run_events(events: AsyncIterator) -> AsyncIterator[bytes]:
+    async for run_uuid, run_events, run_errors in events:
+        data = {"run": run_uuid, "data": run_events}
+        if run_errors:
+            data["errors"] = run_errors
+        yield orjson_dumps(data).encode("utf-8") + b"\n"
+
+
 async def _get_multi_run_events(
     request: ASGIRequest,
     event_kind: str,
     methods: Optional[Dict] = None,
-) -> Union[UJSONResponse, HttpResponse]:
+) -> Union[UJSONResponse, StreamingHttpResponse, HttpResponse]:
     validate_methods(request, methods)
     force = to_bool(request.GET.get("force"), handle_none=True)
+    stream = to_bool(request.GET.get("stream"), handle_none=True) or (
+        NDJSON_CONTENT_TYPE in request.headers.get("Accept", "")
+    )
     if event_kind not in V1ArtifactKind.to_set():
         return HttpResponse(
             content="received an unrecognisable event {}.".format(event_kind),
@@ -40,11 +54,31 @@ async def _get_multi_run_events(
     event_names = request.GET["names"]
     orient = request.GET.get("orient")
     sample = request.GET.get("sample")
+    try:
+        downsample = DownsampleSpec.from_query(request.GET)
+    except ValueError as e:
+        return HttpResponse(content=str(e), status=status.HTTP_400_BAD_REQUEST)
     connection = request.GET.get("connection")
     orient = orient or V1Events.ORIENT_DICT
     event_names = {e for e in event_names.split(",") if e} if event_names else set([])
     run_uuids = {e for e in run_uuids.split(",") if e} if run_uuids else set([])
-    events = await get_archived_operations_events(
+    if stream:
+        # One NDJSON line per run, sent as soon as the run's events are loaded
+        events = iter_archived_operations_events(
+            fs=await AppFS.get_fs(connection=connection),
+            store_path=AppFS.get_fs_root_path(connection=connection),
+            run_uuids=run_uuids,
+            event_kind=event_kind,
+            event_names=event_names,
+            orient=orient,
+            check_cache=not force,
+            sample=sample,
+            downsample=downsample,
+        )
+        return StreamingHttpResponse(
+            _stream_multi_run_events(events), content_type=NDJSON_CONTENT_TYPE
+        )
+    events, errors = await get_archived_operations_events(
         fs=await AppFS.get_fs(connection=connection),
         store_path=AppFS.get_fs_root_path(connection=connection),
         run_uuids=run_uuids,
@@ -53,8 +87,12 @@ async def _get_multi_run_events(
         orient=orient,
         check_cache=not force,
         sample=sample,
+        downsample=downsample,
     )
-    return UJSONResponse({"data": events})
+    data = {"data": events}
+    if errors:
+        data["errors"] = errors
+    return UJSONResponse(data)
 
 
 @transaction.non_atomic_requests
@@ -132,6 +170,11 @@ async def get_run_events(
     event_names = request.GET["names"]
     orient = request.GET.get("orient")
     sample = request.GET.get("sample")
+    try:
+        downsample = DownsampleSpec.from_query(request.GET)
+    except ValueError as e:
+        return HttpResponse(content=str(e), status=status.HTTP_400_BAD_REQUEST)
+    cursor = request.GET.get("cursor")
     connection = request.GET.get("connection")
     orient = orient or V1Events.ORIENT_DICT
     event_names = {e for e in event_names.split(",") if e} if event_names else set([])
@@ -143,6 +186,19 @@ async def get_run_events(
             force=force,
             connection=connection,
         )
+    if cursor is not None:
+        events, cursor = await get_archived_operation_events_tail(
+            fs=await AppFS.get_fs(connection=connection),
+            store_path=AppFS.get_fs_root_path(connection=connection),
+            run_uuid=run_uuid,
+            event_kind=event_kind,
+            event_names=event_names,
+            cursor=cursor,
+            orient=orient,
+            sample=sample,
+            downsample=downsample,
+        )
+        return UJSONResponse({"data": events, "cursor": cursor})
     events = await get_archived_operation_events(
         fs=await AppFS.get_fs(connection=connection),
         store_path=AppFS.get_fs_root_path(connection=connection),
@@ -152,6 +208,7 @@ async def get_run_events(
         orient=orient,
         check_cache=not force,
         sample=sample,
+        downsample=downsample,
     )
     return UJSONResponse({"data": events})
 
@@ -164,12 +221,16 @@ async def get_run_resources(
     project: str,
     run_uuid: str,
     methods: Optional[Dict] = None,
-) -> UJSONResponse:
+) -> Union[UJSONResponse, HttpResponse]:
     validate_methods(request, methods)
     event_names = request.GET.get("names")
     orient = request.GET.get("orient")
     force = to_bool(request.GET.get("force"), handle_none=True)
     sample = request.GET.get("sample")
+    try:
+        downsample = DownsampleSpec.from_query(request.GET)
+    except ValueError as e:
+        return HttpResponse(content=str(e), status=status.HTTP_400_BAD_REQUEST)
     connection = request.GET.get("connection")
     orient = orient or V1Events.ORIENT_DICT
     event_names = {e for e in event_names.split(",") if e} if event_names else set([])
@@ -182,6 +243,7 @@ async def get_run_resources(
         orient=orient,
         check_cache=not force,
         sample=sample,
+        downsample=downsample,
     )
     return UJSONResponse({"data": events})
 
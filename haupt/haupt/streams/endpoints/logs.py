@@ -1,30 +1,38 @@
 import logging
+import os
 
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional, Union
 
 from clipped.utils.bools import to_bool
 from clipped.utils.dates import parse_datetime
+from clipped.utils.json import orjson_dumps
 from clipped.utils.serialization import datetime_serialize
 from rest_framework import status
 
+from django.conf import settings as dj_settings
 from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.urls import path
 
 from haupt.common.endpoints.validation import validate_internal_auth, validate_methods
 from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers.compaction import schedule_compact_run_events
 from haupt.streams.controllers.k8s_crd import get_k8s_operation
 from haupt.streams.controllers.logs import (
+    LogsMatcher,
     get_archived_operation_logs,
+    get_archived_operation_logs_window,
     get_k8s_operation_logs,
     get_run_logs_files,
     get_tmp_operation_logs,
+    search_archived_operation_logs,
 )
-from haupt.streams.endpoints.base import UJSONResponse
+from haupt.streams.endpoints.base import NDJSON_CONTENT_TYPE, UJSONResponse
+from haupt.streams.tasks.logs import index_run_logs, upload_logs_data
+from haupt.streams.tasks.logs_index import get_logs_chunk_entry, update_logs_index
 from haupt.streams.tasks.op_spec import upload_op_spec
 from polyaxon import settings
-from polyaxon._fs.async_manager import upload_data
 from polyaxon._k8s.converter.mixins import get_plural_for_kind
 from polyaxon._k8s.logging.async_monitor import get_op_spec, query_k8s_pod_logs
 from polyaxon._k8s.manager.async_manager import AsyncK8sManager
@@ -34,6 +42,8 @@ from traceml.logging import V1Logs
 
 logger = logging.getLogger("haupt.streams.logs")
 
+LOGS_SEARCH_DEFAULT_LIMIT = 1000
+
 
 @transaction.non_atomic_requests
 async def get_run_logs(
@@ -43,14 +53,28 @@ async def get_run_logs(
     project: str,
     run_uuid: str,
     methods: Optional[Dict] = None,
-) -> UJSONResponse:
+) -> Union[UJSONResponse, HttpResponse]:
     validate_methods(request, methods)
     force = to_bool(request.GET.get("force"), handle_none=True)
     connection = request.GET.get("connection")
     kind = request.GET.get("kind")
-    last_time = request.GET.get("last_time")
-    if last_time:
-        last_time = parse_datetime(last_time).astimezone()
+    try:
+        last_time = request.GET.get("last_time")
+        if last_time:
+            last_time = parse_datetime(last_time).astimezone()
+        # Time window over the archived logs, `start` is exclusive so that
+        # the returned `last_time` can be used as the `start` of the next page
+        start_time = request.GET.get("start")
+        if start_time:
+            start_time = parse_datetime(start_time).astimezone()
+        end_time = request.GET.get("end")
+        if end_time:
+            end_time = parse_datetime(end_time).astimezone()
+    except (ValueError, TypeError) as e:
+        return HttpResponse(
+            content="Received an invalid logs request: {}".format(e),
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     last_file = request.GET.get("last_file")
     files = []
 
@@ -84,6 +108,17 @@ async def get_run_logs(
         if k8s_manager:
             await k8s_manager.close()
 
+    elif start_time or end_time:
+        operation_logs, last_time = await get_archived_operation_logs_window(
+            fs=await AppFS.get_fs(connection=connection),
+            store_path=AppFS.get_fs_root_path(connection=connection),
+            run_uuid=run_uuid,
+            start_time=start_time,
+            end_time=end_time,
+            check_cache=not force,
+            limit=dj_settings.STREAMS_LOGS_PAGE_SIZE,
+        )
+        last_file = None
     else:
         operation_logs, last_file, files = await get_archived_operation_logs(
             fs=await AppFS.get_fs(connection=connection),
@@ -101,6 +136,54 @@ async def get_run_logs(
     return UJSONResponse(data)
 
 
+async def _stream_logs(logs: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    async for log in logs:
+        yield orjson_dumps(log).encode() + b"\n"
+
+
+@transaction.non_atomic_requests
+async def search_run_logs(
+    request: ASGIRequest,
+    namespace: str,
+    owner: str,
+    project: str,
+    run_uuid: str,
+    methods: Optional[Dict] = None,
+) -> Union[StreamingHttpResponse, HttpResponse]:
+    validate_methods(request, methods)
+    force = to_bool(request.GET.get("force"), handle_none=True)
+    connection = request.GET.get("connection")
+    try:
+        matcher = LogsMatcher.from_query(request.GET)
+        start_time = request.GET.get("start")
+        if start_time:
+            start_time = parse_datetime(start_time).astimezone()
+        end_time = request.GET.get("end")
+        if end_time:
+            end_time = parse_datetime(end_time).astimezone()
+        limit = int(request.GET.get("limit") or LOGS_SEARCH_DEFAULT_LIMIT)
+        if limit <= 0:
+            raise ValueError("received a non positive limit {}.".format(limit))
+    except (ValueError, TypeError) as e:
+        return HttpResponse(
+            content="Received an invalid search request: {}".format(e),
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if dj_settings.STREAMS_LOGS_PAGE_SIZE:
+        limit = min(limit, dj_settings.STREAMS_LOGS_PAGE_SIZE)
+    logs = search_archived_operation_logs(
+        fs=await AppFS.get_fs(connection=connection),
+        store_path=AppFS.get_fs_root_path(connection=connection),
+        run_uuid=run_uuid,
+        matcher=matcher,
+        start_time=start_time,
+        end_time=end_time,
+        limit=limit,
+        check_cache=not force,
+    )
+    return StreamingHttpResponse(_stream_logs(logs), content_type=NDJSON_CONTENT_TYPE)
+
+
 @transaction.non_atomic_requests
 async def collect_run_logs(
     request: ASGIRequest,
@@ -164,15 +247,29 @@ async def collect_run_logs(
 
             logs = V1Logs.model_construct(logs=logs)
             subpath = get_logs_path(run_path=run_uuid, filename=pod.metadata.name)
-            await upload_data(
+            subpath, size = await upload_logs_data(
                 fs=fs,
                 store_path=store_path,
                 subpath=subpath,
                 data=logs.get_jsonl_events(),
             )
+            entries[os.path.basename(subpath)] = get_logs_chunk_entry(
+                logs.logs, size=size
+            )
 
     # Only update logs of pods from the last timestamp
+    entries = {}
     await collect_and_archive_pod_logs()
+    try:
+        if entries:
+            await update_logs_index(
+                fs=fs, store_path=store_path, run_uuid=run_uuid, entries=entries
+            )
+        await index_run_logs(fs=fs, store_path=store_path, run_uuid=run_uuid)
+    except Exception as e:
+        logger.warning(
+            "Run's logs were not indexed, an error was raised. Error %s." % e
+        )
     op_spec, _, _ = await get_op_spec(
         k8s_manager=k8s_manager, run_uuid=run_uuid, run_kind=run_kind
     )
@@ -194,6 +291,9 @@ async def collect_run_logs(
             )
             logger.warning(errors)
 
+    if dj_settings.STREAMS_EVENTS_COMPACTION:
+        schedule_compact_run_events(fs=fs, store_path=store_path, run_uuid=run_uuid)
+
     return HttpResponse(status=status.HTTP_200_OK)
 
 
@@ -201,6 +301,9 @@ URLS_RUNS_COLLECT_LOGS = (
     "<str:namespace>/<str:owner>/<str:project>/runs/<str:run_uuid>/<str:run_kind>/logs"
 )
 URLS_RUNS_LOGS = "<str:namespace>/<str:owner>/<str:project>/runs/<str:run_uuid>/logs"
+URLS_RUNS_LOGS_SEARCH = (
+    "<str:namespace>/<str:owner>/<str:project>/runs/<str:run_uuid>/logs/search"
+)
 
 
 # fmt: off
@@ -211,6 +314,12 @@ logs_routes = [
         name="get_run_logs",
         kwargs=dict(methods=["GET"]),
     ),
+    path(
+        URLS_RUNS_LOGS_SEARCH,
+        search_run_logs,
+        name="search_run_logs",
+        kwargs=dict(methods=["GET"]),
+    ),
 ]
 internal_logs_routes = [
     path(
@@ -8,7 +8,7 @@ from django.core.handlers.asgi import ASGIRequest
 from django.http import FileResponse, HttpResponse
 
 from aiofiles.os import stat as aio_stat
-from haupt.common.endpoints.files import FilePathResponse
+from haupt.common.endpoints.files import FilePathResponse, get_file_response
 from polyaxon._services.values import PolyaxonServices
 
 
@@ -29,7 +29,9 @@ async def _redirect(
 
 
 async def redirect_file(
-    archived_path: str, additional_headers: Optional[Dict] = None
+    archived_path: str,
+    additional_headers: Optional[Dict] = None,
+    request: Optional[ASGIRequest] = None,
 ) -> Union[HttpResponse, FileResponse]:
     if not archived_path:
         return HttpResponse(
@@ -38,6 +40,8 @@ async def redirect_file(
         )
 
     if PolyaxonServices.is_sandbox():
+        if request is not None:
+            return get_file_response(request, filepath=archived_path)
         return FilePathResponse(filepath=archived_path)
     return await _redirect(
         redirect_path=archived_path, is_file=True, additional_headers=additional_headers
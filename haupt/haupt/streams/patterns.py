@@ -6,6 +6,7 @@ from haupt.common.apis.regex import OWNER_NAME_PATTERN, PROJECT_NAME_PATTERN
 from haupt.streams.endpoints.agents import agent_routes, internal_agent_routes
 from haupt.streams.endpoints.artifacts import artifacts_routes
 from haupt.streams.endpoints.auth_request import auth_request_routes
+from haupt.streams.endpoints.cache import internal_cache_routes
 from haupt.streams.endpoints.base import base_health_route
 from haupt.streams.endpoints.events import events_routes
 from haupt.streams.endpoints.k8s import k8s_routes
@@ -39,7 +40,10 @@ app_urlpatterns += [
     re_path(
         r"^{}/".format(INTERNAL_V1),
         include(
-            (internal_agent_routes + internal_logs_routes, "internal-v1"),
+            (
+                internal_agent_routes + internal_logs_routes + internal_cache_routes,
+                "internal-v1",
+            ),
             namespace="internal-v1",
         ),
     ),
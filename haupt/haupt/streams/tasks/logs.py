@@ -1,22 +1,41 @@
+import logging
 import os
 
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from clipped.utils.json import orjson_loads
 from clipped.utils.paths import delete_path
 
+from django.conf import settings as dj_settings
+
 from asgiref.sync import sync_to_async
+from haupt.streams.controllers.coalescing import SINGLE_FLIGHT
+from haupt.streams.controllers.concurrency import gather_bounded
+from haupt.streams.controllers.disk_cache import open_file
+from haupt.streams.tasks.logs_compression import (
+    compress_logs_data,
+    get_logs_compression_extension,
+    read_logs_file_content,
+)
+from haupt.streams.tasks.logs_index import (
+    get_logs_chunk_entry,
+    get_logs_index,
+    update_logs_index,
+)
 from polyaxon import settings
 from polyaxon._fs.async_manager import (
     delete_file_or_dir,
     download_dir,
-    open_file,
+    list_files,
     upload_data,
 )
 from polyaxon._fs.types import FSSystem
+from traceml.events import get_logs_path
 from traceml.logging import V1Log, V1Logs
 
+logger = logging.getLogger("haupt.streams.logs")
+
 
 async def clean_tmp_logs(fs: FSSystem, store_path: str, run_uuid: str):
     subpath = "{}/.tmpplxlogs".format(run_uuid)
@@ -26,39 +45,96 @@ async def clean_tmp_logs(fs: FSSystem, store_path: str, run_uuid: str):
     )
 
 
+class CompressedLogsData(bytes):
+    """Compressed logs passed to `upload_data`, which encodes its text data."""
+
+    def encode(self) -> bytes:
+        return bytes(self)
+
+
+async def upload_logs_data(
+    fs: FSSystem, store_path: str, subpath: str, data: str
+) -> Tuple[str, int]:
+    """Uploads a logs file, compressed if a logs compression is configured.
+
+    Returns the subpath of the file, with the extension of its compression,
+    and its size.
+    """
+    compression = dj_settings.STREAMS_LOGS_COMPRESSION
+    if compression:
+        subpath = "{}{}".format(subpath, get_logs_compression_extension(compression))
+        data = CompressedLogsData(
+            await sync_to_async(compress_logs_data, thread_sensitive=False)(
+                data, compression
+            )
+        )
+    await upload_data(fs=fs, store_path=store_path, subpath=subpath, data=data)
+    return subpath, len(data)
+
+
 async def upload_logs(fs: FSSystem, store_path: str, run_uuid: str, logs: List[V1Log]):
+    entries = {}
     for c_logs in V1Logs.chunk_logs(logs):
         last_file = datetime.timestamp(c_logs.logs[-1].timestamp)
-        subpath = "{}/plxlogs/{}".format(run_uuid, last_file)
-        await upload_data(
-            fs=fs, store_path=store_path, subpath=subpath, data=c_logs.to_json()
+        subpath, size = await upload_logs_data(
+            fs=fs,
+            store_path=store_path,
+            subpath="{}/plxlogs/{}".format(run_uuid, last_file),
+            data=c_logs.to_json(),
+        )
+        entries[os.path.basename(subpath)] = get_logs_chunk_entry(
+            c_logs.logs, size=size
+        )
+    if entries:
+        await update_logs_index(
+            fs=fs, store_path=store_path, run_uuid=run_uuid, entries=entries
         )
 
 
-async def content_to_logs(content, logs_path, to_structured: bool = False):
+def parse_logs_content(content, logs_path, to_structured: bool = False):
     if not content:
         return []
 
-    @sync_to_async
-    def convert():
-        # Version handling
-        if ".plx" in logs_path:
-            logs_data = V1Logs.read_csv(content)
-            if to_structured:
-                return logs_data.logs
-            return logs_data.to_dict().get("logs", [])
-        if ".jsonl" in logs_path:
-            logs_data = V1Logs.read_jsonl(content, to_structured=to_structured)
-            if to_structured:
-                return logs_data.logs
-            return logs_data
-        # Chunked logs
-        data = orjson_loads(content)
+    # Version handling
+    if ".plx" in logs_path:
+        logs_data = V1Logs.read_csv(content)
         if to_structured:
-            return V1Logs.from_dict(data).logs
-        return data.get("logs", [])
+            return logs_data.logs
+        return logs_data.to_dict().get("logs", [])
+    if ".jsonl" in logs_path:
+        logs_data = V1Logs.read_jsonl(content, to_structured=to_structured)
+        if to_structured:
+            return logs_data.logs
+        return logs_data
+    # Chunked logs
+    data = orjson_loads(content)
+    if to_structured:
+        return V1Logs.from_dict(data).logs
+    return data.get("logs", [])
 
-    return await convert()
+
+async def content_to_logs(content, logs_path, to_structured: bool = False):
+    if not content:
+        return []
+
+    return await sync_to_async(parse_logs_content)(
+        content, logs_path, to_structured=to_structured
+    )
+
+
+async def download_logs_file(
+    fs: FSSystem, store_path: str, subpath: str, check_cache: bool = True
+) -> List[Dict]:
+    def read_logs(logs_path: str):
+        content = read_logs_file_content(logs_path)
+        return parse_logs_content(content, subpath)
+
+    async with open_file(
+        fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
+    ) as logs_path:
+        if not logs_path or not os.path.exists(logs_path):
+            return []
+        return await sync_to_async(read_logs, thread_sensitive=False)(logs_path)
 
 
 async def download_agent_logs_file(
@@ -70,12 +146,10 @@ async def download_agent_logs_file(
     check_cache: bool = True,
 ) -> (str, str):
     subpath = ".agents/{}/logs/{}/{}".format(agent_uuid, service, last_file)
-    content = await open_file(
+    return await download_logs_file(
         fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
     )
 
-    return await content_to_logs(content, subpath)
-
 
 async def download_run_logs_file(
     fs: FSSystem,
@@ -85,12 +159,10 @@ async def download_run_logs_file(
     check_cache: bool = True,
 ) -> (str, str):
     subpath = "{}/plxlogs/{}".format(run_uuid, last_file)
-    content = await open_file(
+    return await download_logs_file(
         fs=fs, store_path=store_path, subpath=subpath, check_cache=check_cache
     )
 
-    return await content_to_logs(content, subpath)
-
 
 async def download_logs(
     fs: FSSystem, subpath: str, store_path: str, run_uuid: str, check_cache: bool = True
@@ -103,4 +175,47 @@ async def download_logs(
             return path_to
         else:
             delete_path(path_to)
-    return await download_dir(fs=fs, store_path=store_path, subpath=subpath)
+    return await SINGLE_FLIGHT.do(
+        ("dir", store_path, subpath),
+        download_dir,
+        fs=fs,
+        store_path=store_path,
+        subpath=subpath,
+    )
+
+
+async def index_run_logs(fs: FSSystem, store_path: str, run_uuid: str) -> Dict:
+    """Catalogs the chunks that are missing from the run's logs index."""
+    logs_subpath = get_logs_path(run_path=run_uuid, full_path=False)
+    files = await list_files(fs=fs, store_path=store_path, subpath=logs_subpath)
+    index = await get_logs_index(fs=fs, store_path=store_path, run_uuid=run_uuid)
+    missing = sorted(f for f in files["files"].keys() if f not in index)
+    if not missing:
+        return index
+
+    def read_entry(chunk_path: str) -> Optional[Dict]:
+        content = read_logs_file_content(chunk_path)
+        logs = parse_logs_content(content, chunk_path, to_structured=True)
+        return get_logs_chunk_entry(logs, size=os.path.getsize(chunk_path))
+
+    async def get_entry(chunk: str) -> Optional[Dict]:
+        async with open_file(
+            fs=fs,
+            store_path=store_path,
+            subpath="{}/{}".format(logs_subpath, chunk),
+        ) as chunk_path:
+            if not chunk_path:
+                return None
+            return await sync_to_async(read_entry, thread_sensitive=False)(chunk_path)
+
+    results = await gather_bounded(get_entry(chunk) for chunk in missing)
+    entries = {}
+    for chunk, result in zip(missing, results):
+        if isinstance(result, BaseException):
+            logger.warning("Could not index the logs chunk %s: %s", chunk, result)
+            continue
+        entries[chunk] = result
+    entries = await update_logs_index(
+        fs=fs, store_path=store_path, run_uuid=run_uuid, entries=entries
+    )
+    return {**index, **entries}
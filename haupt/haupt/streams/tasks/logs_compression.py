@@ -0,0 +1,81 @@
+import gzip
+import io
+
+from typing import IO, Optional
+
+LOGS_COMPRESSION_GZIP = "gzip"
+LOGS_COMPRESSION_ZSTD = "zstd"
+LOGS_COMPRESSION_EXTENSIONS = {
+    LOGS_COMPRESSION_GZIP: ".gz",
+    LOGS_COMPRESSION_ZSTD: ".zst",
+}
+LOGS_COMPRESSION_MAGIC = {
+    LOGS_COMPRESSION_GZIP: b"\x1f\x8b",
+    LOGS_COMPRESSION_ZSTD: b"\x28\xb5\x2f\xfd",
+}
+
+
+def _get_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compressed logs require the `zstandard` package.")
+    return zstandard
+
+
+def get_logs_compression_extension(compression: Optional[str]) -> str:
+    if not compression:
+        return ""
+    if compression not in LOGS_COMPRESSION_EXTENSIONS:
+        raise ValueError(
+            "received an unrecognisable logs compression {}.".format(compression)
+        )
+    return LOGS_COMPRESSION_EXTENSIONS[compression]
+
+
+def strip_logs_compression_extension(name: str) -> str:
+    for extension in LOGS_COMPRESSION_EXTENSIONS.values():
+        if name.endswith(extension):
+            return name[: -len(extension)]
+    return name
+
+
+def get_logs_compression(logs_path: str) -> Optional[str]:
+    """Detects the compression of a logs file by its extension or its magic bytes."""
+    for compression, extension in LOGS_COMPRESSION_EXTENSIONS.items():
+        if logs_path.endswith(extension):
+            return compression
+    with open(logs_path, mode="rb") as f:
+        header = f.read(4)
+    for compression, magic in LOGS_COMPRESSION_MAGIC.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def compress_logs_data(data: str, compression: Optional[str]) -> bytes:
+    if compression == LOGS_COMPRESSION_GZIP:
+        return gzip.compress(data.encode(), compresslevel=6)
+    if compression == LOGS_COMPRESSION_ZSTD:
+        return _get_zstd().ZstdCompressor().compress(data.encode())
+    return data.encode()
+
+
+def open_logs_file(logs_path: str) -> IO[str]:
+    """Opens a logs file as text, decompressing it while it is read.
+
+    Only the decoded text is materialized by the readers,
+    the compressed file is streamed from disk.
+    """
+    compression = get_logs_compression(logs_path)
+    if compression == LOGS_COMPRESSION_GZIP:
+        return gzip.open(logs_path, mode="rt")
+    if compression == LOGS_COMPRESSION_ZSTD:
+        stream = _get_zstd().ZstdDecompressor().stream_reader(open(logs_path, "rb"))
+        return io.TextIOWrapper(stream)
+    return open(logs_path, mode="r")
+
+
+def read_logs_file_content(logs_path: str) -> str:
+    with open_logs_file(logs_path) as f:
+        return f.read()
@@ -0,0 +1,121 @@
+import logging
+import uuid
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from clipped.utils.json import orjson_dumps, orjson_loads
+
+import aiofiles
+
+from haupt.streams.controllers.concurrency import gather_bounded
+from haupt.streams.controllers.disk_cache import open_file
+from polyaxon._fs.async_manager import ensure_async_execution, upload_data
+from polyaxon._fs.types import FSSystem
+from polyaxon._fs.utils import get_store_path
+from polyaxon.schemas import V1ProjectFeature
+from traceml.events import get_logs_path
+from traceml.logging import V1Log
+
+logger = logging.getLogger("haupt.streams.logs")
+
+
+def get_logs_index_subpath(run_uuid: str) -> str:
+    return "{}.index".format(get_logs_path(run_path=run_uuid, full_path=False))
+
+
+def get_logs_chunk_entry(logs: List[V1Log], size: int) -> Optional[Dict]:
+    """Returns the catalog entry of a chunk: time range, number of lines and size."""
+    timestamps = [log.timestamp for log in logs if log.timestamp]
+    if not timestamps:
+        return None
+    return {
+        "start": datetime.timestamp(min(timestamps)),
+        "end": datetime.timestamp(max(timestamps)),
+        "lines": len(logs),
+        "size": size,
+    }
+
+
+async def get_logs_index_shards(
+    fs: FSSystem, store_path: str, run_uuid: str
+) -> List[str]:
+    path = get_store_path(
+        store_path=store_path,
+        subpath=get_logs_index_subpath(run_uuid),
+        entity=V1ProjectFeature.RUNTIME,
+    )
+    try:
+        paths = await ensure_async_execution(
+            fs=fs, fct="ls", is_async=fs.async_impl, path=path, detail=False
+        )
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        logger.warning("Could not list the logs index of run %s: %s", run_uuid, e)
+        return []
+    return sorted(p.rstrip("/").rsplit("/", 1)[-1] for p in paths)
+
+
+async def read_logs_index_shard(
+    fs: FSSystem, store_path: str, run_uuid: str, shard: str
+) -> Dict:
+    async with open_file(
+        fs=fs,
+        store_path=store_path,
+        subpath="{}/{}".format(get_logs_index_subpath(run_uuid), shard),
+    ) as shard_path:
+        if not shard_path:
+            return {}
+        async with aiofiles.open(shard_path, mode="rb") as f:
+            content = await f.read()
+    return orjson_loads(content).get("chunks", {})
+
+
+async def get_logs_index(fs: FSSystem, store_path: str, run_uuid: str) -> Dict:
+    """Returns the catalog of the run's logs chunks, mapping chunk names to entries.
+
+    The index is the merge of its shards, each update writes a new shard
+    and never modifies the existing ones, so they are read from the cache.
+    """
+    shards = await get_logs_index_shards(
+        fs=fs, store_path=store_path, run_uuid=run_uuid
+    )
+    results = await gather_bounded(
+        read_logs_index_shard(
+            fs=fs, store_path=store_path, run_uuid=run_uuid, shard=shard
+        )
+        for shard in shards
+    )
+    index = {}
+    for shard, result in zip(shards, results):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Could not read the logs index shard %s of run %s: %s",
+                shard,
+                run_uuid,
+                result,
+            )
+            continue
+        index.update(result)
+    return index
+
+
+async def update_logs_index(
+    fs: FSSystem, store_path: str, run_uuid: str, entries: Dict[str, Dict]
+) -> Dict[str, Dict]:
+    """Writes the chunks' entries to a new shard of the run's logs index.
+
+    Concurrent updates write different shards, so no entry is lost.
+    """
+    entries = {k: v for k, v in entries.items() if v}
+    if entries:
+        await upload_data(
+            fs=fs,
+            store_path=store_path,
+            subpath="{}/{}.json".format(
+                get_logs_index_subpath(run_uuid), uuid.uuid4().hex
+            ),
+            data=orjson_dumps({"chunks": entries}),
+        )
+    return entries
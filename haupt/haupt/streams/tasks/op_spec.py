@@ -2,7 +2,8 @@ from typing import Dict
 
 from clipped.utils.json import orjson_dumps
 
-from polyaxon._fs.async_manager import download_file, upload_data
+from haupt.streams.controllers.disk_cache import download_file
+from polyaxon._fs.async_manager import upload_data
 from polyaxon._fs.types import FSSystem
 
 
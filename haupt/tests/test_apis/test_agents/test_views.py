@@ -1,8 +1,9 @@
 import datetime
 import pytest
 
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
+from asgiref.sync import async_to_sync
 from rest_framework import status
 
 from django.test import override_settings
@@ -12,13 +13,26 @@ from haupt.apis.serializers.runs import RunDetailSerializer
 from haupt.background.celeryp.tasks import CronsCeleryTasks
 from haupt.db.factories.projects import ProjectFactory
 from haupt.db.factories.runs import RunFactory
+from haupt.db.managers.agent_versions import (
+    AGENT_STATE_VERSION_HEADER,
+    get_agent_state_version,
+    wait_agent_state_version,
+)
+from haupt.db.managers.statuses import new_run_status
 from haupt.db.models.runs import Run
 from polyaxon import _operations, settings
 from polyaxon._connections import V1BucketConnection, V1Connection, V1ConnectionKind
 from polyaxon._schemas.agent import AgentConfig
 from polyaxon._utils.fqn_utils import get_run_instance
 from polyaxon.api import API_V1
-from polyaxon.schemas import LiveState, ManagedBy, V1Environment, V1RunKind, V1Statuses
+from polyaxon.schemas import (
+    LiveState,
+    ManagedBy,
+    V1Environment,
+    V1RunKind,
+    V1StatusCondition,
+    V1Statuses,
+)
 from tests.base.case import BaseTest
 
 
@@ -331,6 +345,88 @@ class TestAgentStateViewV1(BaseTest):
     def test_agent_state(self):
         self._assert_agent_state()
 
+    @override_settings(SCHEDULER_AGENT_STATE_MAX_WAIT=5, SHARED_CACHE_ENABLED=True)
+    def test_agent_state_version(self):
+        project = ProjectFactory()
+        run = RunFactory(project=project, user=self.user, kind=V1RunKind.JOB)
+        resp = self.client.get(self.url)
+        assert resp.status_code == status.HTTP_200_OK
+        version = int(resp[AGENT_STATE_VERSION_HEADER])
+
+        # Transitions relevant to the agent bump the version on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            new_run_status(
+                run,
+                V1StatusCondition.get_condition(
+                    type=V1Statuses.COMPILED, status="True"
+                ),
+            )
+        assert get_agent_state_version() == version + 1
+        # Irrelevant transitions do not
+        with self.captureOnCommitCallbacks(execute=True):
+            new_run_status(
+                run,
+                V1StatusCondition.get_condition(type=V1Statuses.RUNNING, status="True"),
+            )
+        assert get_agent_state_version() == version + 1
+
+        # A stale version returns immediately
+        resp = self.client.get(self.url + "?version={}".format(version))
+        assert resp.status_code == status.HTTP_200_OK
+        assert int(resp[AGENT_STATE_VERSION_HEADER]) == version + 1
+
+        # The wait is bounded
+        with patch(
+            "haupt.apis.agents.views.wait_agent_state_version",
+            new_callable=AsyncMock,
+            return_value=version + 1,
+        ) as wait_version:
+            resp = self.client.get(self.url + "?version={}&wait=60".format(version + 1))
+        assert resp.status_code == status.HTTP_200_OK
+        assert wait_version.call_args[1] == {"version": version + 1, "timeout": 5}
+        assert (
+            async_to_sync(wait_agent_state_version)(version=version + 1, timeout=0.1)
+            == version + 1
+        )
+        assert (
+            async_to_sync(wait_agent_state_version)(version=version, timeout=5)
+            == version + 1
+        )
+
+        # A full state is returned without bumping the version of the other agents
+        with patch(
+            "haupt.apis.agents.views.get_agent_state", return_value={"full": True}
+        ):
+            resp = self.client.get(self.url + "?version={}".format(version))
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.data["state"]["full"] is True
+        assert int(resp[AGENT_STATE_VERSION_HEADER]) == version + 1
+        assert get_agent_state_version() == version + 1
+
+        resp = self.client.get(self.url + "?version=foo")
+        assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+    @override_settings(SHARED_CACHE_ENABLED=False)
+    def test_agent_state_version_requires_a_shared_cache(self):
+        run = RunFactory(project=ProjectFactory(), user=self.user, kind=V1RunKind.JOB)
+        version = get_agent_state_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            new_run_status(
+                run,
+                V1StatusCondition.get_condition(
+                    type=V1Statuses.COMPILED, status="True"
+                ),
+            )
+        assert get_agent_state_version() == version
+
+        # Agents do not wait for a version local to a worker
+        with patch(
+            "haupt.apis.agents.views.wait_agent_state_version", new_callable=AsyncMock
+        ) as wait_version:
+            resp = self.client.get(self.url + "?version={}".format(version))
+        assert resp.status_code == status.HTTP_200_OK
+        assert wait_version.call_count == 0
+
 
 @pytest.mark.agent_mark
 class TestAgentCronViewV1(BaseTest):
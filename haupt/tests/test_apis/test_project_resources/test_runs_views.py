@@ -1,6 +1,7 @@
 import pytest
 import uuid
 
+from datetime import timedelta
 from unittest.mock import patch
 
 from clipped.utils.json import orjson_dumps
@@ -8,6 +9,7 @@ from clipped.utils.serialization import datetime_deserialize
 from rest_framework import status
 
 from django.conf import settings
+from django.test import override_settings
 
 from haupt.apis.serializers.artifacts import (
     RunArtifactLightSerializer,
@@ -20,15 +22,21 @@ from haupt.apis.serializers.runs import (
     OfflineRunSerializer,
     OperationCreateSerializer,
 )
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
 from haupt.db.factories.artifacts import ArtifactFactory
 from haupt.db.factories.projects import ProjectFactory
 from haupt.db.factories.runs import RunFactory
+from haupt.db.factories.users import UserFactory
+from haupt.db.managers.bulk_actions import create_runs_bulk_job
 from haupt.db.managers.flows import get_run_graph
 from haupt.db.managers.live_state import archive_run, restore_run
+from haupt.db.managers.tags import denormalize_tags, normalize_tags
 from haupt.db.models.artifacts import Artifact, ArtifactLineage
 from haupt.db.models.bookmarks import Bookmark
 from haupt.db.models.runs import Run
+from haupt.db.models.runs_bulk_jobs import RunsBulkJob
 from haupt.db.queries.artifacts import project_runs_artifacts
+from haupt.orchestration.scheduler.manager import SchedulingManager
 from polyaxon.api import API_V1
 from polyaxon.schemas import (
     LiveState,
@@ -182,6 +190,41 @@ class TestProjectRunsTagViewV1(BaseTest):
             None,
         ]
 
+    def test_tag_keeps_the_existing_tags_order(self):
+        self.objects[2].tags = {"first": "", "second": ""}
+        self.objects[2].save(update_fields=["tags"])
+        data = {
+            "uuids": [self.objects[1].uuid.hex, self.objects[2].uuid.hex],
+            "tags": ["new", "tags", "new"],
+        }
+        resp = self.client.post(self.url, data)
+        assert resp.status_code == status.HTTP_200_OK
+        assert [
+            normalize_tags(i) for i in self.queryset.values_list("tags", flat=True)
+        ][1:3] == [
+            ["new", "tag21", "tag22", "tags"],
+            ["first", "second", "new", "tags"],
+        ]
+
+    def test_tag_with_query(self):
+        for obj in self.objects[:2]:
+            obj.tags = denormalize_tags(obj.tags)
+            obj.save(update_fields=["tags"])
+        data = {"query": "tags:new|tag11", "tags": ["tags"]}
+        resp = self.client.post(self.url, data)
+        assert resp.status_code == status.HTTP_200_OK
+        assert [
+            set(i) if i else i for i in self.queryset.values_list("tags", flat=True)
+        ] == [
+            {"tag11", "tags"},
+            {"new", "tag21", "tag22", "tags"},
+            None,
+            None,
+        ]
+
+        resp = self.client.post(self.url, {"query": "foo:bar", "tags": ["tags"]})
+        assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
 
 @pytest.mark.projects_resources_mark
 class TestProjectRunsStopViewV1(BaseTest):
@@ -240,6 +283,80 @@ class TestProjectRunsStopViewV1(BaseTest):
 
         assert auditor_record.call_count == 4
 
+    @override_settings(SCHEDULER_BULK_ACTIONS_BATCH_SIZE=1)
+    @patch("haupt.common.workers.send")
+    def test_stop_with_query(self, workers_send):
+        for obj in self.objects[:3]:
+            obj.status = V1Statuses.RUNNING
+            obj.save()
+        resp = self.client.post(self.url, {"query": "status:running"})
+        assert resp.status_code == status.HTTP_202_ACCEPTED
+        assert resp.data["action"] == "stop"
+        assert resp.data["status"] == "queued"
+        assert workers_send.call_count == 1
+        assert workers_send.call_args[0][0] == SchedulerCeleryTasks.RUNS_BULK_ACTION
+        task_kwargs = workers_send.call_args[1]["kwargs"]
+        assert task_kwargs["job_uuid"] == resp.data["uuid"]
+        assert task_kwargs["audit"]["project_name"] == self.project.name
+
+        with patch("haupt.common.auditor.record") as auditor_record:
+            SchedulingManager.runs_bulk_action(**task_kwargs)
+        assert list(Run.objects.order_by("id").values_list("status", flat=True)) == [
+            V1Statuses.STOPPING
+        ] * 3 + [V1Statuses.CREATED]
+        assert auditor_record.call_count == 6
+
+        job_url = "/{}/{}/{}/runs/bulk/{}/".format(
+            API_V1, self.user.username, self.project.name, resp.data["uuid"]
+        )
+        resp = self.client.get(job_url)
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.data["status"] == "succeeded"
+        assert resp.data["total"] == 3
+        assert resp.data["processed"] == 3
+
+        # The job is stored in the database, and expires after a day
+        job = RunsBulkJob.objects.get(uuid=resp.data["uuid"])
+        assert job.project_id == self.project.id
+        RunsBulkJob.objects.filter(id=job.id).update(
+            created_at=job.created_at - timedelta(days=2)
+        )
+        assert self.client.get(job_url).status_code == status.HTTP_404_NOT_FOUND
+
+        project = ProjectFactory()
+        resp = self.client.get(
+            "/{}/{}/{}/runs/bulk/{}/".format(
+                API_V1, self.user.username, project.name, resp.data["uuid"]
+            )
+        )
+        assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_stop_with_user_query(self):
+        other = self.objects[0]
+        other.user = UserFactory()
+        other.save(update_fields=["user"])
+        Run.objects.update(status=V1Statuses.RUNNING)
+        job = create_runs_bulk_job(project_id=self.project.id, action="stop")
+
+        # The job resolves the conditions depending on the request's user
+        with patch("haupt.common.auditor.record"):
+            SchedulingManager.runs_bulk_action(
+                job_uuid=job["uuid"],
+                action="stop",
+                project_id=self.project.id,
+                query="mine:true",
+                audit={},
+                user_id=self.user.id,
+            )
+        assert (
+            list(Run.objects.order_by("id").values_list("status", flat=True))
+            == [V1Statuses.RUNNING] + [V1Statuses.STOPPING] * 3
+        )
+
+    def test_stop_with_invalid_query(self):
+        resp = self.client.post(self.url, {"query": "foo:bar"})
+        assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
 
 @pytest.mark.projects_resources_mark
 class TestProjectRunsSkipViewV1(BaseTest):
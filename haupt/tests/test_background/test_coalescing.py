@@ -0,0 +1,98 @@
+import pytest
+
+from mock import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from haupt.background.celeryp import coalescing
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
+from haupt.common import workers
+from tests.test_background.case import BaseTest
+
+
+@pytest.mark.background_mark
+@override_settings(SCHEDULER_TASKS_COALESCING_WINDOW=60, SHARED_CACHE_ENABLED=True)
+class TestTasksCoalescing(BaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    @mock.patch("haupt.common.workers.app.send_task")
+    def test_send_coalesces_identical_tasks(self, send_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                workers.send(
+                    SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+                    kwargs={"run_id": 1},
+                )
+            workers.send(
+                SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE, kwargs={"run_id": 2}
+            )
+            # Other tasks are not coalesced
+            for _ in range(2):
+                workers.send(SchedulerCeleryTasks.RUNS_START, kwargs={"run_id": 1})
+
+        assert [c[0][0] for c in send_task.call_args_list] == [
+            SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+            SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+            SchedulerCeleryTasks.RUNS_START,
+            SchedulerCeleryTasks.RUNS_START,
+        ]
+        assert coalescing.get_stats() == {
+            SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE: 2
+        }
+
+        # Starting the task accepts new sends
+        task = workers.app.tasks[SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE]
+        task(run_id=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            workers.send(
+                SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE, kwargs={"run_id": 1}
+            )
+        assert send_task.call_count == 5
+
+    @override_settings(SCHEDULER_TASKS_COALESCING_WINDOW=0)
+    @mock.patch("haupt.common.workers.app.send_task")
+    def test_send_without_window(self, send_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                workers.send(
+                    SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+                    kwargs={"run_id": 1},
+                )
+        assert send_task.call_count == 2
+        assert coalescing.get_stats() == {}
+
+    @override_settings(SHARED_CACHE_ENABLED=False)
+    @mock.patch("haupt.common.workers.app.send_task")
+    def test_send_without_shared_cache(self, send_task):
+        # Workers can't release claims made in the sender's local cache
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                workers.send(
+                    SchedulerCeleryTasks.RUNS_CHECK_ORPHAN_PIPELINE,
+                    kwargs={"run_id": 1},
+                )
+        assert send_task.call_count == 2
+        assert coalescing.get_stats() == {}
+
+    @mock.patch.object(coalescing.stats_logger, "interval", 0)
+    def test_coalesced_sends_log_the_stats(self):
+        assert coalescing.claim(SchedulerCeleryTasks.RUNS_PREPARE, {"run_id": 1})
+        with self.assertLogs("haupt.tasks", level="INFO") as logs:
+            assert not coalescing.claim(
+                SchedulerCeleryTasks.RUNS_PREPARE, {"run_id": 1}
+            )
+        assert logs.output == [
+            "INFO:haupt.tasks:Tasks coalescing stats: {}".format(
+                {SchedulerCeleryTasks.RUNS_PREPARE: 1}
+            )
+        ]
+
+    @mock.patch("haupt.common.workers.app.send_task", side_effect=ValueError)
+    def test_failed_send_releases_the_claim(self, send_task):
+        with pytest.raises(ValueError):
+            with self.captureOnCommitCallbacks(execute=True):
+                workers.send(SchedulerCeleryTasks.RUNS_PREPARE, kwargs={"run_id": 1})
+        assert coalescing.claim(SchedulerCeleryTasks.RUNS_PREPARE, {"run_id": 1})
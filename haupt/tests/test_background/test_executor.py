@@ -0,0 +1,123 @@
+import pytest
+import threading
+
+from mock import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
+from haupt.background.executor import InProcessExecutor, get_executor
+from haupt.common import workers
+from haupt.common.settings.core import set_core
+from haupt.schemas.platform_config import PlatformConfig
+
+
+@pytest.mark.background_mark
+class TestInProcessExecutor(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = InProcessExecutor(max_workers=4)
+        self.executed = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+        super().tearDown()
+
+    def _execute(self, task_name, kwargs):
+        self.started.set()
+        self.release.wait(5)
+        self.executed.append((task_name, kwargs))
+
+    def test_submit_orders_and_deduplicates_run_tasks(self):
+        with mock.patch.object(InProcessExecutor, "execute", side_effect=self._execute):
+            assert self.executor.submit(
+                SchedulerCeleryTasks.RUNS_PREPARE, kwargs={"run_id": 1}
+            )
+            # The first task is running, the next ones are queued behind it
+            assert self.started.wait(5)
+            assert self.executor.submit(
+                SchedulerCeleryTasks.RUNS_START, kwargs={"run_id": 1}
+            )
+            assert self.executor.submit(
+                SchedulerCeleryTasks.RUNS_NOTIFY_DONE, kwargs={"run_id": 1}
+            )
+            assert not self.executor.submit(
+                SchedulerCeleryTasks.RUNS_START, kwargs={"run_id": 1}
+            )
+            assert self.executor.get_stats()["runs"] == 1
+            self.release.set()
+            self.executor.shutdown()
+
+        assert self.executed == [
+            (SchedulerCeleryTasks.RUNS_PREPARE, {"run_id": 1}),
+            (SchedulerCeleryTasks.RUNS_START, {"run_id": 1}),
+            (SchedulerCeleryTasks.RUNS_NOTIFY_DONE, {"run_id": 1}),
+        ]
+        stats = self.executor.get_stats()
+        assert stats["submitted"] == 3
+        assert stats["deduplicated"] == 1
+        assert stats["pending"] == 0
+        assert stats["runs"] == 0
+
+    def test_failed_task_does_not_block_the_run(self):
+        with mock.patch.object(
+            InProcessExecutor, "execute", side_effect=[ValueError, None]
+        ) as execute:
+            self.executor.submit(SchedulerCeleryTasks.RUNS_PREPARE, {"run_id": 1})
+            self.executor.submit(SchedulerCeleryTasks.RUNS_START, {"run_id": 1})
+            with self.assertLogs("haupt.background.executor", level="INFO") as logs:
+                self.executor.shutdown()
+
+        assert execute.call_count == 2
+        assert self.executor.get_stats()["failed"] == 1
+        # The stats are logged when the executor is shut down
+        assert "'failed': 1" in logs.output[-1]
+
+    @mock.patch("haupt.background.executor._EXECUTOR", None)
+    @mock.patch("haupt.background.executor.atexit.register")
+    def test_get_executor_shuts_down_at_exit(self, register):
+        executor = get_executor(max_workers=2)
+        assert get_executor(max_workers=4) is executor
+        assert executor.max_workers == 2
+        assert register.call_args_list == [mock.call(executor.shutdown)]
+
+    def test_sqlite_runs_one_executor_worker(self):
+        for db_engine, expected in [("sqlite", 1), ("pgsql", 4)]:
+            config = PlatformConfig.from_dict(
+                {
+                    "POLYAXON_DB_ENGINE": db_engine,
+                    "POLYAXON_SCHEDULER_EXECUTOR_WORKERS": 4,
+                }
+            )
+            context = {}
+            set_core(context, config)
+            assert context["SCHEDULER_EXECUTOR_WORKERS"] == expected
+
+
+@pytest.mark.background_mark
+class TestWorkersSend(TestCase):
+    @override_settings(SCHEDULER_EXECUTOR_WORKERS=2)
+    @mock.patch("haupt.background.celeryp.executions.TasksExecutions.run")
+    @mock.patch("haupt.background.executor.InProcessExecutor.submit")
+    @mock.patch("haupt.common.workers.conf.get", return_value=False)
+    def test_send_uses_executor(self, _, submit, run):
+        # The task is submitted once the transaction is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            workers.send(
+                SchedulerCeleryTasks.RUNS_START,
+                kwargs={"run_id": 1},
+                eager_kwargs={"run": None},
+            )
+            assert submit.call_count == 0
+        assert submit.call_args_list == [
+            mock.call(SchedulerCeleryTasks.RUNS_START, kwargs={"run_id": 1})
+        ]
+        assert run.call_count == 0
+
+        # Forcing a synchronous execution does not use the executor
+        workers.send(SchedulerCeleryTasks.RUNS_START, delay=False, kwargs={"run_id": 1})
+        assert submit.call_count == 1
+        assert run.call_count == 1
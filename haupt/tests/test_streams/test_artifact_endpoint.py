@@ -2,6 +2,8 @@ import os
 import pytest
 import shutil
 
+from mock import patch
+
 from clipped.utils.paths import create_path
 
 from polyaxon import settings
@@ -240,3 +242,79 @@ class TestArtifactEndpoints(BaseTest):
         # Deleting same file
         response = self.client.delete(self.base_url + "?path=foo/file1.txt")
         assert response.status_code == 400
+
+    @staticmethod
+    def get_content(response):
+        return b"".join(response.streaming_content)
+
+    def test_stream_artifact_conditional_and_range_requests(self):
+        with open(os.path.join(self.run_path, "file1.txt"), "wb") as f:
+            f.write(b"0123456789")
+        url = self.base_url + "?stream=true&path=file1.txt"
+        response = self.client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert self.get_content(response) == b"0123456789"
+        etag = response.headers["etag"]
+        last_modified = response.headers["last-modified"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        assert response.status_code == 200
+
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5")
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == "bytes 2-5/10"
+        assert response.headers["Content-Length"] == "4"
+        assert self.get_content(response) == b"2345"
+
+        response = self.client.get(url, HTTP_RANGE="bytes=-3")
+        assert response.status_code == 206
+        assert self.get_content(response) == b"789"
+
+        response = self.client.get(url, HTTP_RANGE="bytes=0-1,8-")
+        assert response.status_code == 206
+        content_type = response.headers["Content-Type"]
+        assert content_type.startswith("multipart/byteranges; boundary=")
+        boundary = content_type.split("boundary=")[1]
+        content = self.get_content(response)
+        assert int(response.headers["Content-Length"]) == len(content)
+        assert (
+            content
+            == (
+                "--{b}\r\nContent-Type: text/plain\r\nContent-Range: bytes 0-1/10\r\n\r\n"
+                "01\r\n"
+                "--{b}\r\nContent-Type: text/plain\r\nContent-Range: bytes 8-9/10\r\n\r\n"
+                "89\r\n"
+                "--{b}--\r\n".format(b=boundary)
+            ).encode()
+        )
+
+        response = self.client.get(url, HTTP_RANGE="bytes=20-30")
+        assert response.status_code == 416
+        assert response.headers["Content-Range"] == "bytes */10"
+
+        # Outdated If-Range returns the full file
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"')
+        assert response.status_code == 200
+        assert self.get_content(response) == b"0123456789"
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE=etag)
+        assert response.status_code == 206
+
+    def test_download_artifact_in_sandbox_honours_ranges(self):
+        with open(os.path.join(self.run_path, "file1.txt"), "wb") as f:
+            f.write(b"0123456789")
+        url = self.base_url + "?path=file1.txt"
+        with patch(
+            "haupt.streams.endpoints.utils.PolyaxonServices.is_sandbox",
+            return_value=True,
+        ):
+            response = self.client.get(url, HTTP_RANGE="bytes=5-")
+            assert response.status_code == 206
+            assert self.get_content(response) == b"56789"
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers["etag"])
+            assert response.status_code == 304
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from haupt.streams.controllers.coalescing import SingleFlight
+
+pytestmark = pytest.mark.streams_mark
+
+
+def test_single_flight_shares_concurrent_calls_with_the_same_key():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def run():
+        return await asyncio.gather(
+            *[single_flight.do(("store", "a"), fetch, "a") for _ in range(5)],
+            single_flight.do(("store", "b"), fetch, "b"),
+        )
+
+    assert asyncio.run(run()) == ["a"] * 5 + ["b"]
+    assert calls == ["a", "b"]
+    assert single_flight.get_stats() == {"inflight": 0, "calls": 2, "coalesced": 4}
+
+    # Finished calls are not reused
+    assert asyncio.run(single_flight.do(("store", "a"), fetch, "a")) == "a"
+    assert calls == ["a", "b", "a"]
+
+
+def test_single_flight_survives_cancelled_callers_and_shares_errors():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def run():
+        first = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        errors = await asyncio.gather(
+            single_flight.do("error", fail),
+            single_flight.do("error", fail),
+            return_exceptions=True,
+        )
+        return await second, errors
+
+    result, errors = asyncio.run(run())
+    assert result == "done"
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert len(single_flight) == 0
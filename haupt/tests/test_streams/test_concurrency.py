@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from django.test import override_settings
+
+from haupt.streams.controllers.concurrency import gather_bounded
+
+pytestmark = pytest.mark.streams_mark
+
+
+def test_gather_bounded_keeps_order_and_returns_errors():
+    async def job(i):
+        await asyncio.sleep(0.01 * (5 - i))
+        if i == 2:
+            raise ValueError("failed {}".format(i))
+        return i
+
+    results = asyncio.run(gather_bounded(job(i) for i in range(5)))
+
+    assert results[:2] == [0, 1]
+    assert isinstance(results[2], ValueError)
+    assert results[3:] == [3, 4]
+
+
+@override_settings(STREAMS_MAX_CONCURRENCY=3, STREAMS_REQUEST_CONCURRENCY=16)
+def test_gather_bounded_respects_request_and_global_limits():
+    state = {"current": 0, "max": 0}
+
+    async def job():
+        state["current"] += 1
+        state["max"] = max(state["max"], state["current"])
+        await asyncio.sleep(0.01)
+        state["current"] -= 1
+
+    asyncio.run(gather_bounded([job() for _ in range(10)], limit=2))
+    assert state["max"] == 2
+
+    state["max"] = 0
+    asyncio.run(gather_bounded([job() for _ in range(10)]))
+    assert state["max"] == 3
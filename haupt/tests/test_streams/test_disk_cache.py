@@ -0,0 +1,142 @@
+import asyncio
+import os
+import pytest
+
+from mock import patch
+
+from rest_framework import status
+
+from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers import disk_cache
+from haupt.streams.controllers.disk_cache import DiskCache
+from polyaxon._utils.test_utils import set_store
+from polyaxon.api import INTERNAL_V1
+from tests.base.case import BaseTest
+
+
+@pytest.mark.streams_mark
+class TestDiskCache(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        os.makedirs(os.path.join(self.store_root, "uuid"))
+        for i in range(3):
+            with open(
+                os.path.join(self.store_root, "uuid", "file{}".format(i)), "w"
+            ) as f:
+                f.write("0123456789")
+
+    def download(self, cache, subpath, check_cache=True):
+        async def download():
+            return await cache.download_file(
+                fs=await AppFS.get_fs(),
+                store_path=self.store_root,
+                subpath=subpath,
+                check_cache=check_cache,
+            )
+
+        return asyncio.run(download())
+
+    @patch("haupt.streams.controllers.disk_cache.DISK_CACHE_LEASE", 0)
+    def test_download_file_evicts_least_recently_used_files(self):
+        cache = DiskCache(max_size=20)
+        path0 = self.download(cache, "uuid/file0")
+        path1 = self.download(cache, "uuid/file1")
+        assert os.path.exists(path0) and os.path.exists(path1)
+        assert self.download(cache, "uuid/file0") == path0
+
+        path2 = self.download(cache, "uuid/file2")
+        assert os.path.exists(path0)
+        assert not os.path.exists(path1)
+        assert os.path.exists(path2)
+        assert not [f for f in os.listdir(os.path.dirname(path0)) if "tmp" in f]
+        assert cache.get_stats() == {
+            "entries": 2,
+            "size": 20,
+            "max_size": 20,
+            "hits": 1,
+            "misses": 3,
+            "evictions": 1,
+            "pinned": 0,
+            "coalesced": 0,
+            "inflight": 0,
+        }
+
+        # Files removed from the store are removed from the cache on forced downloads
+        os.remove(os.path.join(self.store_root, "uuid", "file0"))
+        assert self.download(cache, "uuid/file0", check_cache=False) is None
+        assert not os.path.exists(path0)
+        assert cache.get_stats()["entries"] == 1
+
+    def test_pinned_and_leased_files_are_not_evicted(self):
+        cache = DiskCache(max_size=10)
+
+        async def read_pinned():
+            fs = await AppFS.get_fs()
+            async with cache.open_file(
+                fs=fs, store_path=self.store_root, subpath="uuid/file0"
+            ) as path:
+                await cache.download_file(
+                    fs=fs, store_path=self.store_root, subpath="uuid/file1"
+                )
+                assert cache.get_stats()["pinned"] == 1
+                with open(path) as f:
+                    return f.read()
+
+        with patch("haupt.streams.controllers.disk_cache.DISK_CACHE_LEASE", 0):
+            assert asyncio.run(read_pinned()) == "0123456789"
+            assert cache.evictions == 0
+            assert cache.get_stats()["pinned"] == 0
+
+            # The budget is enforced once the file is released
+            self.download(cache, "uuid/file2")
+            assert cache.evictions == 2
+            assert cache.get_stats()["entries"] == 1
+
+        # Returned paths are leased to the caller
+        path2 = self.download(cache, "uuid/file2")
+        self.download(cache, "uuid/file0")
+        assert os.path.exists(path2)
+        assert cache.evictions == 2
+
+    def test_concurrent_downloads_share_a_single_fetch(self):
+        cache = DiskCache(max_size=0)
+        ensure_async_execution = disk_cache.ensure_async_execution
+
+        async def slow_execution(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return await ensure_async_execution(*args, **kwargs)
+
+        async def download():
+            fs = await AppFS.get_fs()
+            return await asyncio.gather(
+                *[
+                    cache.download_file(
+                        fs=fs, store_path=self.store_root, subpath="uuid/file0"
+                    )
+                    for _ in range(5)
+                ]
+            )
+
+        with patch(
+            "haupt.streams.controllers.disk_cache.ensure_async_execution",
+            side_effect=slow_execution,
+        ) as mock_execution:
+            results = asyncio.run(download())
+        assert mock_execution.call_count == 1
+        assert len(set(results)) == 1
+        with open(results[0]) as f:
+            assert f.read() == "0123456789"
+        assert cache.misses == 1
+        assert cache.get_stats()["coalesced"] == 4
+
+    def test_get_cache_stats_requires_internal_auth(self):
+        url = "/{}/streams/cache/stats".format(INTERNAL_V1)
+        response = self.client.get(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        with patch("haupt.streams.endpoints.cache.validate_internal_auth"):
+            response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.json().keys()) == {"disk", "events", "inflight"}
+        assert response.json()["disk"]["evictions"] == 0
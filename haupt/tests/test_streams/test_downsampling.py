@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from haupt.streams.controllers.downsampling import (
+    DOWNSAMPLE_LTTB,
+    DOWNSAMPLE_MINMAX,
+    DownsampleSpec,
+    downsample_df,
+    filter_window,
+    lttb_indices,
+    minmax_indices,
+)
+
+pytestmark = pytest.mark.events_mark
+
+
+def get_series(n=1000, spike_at=517):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 50.0)
+    y[spike_at] = 100.0
+    return x, y
+
+
+def test_downsample_spec_from_query():
+    assert DownsampleSpec.from_query({}) is None
+    assert DownsampleSpec.from_query({"downsample": "lttb", "min_step": "10"}) == (
+        DownsampleSpec(mode="lttb", min_step=10)
+    )
+    with pytest.raises(ValueError):
+        DownsampleSpec.from_query({"downsample": "foo"})
+    with pytest.raises(ValueError):
+        DownsampleSpec.from_query({"start": "not-a-date"})
+
+
+def test_lttb_keeps_edges_and_spikes():
+    x, y = get_series()
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert 517 in indices
+    assert np.all(np.diff(indices) > 0)
+    assert np.array_equal(lttb_indices(x, y, 2000), np.arange(1000))
+
+
+def test_minmax_keeps_extremes_and_last_points():
+    x, y = get_series()
+    indices = minmax_indices(x, y, 90)
+    assert len(indices) <= 90
+    assert 517 in indices
+    assert 999 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_downsample_df_and_window():
+    x, y = get_series()
+    df = pd.DataFrame({"step": x.astype(int), "metric": y})
+    for mode in [DOWNSAMPLE_LTTB, DOWNSAMPLE_MINMAX]:
+        result = downsample_df(df, column="metric", threshold=60, mode=mode)
+        assert result.shape[0] <= 60
+        assert result["metric"].max() == 100.0
+
+    window = filter_window(df, DownsampleSpec(min_step=100, max_step=199))
+    assert window.shape[0] == 100
+    assert window["step"].min() == 100
+    assert window["step"].max() == 199
@@ -0,0 +1,338 @@
+import asyncio
+import os
+import pandas as pd
+import pytest
+import tempfile
+
+from fsspec.implementations.local import LocalFileSystem
+from mock import patch
+
+from clipped.utils.enums import get_enum_value
+
+from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers import compaction
+from haupt.streams.controllers import events as events_controllers
+from haupt.streams.controllers.compaction import (
+    ExpiringKeys,
+    compact_run_events,
+    read_compacted_events,
+    schedule_compact_run_events,
+    write_compacted_events,
+)
+from haupt.streams.controllers.downsampling import DownsampleSpec
+from haupt.streams.controllers.events import (
+    EventsCache,
+    decode_events_cursor,
+    encode_events_cursor,
+    get_archived_operation_events,
+    process_operation_event,
+    process_operation_event_tail,
+    read_operation_event,
+)
+from polyaxon._utils.test_utils import set_store
+from tests.base.case import BaseTest
+from traceml.artifacts import V1ArtifactKind
+from traceml.events import LoggedEventListSpec, V1Event, V1Events
+
+pytestmark = pytest.mark.events_mark
+
+
+def write_metric_events(path, values, start=0):
+    events = LoggedEventListSpec(
+        name="metric",
+        kind=V1ArtifactKind.METRIC,
+        events=[
+            V1Event.make(step=start + i, metric=value) for i, value in enumerate(values)
+        ],
+    )
+    with open(path, "w") as f:
+        f.write(events.get_csv_header())
+        f.write(events.get_csv_events())
+
+
+@pytest.fixture
+def event_path():
+    path = os.path.join(tempfile.mkdtemp(), "metric.plx")
+    write_metric_events(path, [1.1, 1.2, 1.3, 1.4])
+    return path
+
+
+@pytest.fixture
+def events_cache(monkeypatch):
+    cache = EventsCache(max_size=10 * 1024 * 1024)
+    monkeypatch.setattr(events_controllers, "EVENTS_CACHE", cache)
+    return cache
+
+
+def test_events_cache_lru_eviction():
+    df = pd.DataFrame({"step": range(10), "metric": [0.1] * 10})
+    value = V1Events(kind=V1ArtifactKind.METRIC, name="metric", df=df)
+    value_size = EventsCache.get_value_size(value)
+    cache = EventsCache(max_size=2 * value_size)
+
+    cache.set("a", (1, 1, 1), value)
+    cache.set("b", (1, 1, 1), value)
+    assert cache.get("a", (1, 1, 1)) is value
+    cache.set("c", (1, 1, 1), value)
+
+    assert cache.get("b", (1, 1, 1)) is None
+    assert cache.get("a", (1, 1, 1)) is value
+    assert cache.get("c", (1, 1, 1)) is value
+    assert cache.get("c", (1, 1, 2)) is None
+    assert cache.get_stats() == {
+        "entries": 2,
+        "size": 2 * value_size,
+        "max_size": 2 * value_size,
+        "hits": 3,
+        "misses": 2,
+        "evictions": 1,
+    }
+
+
+def test_read_operation_event_uses_cache_until_file_changes(event_path, events_cache):
+    event_kind = get_enum_value(V1ArtifactKind.METRIC)
+    first = asyncio.run(read_operation_event(event_path, event_kind, "metric"))
+    second = asyncio.run(read_operation_event(event_path, event_kind, "metric"))
+    assert events_cache.misses == 1
+    assert events_cache.hits == 1
+    assert second.df is first.df
+
+    write_metric_events(event_path, [2.1, 2.2])
+    os.utime(event_path, ns=(0, 0))
+    third = asyncio.run(read_operation_event(event_path, event_kind, "metric"))
+    assert events_cache.misses == 2
+    assert third.df.shape[0] == 2
+
+
+def test_process_operation_event_sample_does_not_modify_cache(event_path, events_cache):
+    event_kind = get_enum_value(V1ArtifactKind.METRIC)
+    sampled = asyncio.run(
+        process_operation_event(
+            event_path=event_path,
+            event_kind=event_kind,
+            event_name="metric",
+            orient=V1Events.ORIENT_DICT,
+            sample=2,
+        )
+    )
+    assert len(sampled["data"]["metric"]) == 2
+    full = asyncio.run(
+        process_operation_event(
+            event_path=event_path,
+            event_kind=event_kind,
+            event_name="metric",
+            orient=V1Events.ORIENT_DICT,
+        )
+    )
+    assert len(full["data"]["metric"]) == 4
+    assert events_cache.hits == 1
+
+
+def test_events_cursor_round_trip():
+    cursor = encode_events_cursor({"metric": 10, "loss": 0})
+    assert decode_events_cursor(cursor) == {"metric": 10, "loss": 0}
+    assert decode_events_cursor(None) == {}
+    assert decode_events_cursor("not-a-cursor") == {}
+
+
+def test_process_operation_event_tail_reads_appended_rows(event_path):
+    event_kind = get_enum_value(V1ArtifactKind.METRIC)
+    fs = LocalFileSystem()
+
+    def read_tail(offset=0):
+        return asyncio.run(
+            process_operation_event_tail(
+                fs=fs,
+                event_path=event_path,
+                event_kind=event_kind,
+                event_name="metric",
+                offset=offset,
+                orient=V1Events.ORIENT_DICT,
+            )
+        )
+
+    # The last row is not followed by a line break but it can be parsed
+    event, offset = read_tail()
+    assert event["data"]["step"] == [0, 1, 2, 3]
+    assert offset == os.path.getsize(event_path)
+
+    event, next_offset = read_tail(offset)
+    assert event is None
+    assert next_offset == offset
+
+    # A half written row is not returned
+    appended = LoggedEventListSpec(
+        name="metric",
+        kind=V1ArtifactKind.METRIC,
+        events=[V1Event.make(step=4, metric=1.5), V1Event.make(step=5, metric=1.6)],
+    )
+    rows = appended.get_csv_events()
+    with open(event_path, "a") as f:
+        f.write(rows[:5])
+    event, next_offset = read_tail(offset)
+    assert event is None
+    assert next_offset == offset
+
+    with open(event_path, "a") as f:
+        f.write(rows[5:])
+    event, next_offset = read_tail(next_offset)
+    assert event["data"]["step"] == [4, 5]
+    assert event["data"]["metric"] == [1.5, 1.6]
+    assert next_offset == os.path.getsize(event_path)
+
+    # Missing files are skipped
+    event, offset = asyncio.run(
+        process_operation_event_tail(
+            fs=fs,
+            event_path=event_path + ".missing",
+            event_kind=event_kind,
+            event_name="metric",
+            offset=10,
+        )
+    )
+    assert event is None
+    assert offset == 10
+
+
+@pytest.mark.events_mark
+class TestEventsCompaction(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        self.sizes = ExpiringKeys(ttl=60, max_size=10)
+        patcher = patch.object(compaction, "_events_files_sizes", self.sizes)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        events_path = os.path.join(self.store_root, "uuid", "events", "metric")
+        os.makedirs(events_path)
+        write_metric_events(os.path.join(events_path, "metric1.plx"), [1.1, 1.2, 1.3])
+        write_metric_events(os.path.join(events_path, "metric2.plx"), [2.1, 2.2])
+        self.event_kind = get_enum_value(V1ArtifactKind.METRIC)
+
+    def get_events(self, downsample=None, check_cache=True):
+        async def get_events():
+            return await get_archived_operation_events(
+                fs=await AppFS.get_fs(),
+                store_path=self.store_root,
+                run_uuid="uuid",
+                event_kind=self.event_kind,
+                event_names=["metric1", "metric2"],
+                orient=V1Events.ORIENT_DICT,
+                check_cache=check_cache,
+                downsample=downsample,
+            )
+
+        return asyncio.run(get_events())
+
+    def test_compacted_events_are_used_when_available(self):
+        expected = self.get_events(check_cache=False)
+
+        async def compact():
+            return await compact_run_events(
+                fs=await AppFS.get_fs(), store_path=self.store_root, run_uuid="uuid"
+            )
+
+        index = asyncio.run(compact())
+        assert index["metric1"]["rows"] == 3
+        assert index["metric2"]["max_step"] == 1
+        assert os.path.exists(
+            os.path.join(self.store_root, "uuid", "events", "metric.arrow")
+        )
+        with patch(
+            "haupt.streams.controllers.events.get_archived_operation_event"
+        ) as mock_get_event:
+            with patch(
+                "haupt.streams.controllers.compaction.list_files"
+            ) as mock_list_files:
+                assert self.get_events() == expected
+        assert mock_get_event.call_count == 0
+        # The sizes of the source files are cached by the compaction
+        assert mock_list_files.call_count == 0
+
+        with patch(
+            "haupt.streams.controllers.events.get_archived_operation_event"
+        ) as mock_get_event:
+            results = self.get_events(downsample=DownsampleSpec(min_step=1))
+        assert mock_get_event.call_count == 0
+        assert results[0]["data"]["step"] == [1, 2]
+        assert results[1]["data"]["step"] == [1]
+
+    def test_compacted_events_are_skipped_when_sources_change(self):
+        async def compact():
+            return await compact_run_events(
+                fs=await AppFS.get_fs(), store_path=self.store_root, run_uuid="uuid"
+            )
+
+        asyncio.run(compact())
+        # The run is resumed and logs new metrics
+        write_metric_events(
+            os.path.join(self.store_root, "uuid", "events", "metric", "metric1.plx"),
+            [1.1, 1.2, 1.3, 1.4],
+        )
+        expected = self.get_events(check_cache=False)
+        assert expected[0]["data"]["step"] == [0, 1, 2, 3]
+        # The compacted file is used until the cached sizes expire
+        assert self.get_events()[0]["data"]["step"] == [0, 1, 2]
+        self.sizes.ttl = 0
+        with patch(
+            "haupt.streams.controllers.events.get_archived_operation_event",
+            wraps=events_controllers.get_archived_operation_event,
+        ) as mock_get_event:
+            assert self.get_events() == expected
+        assert [c[1]["event_name"] for c in mock_get_event.call_args_list] == [
+            "metric1"
+        ]
+
+
+def test_write_compacted_events_keeps_the_raw_timestamps(tmp_path):
+    raw_path = str(tmp_path / "metric.plx")
+    with open(raw_path, "w") as f:
+        f.write("step|timestamp|metric\n0|2024-01-01 00:00:00|0.1\n1||0.2")
+    event = V1Events.read(
+        kind="metric", name="metric", data=raw_path, parse_dates=False, engine="pyarrow"
+    )
+    path = str(tmp_path / "metric.arrow")
+    index = write_compacted_events(path, "metric", [event], sizes={"metric": 10})
+    assert index["metric"]["size"] == 10
+
+    # Missing timestamps are returned the same way before and after the compaction
+    result = read_compacted_events(path, "metric", ["metric"])
+    assert result["metric"].df.to_dict() == event.df.to_dict()
+    assert read_compacted_events(path, "metric", ["metric"], sizes={"metric": 11}) == {}
+
+
+def test_expiring_keys():
+    keys = ExpiringKeys(ttl=60, max_size=2)
+    keys.add("a")
+    keys.add("b")
+    keys.add("c")
+    assert "a" not in keys
+    assert "b" in keys and "c" in keys
+    assert len(keys) == 2
+    keys.discard("b")
+    assert "b" not in keys
+    keys.add("d", {"metric": 10})
+    assert keys.get("d") == {"metric": 10}
+    assert keys.get("b") is None
+
+    keys = ExpiringKeys(ttl=0, max_size=2)
+    keys.add("a")
+    assert "a" not in keys
+    assert len(keys) == 0
+
+
+def test_schedule_compact_run_events_runs_once_per_run():
+    async def schedule():
+        with patch(
+            "haupt.streams.controllers.compaction.compact_run_events",
+            side_effect=ValueError,
+        ) as compact:
+            task = schedule_compact_run_events(fs=None, store_path="/s", run_uuid="u")
+            assert (
+                schedule_compact_run_events(fs=None, store_path="/s", run_uuid="u")
+                is None
+            )
+            await task
+        return compact.call_count
+
+    assert asyncio.run(schedule()) == 1
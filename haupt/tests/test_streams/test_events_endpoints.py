@@ -1,9 +1,11 @@
+import asyncio
 import os
 import pandas as pd
 import pytest
 import shutil
 
 from clipped.utils.enums import get_enum_value
+from clipped.utils.json import orjson_loads
 from clipped.utils.paths import create_path
 
 from polyaxon import settings
@@ -290,6 +292,23 @@ class TestEventsEndpoints(BaseTest):
             assert res.kind == exp.kind
             assert pd.DataFrame.equals(res.df, exp.df)
 
+    def test_download_text_events_with_cursor(self):
+        response = self.client.get(
+            self.base_url + "/text?names=text1,text2&orient=dict&cursor="
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert {res["name"] for res in data["data"]} == {"text1", "text2"}
+        assert data["cursor"]
+
+        response = self.client.get(
+            self.base_url
+            + "/text?names=text1,text2&orient=dict&cursor={}".format(data["cursor"])
+        )
+        assert response.status_code == 200
+        assert response.json()["data"] == []
+        assert response.json()["cursor"] == data["cursor"]
+
     def test_download_html_events_as_dict(self):
         filepath1 = os.path.join(
             settings.CLIENT_CONFIG.archives_root, "uuid", "events", "html", "html1.plx"
@@ -756,3 +775,27 @@ class TestMultiRunsEventsEndpoints(BaseTest):
                 assert res.name == exp.name
                 assert res.kind == exp.kind
                 assert pd.DataFrame.equals(res.df, exp.df)
+
+    def test_stream_multi_metric_events_as_ndjson(self):
+        response = self.client.get(
+            self.base_url
+            + "/metric?names=metric1,metric2&runs=uuid1,uuid2&orient=dict&stream=true"
+        )
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+
+        async def read_content():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        lines = [
+            orjson_loads(line) for line in asyncio.run(read_content()).splitlines()
+        ]
+        assert {line["run"] for line in lines} == {"uuid1", "uuid2"}
+        expected = self.client.get(
+            self.base_url + "/metric?names=metric1,metric2&runs=uuid1,uuid2&orient=dict"
+        ).json()["data"]
+        for line in lines:
+            assert "errors" not in line
+            assert sorted(line["data"], key=lambda e: e["name"]) == sorted(
+                expected[line["run"]], key=lambda e: e["name"]
+            )
@@ -0,0 +1,361 @@
+import asyncio
+import datetime
+import os
+import pytest
+
+from mock import patch
+
+from django.test import override_settings
+
+from haupt.streams.connections.fs import AppFS
+from haupt.streams.controllers.disk_cache import download_file, open_file
+from haupt.streams.controllers.logs import (
+    LogsMatcher,
+    get_archived_operation_logs_window,
+    get_archived_pods_operation_logs,
+    get_tmp_operation_logs,
+    search_archived_operation_logs,
+    select_logs_chunks,
+)
+from haupt.streams.tasks.logs import (
+    download_run_logs_file,
+    index_run_logs,
+    upload_logs,
+)
+from haupt.streams.tasks.logs_compression import (
+    LOGS_COMPRESSION_GZIP,
+    LOGS_COMPRESSION_ZSTD,
+    compress_logs_data,
+    get_logs_compression,
+    read_logs_file_content,
+)
+from haupt.streams.tasks.logs_index import get_logs_index, update_logs_index
+from polyaxon._utils.test_utils import set_store
+from tests.base.case import BaseTest
+from traceml.logging import V1Log, V1Logs
+
+
+def write_logs_chunk(path, seconds, pod):
+    base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    logs = V1Logs(
+        logs=[
+            V1Log(
+                timestamp=base + datetime.timedelta(seconds=s),
+                node="node",
+                pod=pod,
+                container="main",
+                value="{}-{}".format(pod, s),
+            )
+            for s in seconds
+        ]
+    )
+    filename = str(datetime.datetime.timestamp(logs.logs[-1].timestamp))
+    with open(os.path.join(path, filename), "w") as f:
+        f.write(logs.to_json())
+    return base
+
+
+@pytest.mark.streams_mark
+class TestArchivedPodsLogs(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        self.logs_path = os.path.join(self.store_root, "uuid", "plxlogs")
+        os.makedirs(self.logs_path)
+        self.base = write_logs_chunk(self.logs_path, [1, 4, 7], "pod0")
+        write_logs_chunk(self.logs_path, [2, 5, 8, 9], "pod1")
+        write_logs_chunk(self.logs_path, [3, 6, 8], "pod2")
+        write_logs_chunk(self.logs_path, [10, 11], "pod0")
+
+    def get_logs(self, last_time=None, limit=None):
+        async def get_logs():
+            return await get_archived_pods_operation_logs(
+                fs=await AppFS.get_fs(),
+                store_path=self.store_root,
+                run_uuid="uuid",
+                subpath="plxlogs",
+                last_time=last_time,
+                limit=limit,
+            )
+
+        return asyncio.run(get_logs())
+
+    def test_logs_are_merged_in_time_order(self):
+        logs, last_time = self.get_logs()
+        assert [log["value"] for log in logs] == [
+            "pod0-1",
+            "pod1-2",
+            "pod2-3",
+            "pod0-4",
+            "pod1-5",
+            "pod2-6",
+            "pod0-7",
+            "pod1-8",
+            "pod2-8",
+            "pod1-9",
+            "pod0-10",
+            "pod0-11",
+        ]
+        assert last_time == self.base + datetime.timedelta(seconds=11)
+
+    def test_logs_are_filtered_and_paged(self):
+        logs, last_time = self.get_logs(
+            last_time=self.base + datetime.timedelta(seconds=5), limit=2
+        )
+        assert [log["value"] for log in logs] == ["pod2-6", "pod0-7"]
+
+        # Logs sharing the last timestamp are returned in the same page
+        logs, last_time = self.get_logs(last_time=last_time, limit=1)
+        assert [log["value"] for log in logs] == ["pod1-8", "pod2-8"]
+
+        logs, last_time = self.get_logs(last_time=last_time, limit=5)
+        assert [log["value"] for log in logs] == ["pod1-9", "pod0-10", "pod0-11"]
+
+        # Chunks ending before `last_time` are not read
+        with patch(
+            "haupt.streams.controllers.logs.read_logs_file_since"
+        ) as mock_read_logs:
+            logs, next_last_time = self.get_logs(last_time=last_time)
+        assert mock_read_logs.call_count == 0
+        assert logs == []
+        assert next_last_time == last_time
+
+    @override_settings(STREAMS_LOGS_PAGE_SIZE=3)
+    def test_tmp_operation_logs_use_the_page_size(self):
+        async def get_logs():
+            return await get_tmp_operation_logs(
+                fs=await AppFS.get_fs(),
+                store_path=self.store_root,
+                run_uuid="uuid",
+                last_time=self.base,
+            )
+
+        logs, last_time = asyncio.run(get_logs())
+        assert [log["value"] for log in logs] == ["pod0-1", "pod1-2", "pod2-3"]
+        assert last_time == self.base + datetime.timedelta(seconds=3)
+
+
+@pytest.mark.streams_mark
+class TestLogsIndex(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        self.logs_path = os.path.join(self.store_root, "uuid", "plxlogs")
+        os.makedirs(self.logs_path)
+        self.base = write_logs_chunk(self.logs_path, [1, 2, 3], "pod0")
+        write_logs_chunk(self.logs_path, [4, 5, 6], "pod0")
+
+    def run_async(self, fct, **kwargs):
+        async def run():
+            return await fct(
+                fs=await AppFS.get_fs(), store_path=self.store_root, **kwargs
+            )
+
+        return asyncio.run(run())
+
+    def get_time(self, seconds):
+        return self.base + datetime.timedelta(seconds=seconds)
+
+    def test_upload_logs_and_collection_update_the_index(self):
+        index = self.run_async(index_run_logs, run_uuid="uuid")
+        first_chunk = str(datetime.datetime.timestamp(self.get_time(3)))
+        assert index[first_chunk] == {
+            "start": datetime.datetime.timestamp(self.get_time(1)),
+            "end": datetime.datetime.timestamp(self.get_time(3)),
+            "lines": 3,
+            "size": os.path.getsize(os.path.join(self.logs_path, first_chunk)),
+        }
+        assert len(index) == 2
+
+        logs = [
+            V1Log(timestamp=self.get_time(s), value="line-{}".format(s)) for s in (7, 8)
+        ]
+        self.run_async(upload_logs, run_uuid="uuid", logs=logs)
+        index = self.run_async(get_logs_index, run_uuid="uuid")
+        assert len(index) == 3
+        assert index[str(datetime.datetime.timestamp(self.get_time(8)))]["lines"] == 2
+
+    def test_concurrent_index_updates_are_merged(self):
+        async def update(entries):
+            return await asyncio.gather(
+                *[
+                    update_logs_index(
+                        fs=await AppFS.get_fs(),
+                        store_path=self.store_root,
+                        run_uuid="uuid",
+                        entries={chunk: entry},
+                    )
+                    for chunk, entry in entries.items()
+                ]
+            )
+
+        entries = {str(i): {"start": i, "end": i, "lines": 1} for i in range(3)}
+        asyncio.run(update({**entries, "empty": None}))
+        assert self.run_async(get_logs_index, run_uuid="uuid") == entries
+        assert (
+            len(os.listdir(os.path.join(self.store_root, "uuid", "plxlogs.index"))) == 3
+        )
+
+    def test_search_archived_operation_logs_reads_the_overlapping_chunks(self):
+        self.run_async(index_run_logs, run_uuid="uuid")
+
+        async def search(**kwargs):
+            return [
+                log["value"]
+                async for log in search_archived_operation_logs(
+                    fs=await AppFS.get_fs(),
+                    store_path=self.store_root,
+                    run_uuid="uuid",
+                    **kwargs,
+                )
+            ]
+
+        matcher = LogsMatcher.from_query({"query": "pod0"})
+        with patch(
+            "haupt.streams.controllers.logs.open_file", wraps=open_file
+        ) as mock_open:
+            logs = asyncio.run(search(matcher=matcher, start_time=self.get_time(4)))
+        assert mock_open.call_count == 1
+        assert logs == ["pod0-5", "pod0-6"]
+        assert asyncio.run(search(matcher=matcher, limit=2)) == ["pod0-1", "pod0-2"]
+
+    def test_select_logs_chunks(self):
+        index = {
+            "a": {"start": 0, "end": 10, "lines": 5},
+            "b": {"start": 11, "end": 20, "lines": 5},
+            "c": {"start": 21, "end": 30, "lines": 5},
+        }
+        chunks = ["a", "b", "c", "25.0", "pod.jsonl"]
+        start = datetime.datetime.fromtimestamp(15, tz=datetime.timezone.utc)
+        end = datetime.datetime.fromtimestamp(22, tz=datetime.timezone.utc)
+        assert select_logs_chunks(chunks, index, start_time=start) == [
+            "b",
+            "c",
+            "25.0",
+            "pod.jsonl",
+        ]
+        assert select_logs_chunks(chunks, index, end_time=end) == [
+            "a",
+            "b",
+            "c",
+            "25.0",
+            "pod.jsonl",
+        ]
+        assert select_logs_chunks(
+            chunks, {**index, "c": {"start": 23}}, end_time=end
+        ) == [
+            "a",
+            "b",
+            "25.0",
+            "pod.jsonl",
+        ]
+        # The first 5 lines are all in `a`, chunks starting after it are not needed
+        assert select_logs_chunks(chunks, index, limit=5) == ["a", "25.0", "pod.jsonl"]
+
+    def test_get_archived_operation_logs_window_reads_the_overlapping_chunks(self):
+        self.run_async(index_run_logs, run_uuid="uuid")
+        with patch(
+            "haupt.streams.controllers.logs.download_file", wraps=download_file
+        ) as mock_download:
+            logs, last_time = self.run_async(
+                get_archived_operation_logs_window,
+                run_uuid="uuid",
+                start_time=self.get_time(4),
+                end_time=self.get_time(5),
+            )
+        assert mock_download.call_count == 1
+        assert [log["value"] for log in logs] == ["pod0-5"]
+        assert last_time == self.get_time(5)
+
+        logs, last_time = self.run_async(
+            get_archived_operation_logs_window, run_uuid="uuid", limit=2
+        )
+        assert [log["value"] for log in logs] == ["pod0-1", "pod0-2"]
+        assert last_time == self.get_time(2)
+
+
+@pytest.mark.streams_mark
+class TestCompressedLogs(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        self.base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        self.logs = [
+            V1Log(
+                timestamp=self.base + datetime.timedelta(seconds=s),
+                value="line-{}".format(s),
+            )
+            for s in range(3)
+        ]
+
+    def test_read_logs_file_content_detects_the_compression(self):
+        data = V1Logs(logs=self.logs).to_json()
+        path = os.path.join(self.store_root, "chunk")
+        with open(path, "wb") as f:
+            f.write(compress_logs_data(data, LOGS_COMPRESSION_GZIP))
+        assert get_logs_compression(path) == LOGS_COMPRESSION_GZIP
+        assert read_logs_file_content(path) == data
+
+        with open(path + ".gz", "wb") as f:
+            f.write(compress_logs_data(data, LOGS_COMPRESSION_GZIP))
+        assert read_logs_file_content(path + ".gz") == data
+
+        with open(path, "w") as f:
+            f.write(data)
+        assert get_logs_compression(path) is None
+        assert read_logs_file_content(path) == data
+
+    def test_read_zstd_logs_file(self):
+        pytest.importorskip("zstandard")
+        data = V1Logs(logs=self.logs).to_json()
+        path = os.path.join(self.store_root, "chunk.zst")
+        with open(path, "wb") as f:
+            f.write(compress_logs_data(data, LOGS_COMPRESSION_ZSTD))
+        assert read_logs_file_content(path) == data
+
+    @override_settings(STREAMS_LOGS_COMPRESSION=LOGS_COMPRESSION_GZIP)
+    def test_upload_compressed_logs_are_read_transparently(self):
+        async def upload_and_read():
+            fs = await AppFS.get_fs()
+            await upload_logs(
+                fs=fs, store_path=self.store_root, run_uuid="uuid", logs=self.logs
+            )
+            return await get_archived_pods_operation_logs(
+                fs=fs,
+                store_path=self.store_root,
+                run_uuid="uuid",
+                subpath="plxlogs",
+                last_time=self.base,
+            )
+
+        logs, last_time = asyncio.run(upload_and_read())
+        chunk = "{}.gz".format(datetime.datetime.timestamp(self.logs[-1].timestamp))
+        with open(os.path.join(self.store_root, "uuid", "plxlogs", chunk), "rb") as f:
+            assert f.read(2) == b"\x1f\x8b"
+        assert [log["value"] for log in logs] == ["line-1", "line-2"]
+        assert last_time == self.logs[-1].timestamp
+
+        async def download():
+            fs = await AppFS.get_fs()
+            index = await get_logs_index(
+                fs=fs, store_path=self.store_root, run_uuid="uuid"
+            )
+            logs = await download_run_logs_file(
+                fs=fs, store_path=self.store_root, run_uuid="uuid", last_file=chunk
+            )
+            return index, logs
+
+        index, logs = asyncio.run(download())
+        assert index[chunk]["lines"] == 3
+        assert [log["value"] for log in logs] == ["line-0", "line-1", "line-2"]
+
+
+def test_logs_matcher_times_out_on_pathological_patterns():
+    log = V1Log(value="a" * 5000 + "!")
+    with patch("haupt.streams.controllers.logs.LOGS_SEARCH_TIMEOUT", 0.1):
+        matcher = LogsMatcher.from_query({"query": "(a|aa)+$", "regex": "true"})
+        with pytest.raises(TimeoutError):
+            matcher.match(log)
+        # The deadline covers the whole search
+        with pytest.raises(TimeoutError):
+            matcher.match(V1Log(value="a"))
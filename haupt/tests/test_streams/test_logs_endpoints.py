@@ -0,0 +1,64 @@
+import asyncio
+import datetime
+import os
+import pytest
+
+from urllib.parse import quote
+
+from clipped.utils.json import orjson_loads
+
+from polyaxon._utils.test_utils import set_store
+from polyaxon.api import STREAMS_V1_LOCATION
+from tests.base.case import BaseTest
+from tests.test_streams.test_logs_controllers import write_logs_chunk
+
+
+@pytest.mark.streams_mark
+class TestLogsSearch(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.store_root = set_store()
+        logs_path = os.path.join(self.store_root, "uuid", "plxlogs")
+        os.makedirs(logs_path)
+        self.base = write_logs_chunk(logs_path, [1, 2, 3], "pod0")
+        write_logs_chunk(logs_path, [4, 5, 6], "pod1")
+        self.base_url = (
+            STREAMS_V1_LOCATION + "namespace/owner/project/runs/uuid/logs/search"
+        )
+
+    def search(self, query):
+        response = self.client.get(self.base_url + query)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+
+        async def get_content():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        content = asyncio.run(get_content())
+        return [orjson_loads(line)["value"] for line in content.splitlines()]
+
+    def test_search_run_logs(self):
+        assert self.search("?query=pod1") == ["pod1-4", "pod1-5", "pod1-6"]
+        assert self.search("?query=POD0-[13]&regex=true&ignore_case=true") == [
+            "pod0-1",
+            "pod0-3",
+        ]
+        assert self.search("?query=-&pod=pod0&limit=2") == ["pod0-1", "pod0-2"]
+        assert self.search("?container=other") == []
+        start = (self.base + datetime.timedelta(seconds=3)).isoformat()
+        end = (self.base + datetime.timedelta(seconds=5)).isoformat()
+        assert self.search(
+            "?query=pod&start={}&end={}".format(quote(start), quote(end))
+        ) == ["pod1-4", "pod1-5"]
+
+    def test_search_run_logs_rejects_invalid_requests(self):
+        response = self.client.get(self.base_url + "?query=[&regex=true")
+        assert response.status_code == 400
+        response = self.client.get(self.base_url + "?query=a&limit=0")
+        assert response.status_code == 400
+
+    def test_get_run_logs_rejects_invalid_times(self):
+        url = STREAMS_V1_LOCATION + "namespace/owner/project/runs/uuid/logs"
+        for query in ("?start=foo", "?end=2024-13-01", "?last_time=foo"):
+            response = self.client.get(url + query)
+            assert response.status_code == 400
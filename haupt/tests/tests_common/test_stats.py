@@ -0,0 +1,27 @@
+import logging
+
+from unittest import TestCase
+
+from mock import mock
+
+from haupt.common.stats import StatsLogger
+
+
+class TestStatsLogger(TestCase):
+    def test_log_is_throttled(self):
+        logger = mock.MagicMock(spec=logging.Logger)
+        get_stats = mock.MagicMock(return_value={"hits": 1})
+        stats_logger = StatsLogger(logger, "Cache", get_stats)
+
+        stats_logger.log()
+        assert logger.info.call_count == 0
+        assert get_stats.call_count == 0
+
+        stats_logger.log(force=True)
+        assert logger.info.call_args_list == [
+            mock.call("%s stats: %s", "Cache", {"hits": 1})
+        ]
+
+        stats_logger.interval = 0
+        stats_logger.log()
+        assert logger.info.call_count == 2
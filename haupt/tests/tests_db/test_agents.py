@@ -3,17 +3,20 @@ import datetime
 from unittest.mock import patch
 
 from django.conf import settings as dj_settings
+from django.db.models import F
 from django.test import TestCase, override_settings
 from django.utils.timezone import now
 
 from haupt.db.factories.projects import ProjectFactory
 from haupt.db.factories.runs import RunFactory
+from haupt.db.factories.users import UserFactory
 from haupt.db.managers.agents import (
+    check_controllers,
     get_agent_state,
     get_annotated_controllers,
-    get_annotated_pipelines,
-    get_runs_by_controller,
-    get_runs_by_pipeline,
+    get_annotated_controllers_pipelines,
+    get_queued_runs,
+    get_ranked_compiled_runs,
 )
 from haupt.db.models.runs import Run
 from polyaxon import _operations, settings
@@ -475,7 +478,7 @@ class TestAgentState(TestCase):
             (pipeline2.id, 19, 0),
         ]
 
-    def test_get_annotated_pipelines(self):
+    def test_get_annotated_controllers_pipelines(self):
         project = ProjectFactory()
 
         controller = RunFactory(project=project, kind=V1RunKind.DAG)
@@ -546,7 +549,7 @@ class TestAgentState(TestCase):
         Run.all.update(managed_by=ManagedBy.AGENT)
 
         # No queue with queued runs
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == []
 
         # Queue runs
@@ -558,7 +561,7 @@ class TestAgentState(TestCase):
         run5.save()
 
         # Pipelines are not running
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == []
 
         pipeline1.status = V1Statuses.RUNNING
@@ -569,10 +572,10 @@ class TestAgentState(TestCase):
         pipeline3.save()
 
         # But no runs on k8s
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == [
-            (pipeline1.id, None, 0),
-            (pipeline3.id, 2, 0),
+            (pipeline1.id, controller.id, None, 0),
+            (pipeline3.id, controller.id, 2, 0),
         ]
 
         # Queue more runs
@@ -582,22 +585,22 @@ class TestAgentState(TestCase):
         run4.save()
 
         # But no runs on k8s
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == [
-            (pipeline1.id, None, 0),
-            (pipeline2.id, 19, 0),
-            (pipeline3.id, 2, 0),
+            (pipeline1.id, controller.id, None, 0),
+            (pipeline2.id, controller.id, 19, 0),
+            (pipeline3.id, controller.id, 2, 0),
         ]
 
         # Runs on k8s
         run1.status = V1Statuses.RUNNING
         run1.save()
         # Queue are consumed
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == [
-            (pipeline1.id, None, 1),
-            (pipeline2.id, 19, 0),
-            (pipeline3.id, 2, 0),
+            (pipeline1.id, controller.id, None, 1),
+            (pipeline2.id, controller.id, 19, 0),
+            (pipeline3.id, controller.id, 2, 0),
         ]
 
         run2.status = V1Statuses.WARNING
@@ -605,19 +608,26 @@ class TestAgentState(TestCase):
         run5.status = V1Statuses.STARTING
         run5.save()
         # Queue are consumed
-        queues = get_annotated_pipelines(controller.id)
+        queues = get_annotated_controllers_pipelines([controller.id])
         assert list(queues) == [
-            (pipeline2.id, 19, 0),
+            (pipeline2.id, controller.id, 19, 0),
         ]
 
-    def test_get_runs_by_controller(self):
+    def test_get_ranked_compiled_runs_by_controller(self):
+        def get_runs_by_controller(controller_id, limit):
+            return get_ranked_compiled_runs(
+                parent_field="controller_id",
+                limits={controller_id: limit},
+                pipeline_id=F("controller_id"),
+            )
+
         project = ProjectFactory()
         controller = RunFactory(project=project, kind=V1RunKind.DAG)
         # Patch all runs to be managed
         Run.all.update(managed_by=ManagedBy.AGENT)
 
-        assert get_runs_by_controller(controller.id, None, 0, None) == []
-        assert list(get_runs_by_controller(controller.id, 10, 0, None)) == []
+        assert get_runs_by_controller(controller.id, 0) == {}
+        assert get_runs_by_controller(controller.id, 10) == {}
 
         run1 = RunFactory(
             project=project,
@@ -628,15 +638,22 @@ class TestAgentState(TestCase):
         run1.managed_by = ManagedBy.AGENT
         # Patch all runs to be managed
         Run.all.update(managed_by=ManagedBy.AGENT)
-        assert get_runs_by_controller(controller.id, None, 0, None) == []
-        assert list(get_runs_by_controller(controller.id, 10, 0, None)) == []
+        assert get_runs_by_controller(controller.id, 0) == {}
+        assert get_runs_by_controller(controller.id, 10) == {}
 
         run1.status = V1Statuses.COMPILED
         run1.save()
-        assert get_runs_by_controller(controller.id, None, 0, None) == []
-        assert list(get_runs_by_controller(controller.id, 10, 0, None)) == [run1]
+        assert get_runs_by_controller(controller.id, 0) == {}
+        assert get_runs_by_controller(controller.id, 10) == {controller.id: [run1]}
+
+    def test_get_ranked_compiled_runs_by_pipeline(self):
+        def get_runs_by_pipeline(pipeline_id, limit):
+            return get_ranked_compiled_runs(
+                parent_field="pipeline_id",
+                limits={pipeline_id: limit},
+                controller_id__in=[controller.id],
+            ).get(pipeline_id, [])
 
-    def test_get_runs_by_pipeline(self):
         project = ProjectFactory()
         controller = RunFactory(project=project, kind=V1RunKind.DAG)
         pipeline1 = RunFactory(
@@ -662,20 +679,14 @@ class TestAgentState(TestCase):
         # Patch all runs to be managed
         Run.all.update(managed_by=ManagedBy.AGENT)
 
-        assert get_runs_by_pipeline(controller.id, pipeline1.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline1.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline1.id, 0) == []
+        assert get_runs_by_pipeline(pipeline1.id, 10) == []
 
-        assert get_runs_by_pipeline(controller.id, pipeline2.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline2.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline2.id, 0) == []
+        assert get_runs_by_pipeline(pipeline2.id, 10) == []
 
-        assert get_runs_by_pipeline(controller.id, pipeline3.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline3.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline3.id, 0) == []
+        assert get_runs_by_pipeline(pipeline3.id, 10) == []
 
         run1 = RunFactory(
             project=project,
@@ -715,20 +726,14 @@ class TestAgentState(TestCase):
         # Patch all runs to be managed
         Run.all.update(managed_by=ManagedBy.AGENT)
 
-        assert get_runs_by_pipeline(controller.id, pipeline1.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline1.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline1.id, 0) == []
+        assert get_runs_by_pipeline(pipeline1.id, 10) == []
 
-        assert get_runs_by_pipeline(controller.id, pipeline2.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline2.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline2.id, 0) == []
+        assert get_runs_by_pipeline(pipeline2.id, 10) == []
 
-        assert get_runs_by_pipeline(controller.id, pipeline3.id, None, 0, None) == []
-        assert (
-            list(get_runs_by_pipeline(controller.id, pipeline3.id, 10, 0, None)) == []
-        )
+        assert get_runs_by_pipeline(pipeline3.id, 0) == []
+        assert get_runs_by_pipeline(pipeline3.id, 10) == []
 
         run1.status = V1Statuses.COMPILED
         run1.save()
@@ -741,26 +746,114 @@ class TestAgentState(TestCase):
         run5.status = V1Statuses.COMPILED
         run5.save()
 
-        assert get_runs_by_pipeline(controller.id, pipeline1.id, None, 0, None) == []
-        assert set(
-            [
-                i.id
-                for i in get_runs_by_pipeline(controller.id, pipeline1.id, 10, 0, None)
-            ]
-        ) == {run1.id, run2.id}
-
-        assert get_runs_by_pipeline(controller.id, pipeline2.id, None, 0, None) == []
-        assert set(
-            [
-                i.id
-                for i in get_runs_by_pipeline(controller.id, pipeline2.id, 10, 0, None)
-            ]
-        ) == {run3.id, run4.id}
-
-        assert get_runs_by_pipeline(controller.id, pipeline3.id, None, 0, None) == []
-        assert set(
-            [
-                i.id
-                for i in get_runs_by_pipeline(controller.id, pipeline3.id, 10, 0, None)
-            ]
-        ) == {run5.id}
+        assert get_runs_by_pipeline(pipeline1.id, 0) == []
+        assert set([i.id for i in get_runs_by_pipeline(pipeline1.id, 10)]) == {
+            run1.id,
+            run2.id,
+        }
+
+        assert get_runs_by_pipeline(pipeline2.id, 0) == []
+        assert set([i.id for i in get_runs_by_pipeline(pipeline2.id, 10)]) == {
+            run3.id,
+            run4.id,
+        }
+
+        assert get_runs_by_pipeline(pipeline3.id, 0) == []
+        assert set([i.id for i in get_runs_by_pipeline(pipeline3.id, 10)]) == {run5.id}
+
+    @patch("haupt.common.workers.send")
+    def test_check_controllers(self, _):
+        project = ProjectFactory()
+        controller1 = RunFactory(
+            project=project,
+            kind=V1RunKind.MATRIX,
+            meta_info={"concurrency": 2},
+        )
+        controller2 = RunFactory(project=project, kind=V1RunKind.DAG)
+        pipeline = RunFactory(
+            project=project,
+            kind=V1RunKind.MATRIX,
+            controller=controller2,
+            pipeline=controller2,
+            meta_info={"concurrency": 2},
+        )
+        runs1 = [
+            RunFactory(
+                project=project,
+                kind=V1RunKind.JOB,
+                pipeline=controller1,
+                controller=controller1,
+            )
+            for _ in range(3)
+        ]
+        runs2 = [
+            RunFactory(
+                project=project,
+                kind=V1RunKind.JOB,
+                pipeline=pipeline,
+                controller=controller2,
+            )
+            for _ in range(3)
+        ]
+        Run.all.update(managed_by=ManagedBy.AGENT)
+        Run.all.filter(id__in=[controller1.id, controller2.id, pipeline.id]).update(
+            status=V1Statuses.RUNNING
+        )
+        Run.all.filter(id__in=[r.id for r in runs1 + runs2]).update(
+            status=V1Statuses.COMPILED
+        )
+
+        with self.assertNumQueries(1):
+            assert get_ranked_compiled_runs(
+                parent_field="pipeline_id", limits={controller1.id: 2, pipeline.id: 0}
+            ) == {controller1.id: runs1[:2]}
+
+        assert check_controllers(max_budget=10) is True
+        queued = set(
+            Run.objects.filter(status=V1Statuses.QUEUED).values_list("id", flat=True)
+        )
+        assert queued == {r.id for r in runs1[:2] + runs2[:2]}
+
+        # Nothing else can be queued until the runs are done
+        check_controllers(max_budget=10)
+        assert Run.objects.filter(status=V1Statuses.QUEUED).count() == 4
+
+    @override_settings(MAX_CONCURRENCY=5, SCHEDULER_QUEUE_DISPATCHER="fair")
+    def test_get_queued_runs_fair_share(self):
+        user = UserFactory()
+        project1 = ProjectFactory()
+        project2 = ProjectFactory()
+        runs1 = [
+            RunFactory(project=project1, user=user, kind=V1RunKind.JOB)
+            for _ in range(6)
+        ]
+        runs2 = [
+            RunFactory(project=project2, user=user, kind=V1RunKind.JOB)
+            for _ in range(2)
+        ]
+        running = RunFactory(project=project2, user=user, kind=V1RunKind.JOB)
+        Run.all.update(managed_by=ManagedBy.AGENT, status=V1Statuses.QUEUED)
+        Run.all.filter(id=running.id).update(status=V1Statuses.RUNNING)
+
+        # The sweep of project1 does not starve project2
+        data, full = get_queued_runs()
+        assert full is False
+        scheduled = set(
+            Run.objects.filter(status=V1Statuses.SCHEDULED).values_list("id", flat=True)
+        )
+        assert scheduled == {runs1[0].id, runs1[1].id, runs2[0].id}
+        assert len(data) == 3
+
+    @override_settings(MAX_CONCURRENCY=3, SCHEDULER_QUEUE_DISPATCHER="fifo")
+    def test_get_queued_runs_fifo(self):
+        project1 = ProjectFactory()
+        project2 = ProjectFactory()
+        runs1 = [RunFactory(project=project1, kind=V1RunKind.JOB) for _ in range(4)]
+        RunFactory(project=project2, kind=V1RunKind.JOB)
+        Run.all.update(managed_by=ManagedBy.AGENT, status=V1Statuses.QUEUED)
+
+        data, _ = get_queued_runs()
+        scheduled = set(
+            Run.objects.filter(status=V1Statuses.SCHEDULED).values_list("id", flat=True)
+        )
+        assert scheduled == {r.id for r in runs1[:3]}
@@ -0,0 +1,95 @@
+from django.test import TestCase
+
+from haupt.db.factories.projects import ProjectFactory
+from haupt.db.factories.runs import RunFactory
+from haupt.db.managers.flows import (
+    get_run_dag,
+    get_run_graph,
+    get_upstream_status_counts,
+)
+from haupt.orchestration.scheduler.manager import SchedulingManager
+from polyaxon.schemas import LiveState, V1Statuses, V1TriggerPolicy, dags
+
+
+class TestFlows(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory()
+
+    def test_get_upstream_status_counts(self):
+        upstream = [
+            RunFactory(project=self.project, status=status)
+            for status in [
+                V1Statuses.SUCCEEDED,
+                V1Statuses.FAILED,
+                V1Statuses.STOPPED,
+                V1Statuses.RUNNING,
+            ]
+        ]
+        run1 = RunFactory(project=self.project)
+        run1.upstream_runs.set(upstream)
+        run2 = RunFactory(project=self.project)
+        run2.upstream_runs.set(upstream[:1])
+        run3 = RunFactory(project=self.project)
+
+        with self.assertNumQueries(1):
+            counts = get_upstream_status_counts([run1.id, run2.id, run3.id])
+        assert counts == {
+            run1.id: {"all": 4, "done": 3, "succeeded": 1, "failed": 1},
+            run2.id: {"all": 1, "done": 1, "succeeded": 1, "failed": 0},
+        }
+
+    def test_get_run_dag_and_graph(self):
+        pipeline = RunFactory(project=self.project)
+        runs = [RunFactory(project=self.project, pipeline=pipeline) for _ in range(4)]
+        archived = RunFactory(
+            project=self.project, pipeline=pipeline, live_state=LiveState.ARCHIVED
+        )
+        runs[0].upstream_runs.set(runs[2:])
+        runs[1].upstream_runs.set([runs[2], archived])
+        runs[2].upstream_runs.set([runs[3]])
+
+        with self.assertNumQueries(1):
+            dag = get_run_dag(pipeline)
+        assert set(dag.keys()) == {r.id for r in runs}
+        assert {k: v.upstream for k, v in dag.items()} == {
+            runs[0].id: {runs[2].id, runs[3].id},
+            runs[1].id: {runs[2].id},
+            runs[2].id: {runs[3].id},
+            runs[3].id: set(),
+        }
+        assert dag[runs[3].id].downstream == {runs[0].id, runs[2].id}
+        assert dag[runs[0].id].op == runs[0]
+        assert dags.get_independent_ops(dag) == {runs[3].id}
+
+        with self.assertNumQueries(1):
+            graph = get_run_graph({"pipeline_id": pipeline.id})
+        assert {k: set(v["downstream"]) for k, v in graph.items()} == {
+            runs[0].uuid.hex: set(),
+            runs[1].uuid.hex: set(),
+            runs[2].uuid.hex: {runs[0].uuid.hex, runs[1].uuid.hex},
+            runs[3].uuid.hex: {runs[0].uuid.hex, runs[2].uuid.hex},
+        }
+
+
+class TestUpstreamTrigger(TestCase):
+    def test_evaluate_upstream_trigger(self):
+        evaluate = SchedulingManager._evaluate_upstream_trigger
+        running = {"all": 2, "done": 1, "succeeded": 1, "failed": 0}
+        succeeded = {"all": 2, "done": 2, "succeeded": 2, "failed": 0}
+        failed = {"all": 2, "done": 2, "succeeded": 1, "failed": 1}
+
+        assert evaluate(None, None) == (False, False)
+        assert evaluate({"all": 1, "done": 0, "succeeded": 0, "failed": 0}, None) == (
+            False,
+            False,
+        )
+        assert evaluate(running, V1TriggerPolicy.ONE_DONE) == (True, True)
+        assert evaluate(running, V1TriggerPolicy.ONE_SUCCEEDED) == (True, True)
+        assert evaluate(running, V1TriggerPolicy.ONE_FAILED) == (True, False)
+        assert evaluate(running, V1TriggerPolicy.ALL_DONE) == (False, False)
+        assert evaluate(running, None) == (False, False)
+        assert evaluate(succeeded, None) == (True, True)
+        assert evaluate(succeeded, V1TriggerPolicy.ALL_FAILED) == (True, False)
+        assert evaluate(failed, V1TriggerPolicy.ALL_SUCCEEDED) == (True, False)
+        assert evaluate(failed, V1TriggerPolicy.ALL_DONE) == (True, True)
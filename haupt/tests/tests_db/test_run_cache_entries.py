@@ -0,0 +1,150 @@
+import importlib
+import uuid
+
+from django.apps import apps as django_apps
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from haupt.db.defs import Models
+from haupt.db.factories.projects import ProjectFactory
+from haupt.db.factories.runs import RunFactory
+from haupt.db.managers.cache import get_cache_entry
+from haupt.db.managers.statuses import new_run_status
+from haupt.orchestration.scheduler.resolver import SchedulingResolver
+from polyaxon.schemas import (
+    V1Cache,
+    V1CloningKind,
+    V1CompiledOperation,
+    V1RunKind,
+    V1RunPending,
+    V1StatusCondition,
+    V1Statuses,
+)
+
+
+class TestRunCacheEntries(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory()
+        self.pipeline = RunFactory(project=self.project, kind=V1RunKind.DAG)
+        self.state = uuid.uuid4()
+        self.compiled_operation = V1CompiledOperation.construct(
+            cache=V1Cache(disable=False)
+        )
+
+    def create_run(self):
+        return RunFactory(
+            project=self.project,
+            pipeline=self.pipeline,
+            kind=V1RunKind.JOB,
+            runtime=V1RunKind.JOB,
+            state=self.state,
+        )
+
+    @staticmethod
+    def set_status(run, status):
+        new_run_status(
+            run,
+            condition=V1StatusCondition.get_condition(
+                type=status, status=True, reason="foo"
+            ),
+        )
+
+    def is_cache_hit(self, run):
+        return SchedulingResolver._is_cache_hit(
+            run=run, compiled_operation=self.compiled_operation
+        )
+
+    def test_cache_entries_follow_run_statuses(self):
+        run1 = self.create_run()
+        assert self.is_cache_hit(run1) is False
+        assert get_cache_entry(run1).run_id == run1.id
+
+        # Pending on the running cache
+        run2 = self.create_run()
+        with self.assertNumQueries(3):
+            assert self.is_cache_hit(run2) is True
+        assert run2.original_id == run1.id
+        assert run2.cloning_kind == V1CloningKind.CACHE
+        assert run2.pending == V1RunPending.CACHE
+
+        # Succeeded cache
+        run1.outputs = {"loss": 0.1}
+        run1.save(update_fields=["outputs"])
+        self.set_status(run1, V1Statuses.SUCCEEDED)
+        entry = get_cache_entry(run1)
+        assert entry.status == V1Statuses.SUCCEEDED
+        assert entry.finished_at is not None
+        run3 = self.create_run()
+        assert self.is_cache_hit(run3) is True
+        run3.refresh_from_db()
+        assert run3.status == V1Statuses.SUCCEEDED
+        assert run3.outputs == {"loss": 0.1}
+        # Clones point the entry to the original
+        assert get_cache_entry(run3).run_id == run1.id
+
+    def test_failed_cache_is_replaced(self):
+        run1 = self.create_run()
+        assert self.is_cache_hit(run1) is False
+        self.set_status(run1, V1Statuses.FAILED)
+        assert get_cache_entry(run1).status == V1Statuses.FAILED
+
+        run2 = self.create_run()
+        assert self.is_cache_hit(run2) is False
+        assert get_cache_entry(run2).run_id == run2.id
+        assert Models.RunCacheEntry.objects.count() == 1
+
+    def test_archived_cache_is_not_used(self):
+        run1 = self.create_run()
+        self.set_status(run1, V1Statuses.SUCCEEDED)
+        run1.archive()
+
+        run2 = self.create_run()
+        assert self.is_cache_hit(run2) is False
+        assert get_cache_entry(run2).run_id == run2.id
+
+    def test_runs_without_state_do_not_write_entries(self):
+        run = RunFactory(
+            project=self.project,
+            pipeline=self.pipeline,
+            kind=V1RunKind.JOB,
+            runtime=V1RunKind.JOB,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.set_status(run, V1Statuses.STOPPING)
+            self.set_status(run, V1Statuses.SUCCEEDED)
+        assert not [q for q in queries if "db_runcacheentry" in q["sql"]]
+        assert Models.RunCacheEntry.objects.count() == 0
+
+    def test_backfill_migration(self):
+        migration = importlib.import_module(
+            "haupt.db.sqlite.db.migrations.0002_runcacheentry"
+        )
+        run1 = self.create_run()
+        Models.Run.objects.filter(id=run1.id).update(status=V1Statuses.SUCCEEDED)
+        run2 = self.create_run()
+        Models.Run.objects.filter(id=run2.id).update(status=V1Statuses.QUEUED)
+        run3 = self.create_run()
+        Models.Run.objects.filter(id=run3.id).update(status=V1Statuses.FAILED)
+        clone = RunFactory(
+            project=self.project,
+            pipeline=self.pipeline,
+            kind=V1RunKind.JOB,
+            runtime=V1RunKind.JOB,
+            state=uuid.uuid4(),
+            original=run2,
+            status=V1Statuses.RUNNING,
+        )
+
+        migration.migrate_run_cache_entries(django_apps, None)
+
+        assert Models.RunCacheEntry.objects.count() == 2
+        # Runs in progress or succeeded are preferred over queued runs
+        entry = get_cache_entry(run1)
+        assert entry.run_id == run1.id
+        assert entry.status == V1Statuses.SUCCEEDED
+        # Clones point to their original
+        entry = get_cache_entry(clone)
+        assert entry.run_id == run2.id
+        assert entry.status == V1Statuses.QUEUED
@@ -0,0 +1,142 @@
+from mock import MagicMock, mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from haupt.background.celeryp import coalescing
+from haupt.background.celeryp.tasks import SchedulerCeleryTasks
+from haupt.db.factories.projects import ProjectFactory
+from haupt.db.factories.runs import RunFactory
+from haupt.db.managers.runs import get_pipeline_stats
+from haupt.orchestration.scheduler.manager import SchedulingManager
+from polyaxon._constants.metadata import META_HAS_EARLY_STOPPING
+from polyaxon.schemas import V1FailureEarlyStopping, V1RunKind, V1Statuses
+
+
+class TestCheckPipeline(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory()
+        self.pipeline = RunFactory(
+            project=self.project, kind=V1RunKind.DAG, status=V1Statuses.RUNNING
+        )
+
+    def create_runs(self, *statuses):
+        for status in statuses:
+            RunFactory(
+                project=self.project,
+                pipeline=self.pipeline,
+                controller=self.pipeline,
+                kind=V1RunKind.JOB,
+                status=status,
+            )
+
+    def test_get_pipeline_stats(self):
+        self.create_runs(
+            V1Statuses.SUCCEEDED,
+            V1Statuses.FAILED,
+            V1Statuses.STOPPED,
+            V1Statuses.RUNNING,
+        )
+        with self.assertNumQueries(1):
+            stats = get_pipeline_stats(self.pipeline.id)
+        assert stats == {"all": 4, "pending": 1, "failed": 1, "stopped": 1}
+
+    def test_runs_check_pipeline(self):
+        self.create_runs(V1Statuses.SUCCEEDED, V1Statuses.RUNNING)
+        SchedulingManager.runs_check_pipeline(run_id=self.pipeline.id)
+        self.pipeline.refresh_from_db()
+        assert self.pipeline.status == V1Statuses.RUNNING
+
+        self.create_runs(V1Statuses.FAILED)
+        self.pipeline.pipeline_runs.filter(status=V1Statuses.RUNNING).update(
+            status=V1Statuses.SUCCEEDED
+        )
+        SchedulingManager.runs_check_pipeline(run_id=self.pipeline.id)
+        self.pipeline.refresh_from_db()
+        assert self.pipeline.status == V1Statuses.FAILED
+
+    @override_settings(SCHEDULER_CHECK_PIPELINE_DEBOUNCE=10, SHARED_CACHE_ENABLED=True)
+    def test_send_check_pipeline_is_coalesced(self):
+        cache.clear()
+        workers_backend = MagicMock()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                SchedulingManager.send_check_pipeline(
+                    run_id=self.pipeline.id, workers_backend=workers_backend
+                )
+        assert workers_backend.send.call_count == 1
+        workers_backend.send.assert_called_with(
+            SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
+            kwargs={"run_id": self.pipeline.id, "debounced": True},
+            countdown=10,
+        )
+
+        # The check releases the window
+        SchedulingManager.runs_check_pipeline(run_id=self.pipeline.id, debounced=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            SchedulingManager.send_check_pipeline(
+                run_id=self.pipeline.id, workers_backend=workers_backend
+            )
+        assert workers_backend.send.call_count == 2
+
+    @override_settings(
+        SCHEDULER_CHECK_PIPELINE_DEBOUNCE=10,
+        SCHEDULER_TASKS_COALESCING_WINDOW=60,
+        SHARED_CACHE_ENABLED=True,
+    )
+    @mock.patch("haupt.common.workers.app.send_task")
+    def test_send_check_pipeline_is_not_coalesced_twice(self, send_task):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                SchedulingManager.send_check_pipeline(run_id=self.pipeline.id)
+        # Only the debounce applies to the pipeline checks
+        assert send_task.call_args_list == [
+            mock.call(
+                SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
+                kwargs={"run_id": self.pipeline.id, "debounced": True},
+                countdown=10,
+                ignore_result=True,
+            )
+        ]
+        assert coalescing.get_stats() == {}
+
+        # The check releases the debounce, and no coalescing claim is left
+        SchedulingManager.runs_check_pipeline(run_id=self.pipeline.id, debounced=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            SchedulingManager.send_check_pipeline(run_id=self.pipeline.id)
+        assert send_task.call_count == 2
+
+    @override_settings(SCHEDULER_CHECK_PIPELINE_DEBOUNCE=10, SHARED_CACHE_ENABLED=False)
+    def test_send_check_pipeline_requires_a_shared_cache(self):
+        workers_backend = MagicMock()
+        for _ in range(2):
+            SchedulingManager.send_check_pipeline(
+                run_id=self.pipeline.id, workers_backend=workers_backend
+            )
+        assert (
+            workers_backend.send.call_args_list
+            == [
+                mock.call(
+                    SchedulerCeleryTasks.RUNS_CHECK_PIPELINE,
+                    kwargs={"run_id": self.pipeline.id},
+                )
+            ]
+            * 2
+        )
+
+    def test_should_early_stop_on_failures(self):
+        self.pipeline.meta_info = {META_HAS_EARLY_STOPPING: True}
+        self.pipeline._compiled_operation = MagicMock(
+            matrix=MagicMock(early_stopping=[V1FailureEarlyStopping(percent=50)])
+        )
+        self.create_runs(V1Statuses.SUCCEEDED, V1Statuses.RUNNING)
+        assert SchedulingManager._should_early_stop(self.pipeline) is False
+
+        self.create_runs(V1Statuses.FAILED, V1Statuses.UPSTREAM_FAILED)
+        with self.assertNumQueries(1):
+            stats = SchedulingManager._get_pipeline_stats(self.pipeline)
+        assert stats["controller_all"] == 4
+        assert stats["controller_failed"] == 2
+        assert SchedulingManager._should_early_stop(self.pipeline, stats=stats) is True
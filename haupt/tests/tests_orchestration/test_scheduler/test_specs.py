@@ -0,0 +1,70 @@
+from mock import patch
+
+from clipped.utils.enums import get_enum_value
+
+from django.test import TestCase, override_settings
+
+from haupt.orchestration.scheduler.specs import SpecsCache
+from polyaxon.schemas import V1Operation, V1TriggerPolicy
+
+
+def get_content(trigger: str) -> str:
+    return (
+        '{"version": 1.1, "kind": "operation", "trigger": "%s", '
+        '"component": {"version": 1.1, "kind": "component", '
+        '"run": {"kind": "job", "container": {"name": "polyaxon-main", "image": "foo"}}}}'
+        % get_enum_value(trigger)
+    )
+
+
+class TestSpecsCache(TestCase):
+    def test_read_returns_copies(self):
+        cache = SpecsCache(max_entries=2)
+        content = get_content(V1TriggerPolicy.ALL_DONE)
+        op1 = cache.read(V1Operation, content)
+        op1.trigger = V1TriggerPolicy.ONE_FAILED
+        op2 = cache.read(V1Operation, content)
+
+        assert op2.trigger == V1TriggerPolicy.ALL_DONE
+        assert op2 is not op1
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_lru_eviction_and_stats(self):
+        cache = SpecsCache(max_entries=2)
+        content1 = get_content(V1TriggerPolicy.ALL_DONE)
+        content2 = get_content(V1TriggerPolicy.ONE_DONE)
+        content3 = get_content(V1TriggerPolicy.ALL_FAILED)
+        cache.read(V1Operation, content1)
+        cache.read(V1Operation, content2)
+        cache.read(V1Operation, content1)
+        cache.read(V1Operation, content3)
+        cache.read(V1Operation, content2)
+
+        assert cache.get_stats() == {
+            "entries": 2,
+            "max_entries": 2,
+            "hits": 1,
+            "misses": 4,
+            "evictions": 2,
+            "hit_rate": 0.2,
+        }
+
+    def test_stats_are_logged_periodically(self):
+        cache = SpecsCache(max_entries=2)
+        content = get_content(V1TriggerPolicy.ALL_DONE)
+        with patch.object(cache.stats_logger, "logger") as logger:
+            cache.read(V1Operation, content)
+            assert logger.info.call_count == 0
+            with patch.object(cache.stats_logger, "interval", 0):
+                cache.read(V1Operation, content)
+        assert logger.info.call_count == 1
+        assert logger.info.call_args[0][2]["hits"] == 1
+
+    @override_settings(SCHEDULER_SPECS_CACHE_SIZE=0)
+    def test_disabled_cache(self):
+        cache = SpecsCache()
+        content = get_content(V1TriggerPolicy.ALL_DONE)
+        assert cache.read(V1Operation, content).trigger == V1TriggerPolicy.ALL_DONE
+        assert cache.get_stats()["entries"] == 0
+        assert cache.misses == 0